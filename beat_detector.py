@@ -0,0 +1,119 @@
+import math
+from collections import deque
+import numpy as np
+
+# ===== Parámetros =====
+RR_LEN = 32              # intervalos guardados para BPM promedio / HRV
+REFRACTORY_S = 0.25      # sin latidos más cerca que esto (240 BPM máx.)
+BASELINE_S = 1.0         # constante de tiempo de la línea base (quita DC/deriva)
+THR_FRAC = 0.35          # umbral = ruido + THR_FRAC*(pico - ruido)
+MAX_RR_S = 2.0           # sin latido en este tiempo -> el nivel de pico decae
+
+
+class BeatDetector:
+    """Detector de picos (PPG/ECG) en streaming: O(1) por muestra.
+
+    Umbral adaptativo estilo Pan-Tompkins: se siguen con medias exponenciales el
+    nivel de los picos aceptados y el del ruido; cada pico candidato es el máximo
+    mientras la señal está sobre el umbral y se acepta al bajar, si respeta el
+    periodo refractario. Los intervalos RR se guardan en un anillo fijo.
+    """
+
+    def __init__(self, fs=100.0, max_markers=64):
+        self.beats = deque(maxlen=max_markers)   # índices globales de muestra de cada latido
+        self.set_fs(fs)
+        self.reset()
+
+    def set_fs(self, fs):
+        self.fs = max(1.0, float(fs))
+        self._a_base = 1.0 - math.exp(-1.0 / (BASELINE_S * self.fs))
+        self._a_noise = 1.0 - math.exp(-1.0 / (0.5 * self.fs))
+        self._refr = int(REFRACTORY_S * self.fs)
+        self._max_rr = int(MAX_RR_S * self.fs)
+        self._decay = math.exp(-1.0 / (2.0 * self.fs))
+
+    def reset(self):
+        self.n = 0                 # muestras procesadas
+        self.base = None
+        self.spk = 0.0             # nivel de pico
+        self.npk = 0.0             # nivel de ruido
+        self.thr = 0.0
+        self._in_peak = False
+        self._cand_v = 0.0
+        self._cand_i = 0
+        self._last_beat = None
+        self.beats.clear()
+        self.rr = np.zeros(RR_LEN)     # anillo de intervalos (s)
+        self._rr_i = 0
+        self.rr_count = 0
+
+    # ----- Por muestra -----
+    def update(self, x):
+        """Procesa una muestra; devuelve el índice del latido confirmado o None."""
+        i = self.n
+        self.n += 1
+        if self.base is None:
+            self.base = x
+        self.base += self._a_base * (x - self.base)
+        h = x - self.base
+        beat = None
+
+        if self._in_peak:
+            if h > self._cand_v:
+                self._cand_v, self._cand_i = h, i
+            elif h < self.thr:
+                self._in_peak = False
+                if self._last_beat is None or self._cand_i - self._last_beat >= self._refr:
+                    beat = self._accept(self._cand_i, self._cand_v)
+                else:
+                    self.npk += 0.125 * (self._cand_v - self.npk)
+        elif h > self.thr and h > 0.0:
+            self._in_peak = True
+            self._cand_v, self._cand_i = h, i
+        else:
+            self.npk += self._a_noise * (abs(h) - self.npk)
+
+        # Sin latidos durante mucho tiempo: el nivel de pico decae (re-adquisición)
+        if self._last_beat is None or i - self._last_beat > self._max_rr:
+            self.spk *= self._decay
+        self.thr = self.npk + THR_FRAC * (self.spk - self.npk)
+        return beat
+
+    def _accept(self, idx, v):
+        self.spk += 0.125 * (v - self.spk) if self.spk > 0 else v
+        if self._last_beat is not None:
+            self.rr[self._rr_i] = (idx - self._last_beat) / self.fs
+            self._rr_i = (self._rr_i + 1) % RR_LEN
+            self.rr_count = min(self.rr_count + 1, RR_LEN)
+        self._last_beat = idx
+        self.beats.append(idx)
+        return idx
+
+    # ----- Estadísticas -----
+    def intervals(self):
+        """Intervalos RR (s) en orden cronológico."""
+        if self.rr_count < RR_LEN:
+            return self.rr[:self.rr_count].copy()
+        return np.roll(self.rr, -self._rr_i)
+
+    def stats(self):
+        """dict con bpm (instantáneo), bpm_avg, sdnn_ms, rmssd_ms; None si aún no hay datos."""
+        rr = self.intervals()
+        if rr.size == 0: return None
+        out = {"bpm": 60.0 / rr[-1], "bpm_avg": 60.0 / float(np.mean(rr)),
+               "sdnn_ms": 0.0, "rmssd_ms": 0.0}
+        if rr.size > 1:
+            out["sdnn_ms"] = float(np.std(rr, ddof=1)) * 1e3
+            out["rmssd_ms"] = float(np.sqrt(np.mean(np.diff(rr) ** 2))) * 1e3
+        return out
+
+    def summary(self):
+        s = self.stats()
+        if s is None: return "BPM: --"
+        return (f"BPM: {s['bpm']:.0f} (avg {s['bpm_avg']:.0f}) | "
+                f"SDNN {s['sdnn_ms']:.0f} ms  RMSSD {s['rmssd_ms']:.0f} ms")
+
+    def markers(self, visible):
+        """Posiciones x (0..visible-1) de los latidos dentro de las últimas `visible` muestras."""
+        first = self.n - visible
+        return [b - first for b in list(self.beats) if b >= first]
@@ -0,0 +1,109 @@
+import re
+import numpy as np
+
+# ===== Parámetros =====
+N_OUTPUTS_DEFAULT = 4          # canales de salida del firmware (ver OUT_PINS en el .ino)
+LEVEL_ON_DEFAULT = 255         # nivel por defecto de una regla activa (PWM 0..255)
+
+# Una condición: "Theta/Beta >= 1.5"  ó  "Alpha <= 0.2"
+_COND_RE = re.compile(r"^\s*([A-Za-z_]\w*)\s*(?:/\s*([A-Za-z_]\w*))?\s*(>=|<=)\s*([-+0-9.eE]+)\s*$")
+# Una salida: "1"  ó  "1=128"
+_OUT_RE = re.compile(r"^\s*(\d+)\s*(?:=\s*(\d+))?\s*$")
+
+
+class RuleEngine:
+    """Evalúa N reglas sobre el vector de bandas en una sola pasada vectorizada.
+
+    Sintaxis (reglas separadas por ';'):
+        Theta/Beta >= 1.5 -> 1=128; Alpha >= 0.3 & Beta <= 0.2 -> 0
+    Cada regla es un AND de condiciones; si varias reglas apuntan al mismo
+    canal gana el nivel más alto. Canales sin regla activa quedan en 0.
+    """
+
+    def __init__(self, feature_names, n_outputs=N_OUTPUTS_DEFAULT):
+        self.feature_names = list(feature_names)
+        self.n_outputs = int(n_outputs)
+        self.text = ""
+        self._compile([])
+
+    # ----- Compilación -----
+    def parse(self, text):
+        rules = []
+        for chunk in text.split(";"):
+            chunk = chunk.strip()
+            if not chunk: continue
+            if "->" not in chunk:
+                raise ValueError(f"Falta '->' en la regla: {chunk!r}")
+            lhs, rhs = chunk.split("->", 1)
+            m = _OUT_RE.match(rhs)
+            if not m:
+                raise ValueError(f"Salida inválida: {rhs.strip()!r}")
+            chan = int(m.group(1))
+            level = int(m.group(2)) if m.group(2) is not None else LEVEL_ON_DEFAULT
+            if not (0 <= chan < self.n_outputs):
+                raise ValueError(f"Canal fuera de rango (0..{self.n_outputs-1}): {chan}")
+            if not (0 <= level <= 255):
+                raise ValueError(f"Nivel fuera de rango (0..255): {level}")
+            conds = []
+            for part in lhs.split("&"):
+                c = _COND_RE.match(part)
+                if not c:
+                    raise ValueError(f"Condición inválida: {part.strip()!r}")
+                num, den, op, thr = c.groups()
+                conds.append((self._index(num), self._index(den) if den else None, op, float(thr)))
+            rules.append((conds, chan, level))
+        return rules
+
+    def set_rules(self, text):
+        """Compila el texto; si no cambió no hace nada (se llama cada tick)."""
+        if text == self.text: return
+        rules = self.parse(text)
+        self._compile(rules)
+        self.text = text
+
+    def _index(self, name):
+        for i, n in enumerate(self.feature_names):
+            if n.lower() == name.lower(): return i
+        raise ValueError(f"Banda desconocida: {name!r} (usa {', '.join(self.feature_names)})")
+
+    def _compile(self, rules):
+        # Tablas planas: una fila por condición, una por regla.
+        one = len(self.feature_names)          # índice del "1.0" (denominador neutro)
+        num, den, sign, thr, owner = [], [], [], [], []
+        chans, levels = [], []
+        for r, (conds, chan, level) in enumerate(rules):
+            for n_idx, d_idx, op, t in conds:
+                num.append(n_idx)
+                den.append(one if d_idx is None else d_idx)
+                sign.append(1.0 if op == ">=" else -1.0)
+                thr.append(t)
+                owner.append(r)
+            chans.append(chan); levels.append(level)
+        self._num = np.asarray(num, dtype=np.intp)
+        self._den = np.asarray(den, dtype=np.intp)
+        self._sign = np.asarray(sign, dtype=float)
+        self._thr = np.asarray(thr, dtype=float)
+        self._owner = np.asarray(owner, dtype=np.intp)
+        self._chans = np.asarray(chans, dtype=np.intp)
+        self._levels = np.asarray(levels, dtype=np.uint8)
+        self.n_rules = len(rules)
+
+    # ----- Evaluación -----
+    def evaluate(self, values):
+        """values: vector en el orden de feature_names -> (niveles uint8, reglas activas bool)."""
+        out = np.zeros(self.n_outputs, dtype=np.uint8)
+        if self.n_rules == 0:
+            return out, np.zeros(0, dtype=bool)
+        v = np.append(np.asarray(values, dtype=float), 1.0)
+        den = v[self._den]
+        ratio = v[self._num] / np.where(np.abs(den) > 1e-12, den, 1e-12)
+        ok = self._sign * (ratio - self._thr) >= 0.0
+        fails = np.bincount(self._owner, weights=~ok, minlength=self.n_rules)
+        active = fails == 0
+        np.maximum.at(out, self._chans, np.where(active, self._levels, 0).astype(np.uint8))
+        return out, active
+
+
+def encode_outputs(levels):
+    """Trama compacta multi-canal: b'O' + 2 dígitos hex por canal + b'\\n'."""
+    return b"O" + bytes(np.asarray(levels, dtype=np.uint8)).hex().upper().encode() + b"\n"
@@ -0,0 +1,302 @@
+import time, threading
+import numpy as np
+
+from sample_stream import (BLOCK_N, RATE_MIN, RATE_MAX, MARK_SHIFT, MARK_MAX, MARK_LED_ON, MARK_LED_OFF,
+                           SMOOTH_MAX, encode_block)
+
+# ===== Parámetros (mismos que los sketches) =====
+RATE_DEFAULT = 100
+RING_LEN = 256           # anillo del firmware (cabe RING_LEN-1)
+BAUD_DEFAULT = 115200
+N_OUT = 4
+
+
+def default_signal(t):
+    """Señal tipo EEG en cuentas ADC: alpha 10 Hz + theta 6 Hz + ruido, centrada en 512."""
+    rng = np.random.default_rng()
+    x = 512 + 120*np.sin(2*np.pi*10*t) + 60*np.sin(2*np.pi*6*t) + 25*rng.standard_normal(t.size)
+    return np.clip(np.round(x), 0, 1023)
+
+
+def make_signal(kind="eeg", freq=10.0, amp=300.0, noise=0.0):
+    """Generador de señal por nombre: eeg | sine | square | pulse | noise | ramp.
+
+    "ramp" cuenta 0..1023 una unidad por muestra tomada: sirve para detectar
+    huecos o duplicados en el receptor. "pulse" imita un pulso cardiaco (PPG) a
+    `freq` latidos por segundo para el detector de latidos.
+    """
+    rng = np.random.default_rng()
+    def shaped(x):
+        if noise: x = x + noise * rng.standard_normal(x.size)
+        return np.clip(np.round(x), 0, 1023)
+    if kind == "eeg":
+        return default_signal
+    if kind == "sine":
+        return lambda t: shaped(512 + amp * np.sin(2*np.pi*freq*t))
+    if kind == "square":
+        return lambda t: shaped(512 + amp * np.sign(np.sin(2*np.pi*freq*t)))
+    if kind == "pulse":
+        return lambda t: shaped(512 + amp * np.exp(-((t * freq) % 1.0) / 0.08) * (((t * freq) % 1.0) > 0.02))
+    if kind == "noise":
+        return lambda t: np.clip(np.round(512 + amp * rng.standard_normal(t.size)), 0, 1023)
+    if kind == "ramp":
+        state = [0]
+        def ramp(t):
+            x = (state[0] + np.arange(t.size)) % 1024
+            state[0] += t.size
+            return x
+        return ramp
+    raise ValueError(f"señal desconocida: {kind}")
+
+
+SIGNALS = ("eeg", "sine", "square", "pulse", "noise", "ramp")
+
+
+class FirmwareEmulator:
+    """Modelo en el host de sensor_raw.ino / sensor_led_range.ino con interfaz tipo pyserial.
+
+    Reproduce lo que importa para probar sin placa: muestreo exacto a `rate`
+    (t = n/rate), el anillo de RING_LEN muestras con desbordes, el límite de
+    bytes por segundo del baud rate, modo líneas/bloques y los comandos
+    '1'/'0', "O<hex>", "R<hz>", "B0|1", "M<id>", "P<id>,<ms>" y el control de
+    rango en la placa "C<low>,<high>,<n>,<dc_shift>" (misma aritmética entera
+    que la ISR; los cambios del LED llegan como MARK_LED_ON/OFF). Con clock=None
+    el tiempo sólo avanza con advance(dt) (pruebas deterministas); si no, sigue
+    al reloj real. `response(t)` opcional se suma tras cada marcador (un ERP
+    sintético, t = segundos desde el evento).
+    """
+
+    def __init__(self, signal=default_signal, rate=RATE_DEFAULT, baud=BAUD_DEFAULT,
+                 leds=True, clock=time.perf_counter, timeout=1.0, response=None):
+        self.signal = signal
+        self.response = response
+        self.baud = baud
+        self.leds = leds
+        self.clock = clock
+        self.timeout = timeout
+        self.is_open = True
+        self.lock = threading.RLock()
+        self.rate = int(min(RATE_MAX, max(RATE_MIN, int(rate))))
+        self.block_mode = False
+        self.outputs = [0] * N_OUT
+        self.commands = []             # (t_dispositivo, comando) en orden de llegada
+        self.overruns = 0
+        self._now = 0.0
+        self._t0 = clock() if clock else 0.0
+        self._rate_t0 = 0.0            # origen (t, n) de la tasa actual
+        self._rate_n0 = 0
+        self._t_uart = 0.0
+        self.n = 0                     # muestras tomadas
+        self._ring = []                # muestras aún no enviadas
+        self._out = bytearray()        # bytes listos para leer (buffer del USB)
+        self._budget = 0.0             # bytes que el UART pudo sacar
+        self._seq = 0
+        self._rx = None                # estado del parser de comandos
+        self._rx_buf = ""
+        self._mark_pending = 0         # id para la próxima muestra
+        self._last_mark_t = None       # t del último marcador (para `response`)
+        self._pulse_end = None         # índice de muestra en que se apaga el LED
+        self._lc = None                # control en la placa: (lo*n, hi*n, n, shift) en Q4
+        self.led_changes = []          # (índice de muestra, 0/1) decididos en la placa
+
+    # ----- Tiempo -----
+    def now(self):
+        return (self.clock() - self._t0) if self.clock else self._now
+
+    def advance(self, dt):
+        with self.lock:
+            self._now += dt
+            self._step()
+
+    def set_rate(self, hz):
+        with self.lock:
+            self._step()
+            self._rate_t0, self._rate_n0 = self.now(), self.n
+            self.rate = int(min(RATE_MAX, max(RATE_MIN, int(hz))))
+
+    def _step(self):
+        t = self.now()
+        target = self._rate_n0 + int((t - self._rate_t0) * self.rate)
+        k = target - self.n
+        if k > 0:
+            ts = self._rate_t0 + (np.arange(self.n, target) - self._rate_n0) / self.rate
+            vals = self.signal(ts)
+            if self._mark_pending:
+                self._last_mark_t = ts[0]
+            if self.response is not None and self._last_mark_t is not None:
+                dt = ts - self._last_mark_t
+                vals = vals + np.where(dt >= 0, self.response(np.maximum(dt, 0.0)), 0.0)
+            vals = np.clip(np.round(vals), 0, 1023).astype(int)
+            if self._lc is not None:
+                self._local_control(vals)
+            if self._mark_pending:
+                free = np.flatnonzero((vals >> MARK_SHIFT) == 0)   # el informe del LED tiene prioridad
+                if free.size:
+                    vals[free[0]] |= self._mark_pending << MARK_SHIFT
+                    self._mark_pending = 0
+            if self._pulse_end is not None and target >= self._pulse_end:
+                self.outputs[0] = 0
+                self._pulse_end = None
+            room = RING_LEN - 1 - len(self._ring)
+            if k > room:
+                self.overruns += k - room
+                vals = vals[:max(0, room)]
+            self._ring.extend(vals.tolist())
+            self.n = target
+        # El UART saca como mucho baud/10 bytes por segundo
+        self._budget = min(self._budget + (t - self._t_uart) * self.baud / 10.0, 4096.0)
+        self._t_uart = t
+        self._drain()
+
+    def _local_control(self, vals):
+        """Como localControl() del sketch: DC exponencial, suma de n y rango, muestra a muestra."""
+        lo_n, hi_n, n, shift = self._lc
+        st = self._lc_state
+        for i in range(vals.size):
+            x = int(vals[i]) << 4
+            if shift:
+                if st["dc"] is None: st["dc"] = x << 8
+                st["dc"] += ((x << 8) - st["dc"]) >> shift
+                x -= st["dc"] >> 8
+            j = st["i"]
+            st["sum"] += x - st["buf"][j]
+            st["buf"][j] = x
+            st["i"] = j + 1 if j + 1 < n else 0
+            on = 1 if lo_n <= st["sum"] <= hi_n else 0
+            if on != st["led"]:
+                st["led"] = on
+                self.outputs[0] = 255 if on else 0
+                vals[i] |= (MARK_LED_ON if on else MARK_LED_OFF) << MARK_SHIFT
+                self.led_changes.append((self.n + i, on))
+
+    def _drain(self):
+        if self.block_mode:
+            need = 5 + 2 * BLOCK_N
+            while len(self._ring) >= BLOCK_N and self._budget >= need:
+                block = self._ring[:BLOCK_N]; del self._ring[:BLOCK_N]
+                self._out += encode_block(self._seq, block)
+                self._seq = (self._seq + 1) & 0xFF
+                self._budget -= need
+        else:
+            i = 0
+            while i < len(self._ring):
+                line = f"{self._ring[i]}\r\n".encode()
+                if self._budget < len(line): break
+                self._out += line
+                self._budget -= len(line)
+                i += 1
+            del self._ring[:i]
+
+    # ----- Interfaz pyserial -----
+    @property
+    def in_waiting(self):
+        with self.lock:
+            self._step()
+            return len(self._out)
+
+    def read(self, size=1):
+        deadline = time.monotonic() + (self.timeout or 0)
+        while True:
+            with self.lock:
+                self._step()
+                if self._out or not self.clock or not self.is_open:
+                    data = bytes(self._out[:size]); del self._out[:size]
+                    return data
+            if time.monotonic() >= deadline: return b""
+            time.sleep(0.001)
+
+    def readline(self):
+        deadline = time.monotonic() + (self.timeout or 0)
+        while True:
+            with self.lock:
+                self._step()
+                j = self._out.find(b"\n")
+                if j >= 0:
+                    data = bytes(self._out[:j+1]); del self._out[:j+1]
+                    return data
+                if not self.clock or not self.is_open: return b""
+            if time.monotonic() >= deadline: return b""
+            time.sleep(0.001)
+
+    def write(self, data):
+        with self.lock:
+            self._step()
+            for c in data.decode(errors="ignore"):
+                self._rx_char(c)
+        return len(data)
+
+    def flush(self): pass
+
+    def reset_input_buffer(self):
+        with self.lock: self._out.clear()
+
+    def close(self):
+        self.is_open = False
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    # ----- Parser de comandos (igual que el sketch) -----
+    def _rx_char(self, c):
+        if self._rx in ("R", "B", "M", "P", "C"):
+            if c in "\r\n":
+                self._run(self._rx + self._rx_buf)
+                self._rx, self._rx_buf = None, ""
+            else:
+                self._rx_buf += c
+        elif self._rx == "O":
+            if c in "0123456789ABCDEFabcdef":
+                self._rx_buf += c
+                if len(self._rx_buf) % 2 == 0:
+                    ch = len(self._rx_buf) // 2 - 1
+                    if ch < N_OUT: self.outputs[ch] = int(self._rx_buf[-2:], 16)
+            else:
+                self._log("O" + self._rx_buf)
+                self._rx, self._rx_buf = None, ""
+        elif c in "ORBMPC":
+            self._rx, self._rx_buf = c, ""
+        elif c in "10" and self.leds:
+            self.outputs[0] = 255 if c == "1" else 0
+            self._log(c)
+
+    def _run(self, cmd):
+        self._log(cmd)
+        if cmd[0] == "R":
+            try: self.set_rate(int(cmd[1:]))
+            except ValueError: pass
+        elif cmd[0] == "B":
+            self.block_mode = cmd[1:2] == "1"
+        elif cmd[0] == "M":
+            try: self._mark_pending = int(cmd[1:]) & MARK_MAX
+            except ValueError: pass
+        elif cmd[0] == "P":
+            try:
+                ev, ms = cmd[1:].split(",")
+                n = max(1, int(ms) * self.rate // 1000)
+            except ValueError:
+                return
+            self.outputs[0] = 255
+            self._pulse_end = self.n + n
+            self._mark_pending = int(ev) & MARK_MAX
+        elif cmd[0] == "C":
+            self._set_local_control(cmd[1:])
+
+    def _set_local_control(self, args):
+        old, self._lc = self._lc, None
+        if not args:
+            self.outputs[0] = 0
+            return
+        try:
+            lo, hi, n, sh = args.split(",")
+            lo, hi, n, sh = float(lo), float(hi), int(n), int(sh)
+        except ValueError:
+            return
+        if lo > hi: lo, hi = hi, lo
+        n = min(SMOOTH_MAX, max(1, n)); sh = min(16, max(0, sh))
+        self._lc = (int(lo * 16.0) * n, int(hi * 16.0) * n, n, sh)
+        if old is not None and old[2:] == (n, sh):
+            return                     # sólo umbrales: DC, media móvil y LED siguen (como la placa)
+        self._lc_state = {"dc": None, "buf": [0] * SMOOTH_MAX, "i": 0, "sum": 0, "led": -1}
+
+    def _log(self, cmd):
+        self.commands.append((self.now(), cmd))
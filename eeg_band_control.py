@@ -7,6 +7,20 @@ from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.gridspec import GridSpec
 
+from control_rules import RuleEngine, encode_outputs
+from eeg_features import FeatureExtractor
+from tick_profiler import StageProfiler, CPROFILE_SEC
+from sample_stream import (BlockParser, rate_command, mode_command, marker_command, pulse_command,
+                           split_markers, split_line_marker, RATE_MIN, RATE_MAX)
+from ring_buffer import SampleRing
+from signal_graph import Pipeline, basic_chain
+from erp_engine import ErpAverager, PRE_S_DEFAULT, POST_S_DEFAULT
+from quantile_sketch import QuantileTracker
+from tone_tracker import ToneTracker
+from load_shedder import LoadShedder, minmax_decimate
+from device_emulator import FirmwareEmulator
+from serial_writer import SerialWriter, WRITE_TIMEOUT_S
+
 # ---- Serial (pyserial) ----
 try:
     import serial
@@ -21,6 +35,7 @@ except Exception:
 BUFFER_SEC_DEFAULT = 8.0
 FS_DEFAULT = 100.0
 WIN_SEC_DEFAULT = 2.0
+FAST_SEC_DEFAULT = 0.5     # ventana corta (respuesta rápida) calculada en paralelo
 SMOOTH_N_DEFAULT = 5
 AUTOY_DEFAULT = True
 
@@ -32,6 +47,14 @@ BANDS_DEFAULT = {
     "Gamma": (30.0, 45.0),
 }
 TOTAL_BAND = (1.0, 45.0)
+EMULATOR_PORT = "emu"     # puerto virtual: FirmwareEmulator en lugar de una placa
+BOARD_RESET_MS = 2000     # la placa se reinicia al abrir el puerto; se reenvía la tasa
+CONTROL_MS = 120          # periodo del lazo de control
+AUTO_PCT_DEFAULT = 75.0   # percentil de la línea base usado como umbral automático
+AUTO_BASELINE_S = 30.0    # duración de la calibración
+TONE_SEC_DEFAULT = 1.0    # ventana de la DFT deslizante de los tonos
+PLOT_MS = 40              # periodo del refresco = salto entre ventanas del historial
+BACKLOG_MAX = 200         # ventanas recuperadas como mucho por tick (= historial)
 
 # Colores (HEX) compatibles con Tk y Matplotlib
 BAND_COLORS = {
@@ -43,6 +66,7 @@ BAND_COLORS = {
 }
 TIME_COLOR = "#1f77b4"   # blue
 PSD_COLOR  = "#ff7f0e"   # orange
+ERP_COLORS = ["#1f77b4", "#d62728", "#2ca02c", "#9467bd", "#8c564b", "#e377c2"]
 
 class EEGBandControl(tk.Tk):
     def __init__(self):
@@ -53,16 +77,24 @@ class EEGBandControl(tk.Tk):
         # Serial / estado
         self.ser = None
         self.reader_thread = None
+        self.writer = None      # hilo escritor (comandos al Arduino)
         self.stop_event = threading.Event()
         self.connected = False
 
         # Parámetros
         self.fs = tk.DoubleVar(value=FS_DEFAULT)
+        self.buf_sec = tk.DoubleVar(value=BUFFER_SEC_DEFAULT)
         self.win_sec = tk.DoubleVar(value=WIN_SEC_DEFAULT)
+        self.fast_sec = tk.DoubleVar(value=FAST_SEC_DEFAULT)
+        self.ctl_res = tk.StringVar(value="fast")       # resolución a la que se suscribe el control
         self.smooth_n = tk.IntVar(value=SMOOTH_N_DEFAULT)
         self.auto_y = tk.BooleanVar(value=AUTOY_DEFAULT)
         self.rm_dc = tk.BooleanVar(value=True)
         self.zscore_vis = tk.BooleanVar(value=True)
+        self.block_mode = tk.BooleanVar(value=False)   # bloques binarios (kHz) en vez de líneas
+        self._block_rx = False                          # modo que usa el lector ahora mismo
+        self.rx_parser = None
+        self.rx_status = tk.StringVar(value="")
 
         # Control LED
         self.band_names = ["Delta", "Theta", "Alpha", "Beta", "Gamma"]
@@ -71,6 +103,24 @@ class EEGBandControl(tk.Tk):
         self.direction = tk.StringVar(value=">=")
         self.enable_ctl = tk.BooleanVar(value=False)
         self.last_sent = None
+        # Rasgos espectrales (fracciones de banda + PAF, SEF, entropía, Hjorth, cocientes)
+        self.features = FeatureExtractor(self.band_names, TOTAL_BAND)
+        self.feat_names = self.features.names
+        # Reglas multi-salida (vacío = usar banda/umbral de arriba sobre el canal 0)
+        self.rules_text = tk.StringVar(value="")
+        self.rule_engine = RuleEngine(self.feat_names)
+        # Umbral automático: percentil en streaming de cada rasgo (P² + adaptación lenta)
+        self.auto_thr = tk.BooleanVar(value=False)
+        self.auto_pct = tk.DoubleVar(value=AUTO_PCT_DEFAULT)
+        self.auto_base_s = tk.DoubleVar(value=AUTO_BASELINE_S)
+        self.auto_tracker = None
+        self._auto_key = None
+        # Tonos (SSVEP / banda estrecha): potencia en pocas frecuencias por DFT deslizante
+        self.tone_text = tk.StringVar(value="")
+        self.tone_sec = tk.DoubleVar(value=TONE_SEC_DEFAULT)
+        self.tone_status = tk.StringVar(value="")
+        self.tones = ToneTracker()
+        self.ctl_names = list(self.feat_names)         # entradas que ve el control ahora mismo
 
         # Rango de bandas
         self.band_vars = {}
@@ -82,9 +132,43 @@ class EEGBandControl(tk.Tk):
         self.band_hist_len = 200
         self.band_hist = {k: deque([0.0]*self.band_hist_len, maxlen=self.band_hist_len)
                           for k in self.band_names}
-
-        # Buffer crudo (se crea en connect)
+        # Historial de todos los rasgos (anillo) y rasgo a trazar
+        self.feat_hist = np.zeros((self.band_hist_len, len(self.feat_names)))
+        self.feat_hist_i = 0
+        self.feat_plot = tk.StringVar(value="(none)")
+
+        # Instrumentación (tiempos por etapa, fps, cProfile bajo demanda)
+        self.prof = StageProfiler()
+        self.prof_on = tk.BooleanVar(value=False)
+        # Degradación bajo carga: se sacrifica el dibujo antes que el control o las muestras
+        self.shedder = LoadShedder(CONTROL_MS / 1000.0)
+        self.load_status = tk.StringVar(value="")
+
+        # Eventos / ERP (marcadores estampados por el firmware en el flujo de muestras)
+        self.event_id = tk.IntVar(value=1)
+        self.pulse_ms = tk.DoubleVar(value=100.0)
+        self.epoch_pre = tk.DoubleVar(value=PRE_S_DEFAULT)
+        self.epoch_post = tk.DoubleVar(value=POST_S_DEFAULT)
+        self.erp = ErpAverager(FS_DEFAULT)
+        self.erp_status = tk.StringVar(value="")
+        self._event_seq = 0
+
+        # Buffer crudo (SampleRing, se crea en connect; Apply lo redimensiona en caliente)
         self.buffer = None
+        self._ring_resize = deque()  # capacidades pendientes: las aplica el lector entre dos lecturas
+        self._capacity = None        # capacidad pedida (la del anillo tras aplicar lo pendiente)
+        self._fs_applied = FS_DEFAULT
+        # Configuración de ventanas/cadena: se revalida sólo cuando cambia una variable
+        self._cfg = None
+        self._cfg_dirty = True
+        self.cfg_status = tk.StringVar(value="")
+        for v in (self.win_sec, self.fast_sec, self.smooth_n, self.rm_dc, self.zscore_vis,
+                  *(v for pair in self.band_vars.values() for v in pair)):
+            v.trace_add("write", self._mark_dirty)
+        # Cadena de etapas (signal_graph): DC -> suavizado -> [z-score vista] / PSD -> rasgos
+        self.chain = Pipeline()
+        self._cursors = {}          # consumidor -> final (abs.) de la última ventana procesada
+        self.lost_windows = 0       # ventanas que ya no estaban en el anillo al recuperar
 
         # ===== UI =====
         top = ttk.Frame(self, padding=8); top.pack(fill="x")
@@ -107,13 +191,30 @@ class EEGBandControl(tk.Tk):
 
         ttk.Label(top, text="Fs (Hz):").pack(side="left", padx=(12,2))
         ttk.Entry(top, textvariable=self.fs, width=7).pack(side="left")
+        ttk.Label(top, text="Buffer (s):").pack(side="left", padx=(6,2))
+        ttk.Entry(top, textvariable=self.buf_sec, width=5).pack(side="left")
+        ttk.Checkbutton(top, text="Blocks", variable=self.block_mode).pack(side="left", padx=(6,2))
+        ttk.Button(top, text="Apply", command=self.apply_settings).pack(side="left", padx=2)
+        ttk.Label(top, textvariable=self.cfg_status).pack(side="left", padx=(4,2))
+        ttk.Label(top, textvariable=self.rx_status).pack(side="left", padx=(4,2))
+        ttk.Label(top, textvariable=self.load_status).pack(side="left", padx=(4,2))
         ttk.Label(top, text="FFT window (s):").pack(side="left", padx=(12,2))
         ttk.Entry(top, textvariable=self.win_sec, width=7).pack(side="left")
+        ttk.Label(top, text="Fast (s):").pack(side="left", padx=(6,2))
+        ttk.Entry(top, textvariable=self.fast_sec, width=5).pack(side="left")
+        ttk.Label(top, text="Control on:").pack(side="left", padx=(6,2))
+        ttk.Combobox(top, values=["fast", "display", "tones"], textvariable=self.ctl_res, width=7,
+                     state="readonly").pack(side="left")
         ttk.Label(top, text="Smooth N:").pack(side="left", padx=(12,2))
         ttk.Entry(top, textvariable=self.smooth_n, width=5).pack(side="left")
         ttk.Checkbutton(top, text="Remove DC", variable=self.rm_dc).pack(side="left", padx=(12,2))
         ttk.Checkbutton(top, text="Z-score view", variable=self.zscore_vis).pack(side="left", padx=(6,2))
         ttk.Checkbutton(top, text="Auto Y", variable=self.auto_y).pack(side="left", padx=(6,2))
+        ttk.Checkbutton(top, text="Profile", variable=self.prof_on, command=self._toggle_profile).pack(side="left", padx=(6,2))
+        self.cprof_sec = tk.DoubleVar(value=CPROFILE_SEC)
+        ttk.Button(top, text="cProfile", command=self._start_cprofile).pack(side="left", padx=2)
+        ttk.Entry(top, textvariable=self.cprof_sec, width=4).pack(side="left")
+        ttk.Label(top, text="s").pack(side="left", padx=(1,2))
 
         mid = ttk.LabelFrame(self, text="Band ranges (Hz) & Control", padding=8)
         mid.pack(fill="x", padx=8, pady=(6,2))
@@ -130,18 +231,55 @@ class EEGBandControl(tk.Tk):
             ttk.Entry(fr, textvariable=hi_var, width=6).pack(side="left")
 
         row2 = ttk.Frame(mid); row2.pack(fill="x", pady=(8,0))
-        ttk.Label(row2, text="Control band:").pack(side="left")
-        self.band_cb = ttk.Combobox(row2, values=self.band_names, textvariable=self.selected_band, width=8, state="readonly")
+        ttk.Label(row2, text="Control input:").pack(side="left")
+        self.band_cb = ttk.Combobox(row2, values=self.feat_names, textvariable=self.selected_band, width=11, state="readonly")
         self.band_cb.pack(side="left", padx=4)
         self.dir_cb = ttk.Combobox(row2, values=[">=", "<="], textvariable=self.direction, width=4, state="readonly")
         self.dir_cb.pack(side="left", padx=4)
-        ttk.Label(row2, text="Threshold (0..1):").pack(side="left", padx=(6,2))
+        ttk.Label(row2, text="Threshold:").pack(side="left", padx=(6,2))
         ttk.Entry(row2, textvariable=self.threshold, width=6).pack(side="left")
-        ttk.Checkbutton(row2, text="Enable control (send 1/0)", variable=self.enable_ctl).pack(side="left", padx=10)
+        ttk.Checkbutton(row2, text="Auto", variable=self.auto_thr).pack(side="left", padx=(6,2))
+        ttk.Label(row2, text="pct").pack(side="left")
+        ttk.Entry(row2, textvariable=self.auto_pct, width=4).pack(side="left", padx=2)
+        ttk.Label(row2, text="baseline (s)").pack(side="left")
+        ttk.Entry(row2, textvariable=self.auto_base_s, width=4).pack(side="left", padx=2)
+        ttk.Button(row2, text="Recalibrate", command=self._recalibrate).pack(side="left", padx=2)
+        ttk.Checkbutton(row2, text="Enable control", variable=self.enable_ctl).pack(side="left", padx=10)
         ttk.Checkbutton(row2, text="Lines instead of bars", variable=self.lines_mode).pack(side="left", padx=12)
+        ttk.Label(row2, text="Feature trace:").pack(side="left")
+        ttk.Combobox(row2, values=["(none)"] + self.feat_names[len(self.band_names):], textvariable=self.feat_plot,
+                     width=11, state="readonly").pack(side="left", padx=4)
 
         self.ctl_status = tk.StringVar(value="LED: (no control)")
         ttk.Label(row2, textvariable=self.ctl_status).pack(side="left", padx=12)
+        self.tx_status = tk.StringVar(value="")
+        ttk.Label(row2, textvariable=self.tx_status).pack(side="left", padx=12)
+
+        row3 = ttk.Frame(mid); row3.pack(fill="x", pady=(6,0))
+        ttk.Label(row3, text="Rules:").pack(side="left")
+        ttk.Entry(row3, textvariable=self.rules_text, width=90).pack(side="left", padx=4, fill="x", expand=True)
+        ttk.Label(row3, text="e.g. Theta/Beta >= 1.5 -> 1=128; Alpha >= 0.3 & Beta <= 0.2 -> 0").pack(side="left", padx=6)
+
+        row4 = ttk.Frame(mid); row4.pack(fill="x", pady=(6,0))
+        ttk.Label(row4, text="Event id:").pack(side="left")
+        ttk.Entry(row4, textvariable=self.event_id, width=4).pack(side="left", padx=(2,6))
+        ttk.Button(row4, text="Marker", command=self.send_marker).pack(side="left")
+        ttk.Label(row4, text="Pulse (ms):").pack(side="left", padx=(12,2))
+        ttk.Entry(row4, textvariable=self.pulse_ms, width=6).pack(side="left")
+        ttk.Button(row4, text="Pulse", command=self.send_pulse).pack(side="left", padx=4)
+        ttk.Label(row4, text="Epoch pre/post (s):").pack(side="left", padx=(12,2))
+        ttk.Entry(row4, textvariable=self.epoch_pre, width=5).pack(side="left")
+        ttk.Entry(row4, textvariable=self.epoch_post, width=5).pack(side="left", padx=2)
+        ttk.Button(row4, text="Reset ERP", command=self.erp.reset).pack(side="left", padx=8)
+        ttk.Label(row4, textvariable=self.erp_status).pack(side="left", padx=8)
+
+        row5 = ttk.Frame(mid); row5.pack(fill="x", pady=(6,0))
+        ttk.Label(row5, text="Tones (Hz):").pack(side="left")
+        ttk.Entry(row5, textvariable=self.tone_text, width=24).pack(side="left", padx=(2,6))
+        ttk.Label(row5, text="Tone window (s):").pack(side="left")
+        ttk.Entry(row5, textvariable=self.tone_sec, width=5).pack(side="left", padx=(2,6))
+        ttk.Label(row5, text="(Control on: tones -> rules/threshold on F<hz>, no FFT)").pack(side="left", padx=6)
+        ttk.Label(row5, textvariable=self.tone_status).pack(side="left", padx=8)
 
         # ===== Fig & Axes (GridSpec con 3 filas) =====
         fig = Figure(figsize=(13.2, 7.0), dpi=100)
@@ -149,13 +287,16 @@ class EEGBandControl(tk.Tk):
 
         # Fila 0: señal (todo el ancho)
         self.ax_time  = fig.add_subplot(gs[0, :])
-        # Fila 1: PSD (todo el ancho para que respire)
-        self.ax_psd   = fig.add_subplot(gs[1, :])
+        # Fila 1: PSD (izquierda) + ERP (derecha)
+        self.ax_psd   = fig.add_subplot(gs[1, 0])
+        self.ax_erp   = fig.add_subplot(gs[1, 1])
         # Fila 2: Band power (todo el ancho)
         self.ax_bands = fig.add_subplot(gs[2, :])
 
         # Ajuste de espaciado
         fig.subplots_adjust(left=0.07, right=0.98, top=0.95, bottom=0.07, wspace=0.25, hspace=0.45)
+        self.prof_text = fig.text(0.075, 0.94, "", va="top", fontsize=7, family="monospace",
+                                  bbox=dict(facecolor="white", alpha=0.8, lw=0))
 
         # Traza temporal
         self.ax_time.set_title("EEG-like signal")
@@ -169,8 +310,18 @@ class EEGBandControl(tk.Tk):
         self.ax_psd.set_xlabel("Hz")
         self.ax_psd.set_ylabel("Power")
         self.psd_line, = self.ax_psd.plot([], [], lw=1, color=PSD_COLOR, label="PSD")
+        self.psd_fast_line, = self.ax_psd.plot([], [], lw=1, color=PSD_COLOR, alpha=0.35, label="PSD (fast)")
+        self.tone_pts, = self.ax_psd.plot([], [], "v", color="black", ms=6, label="Tones")
         self.ax_psd.grid(True, alpha=0.3)
 
+        # ERP (una línea por id de evento, se crean al aparecer)
+        self.ax_erp.set_title("ERP (event-locked average)")
+        self.ax_erp.set_xlabel("s from event")
+        self.ax_erp.axvline(0, lw=1, color="gray", alpha=0.6)
+        self.ax_erp.grid(True, alpha=0.3)
+        self.erp_lines = {}
+        self._erp_drawn = -1
+
         # Band power (barras por defecto, luego se puede alternar a líneas)
         self.ax_bands.set_title("Band power (fraction of total)")
         self.ax_bands.set_ylim(0, 1.0)
@@ -194,24 +345,31 @@ class EEGBandControl(tk.Tk):
             self.band_lines[name] = line
         self.ax_bands.legend(loc="upper right", fontsize=9)
 
+        # Rasgo seleccionado (eje derecho, escala propia)
+        self.ax_feat = self.ax_bands.twinx()
+        self.feat_line, = self.ax_feat.plot([], [], lw=1.4, ls="--", color="black")
+        self.ax_feat.set_visible(False)
+
         self.canvas = FigureCanvasTkAgg(fig, master=self)
         self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=8, pady=8)
+        self.prof.wrap(self.canvas, "draw", "draw")   # el render real ocurre en idle
+        self.shedder.wrap_draw(self.canvas)
 
         # Loops
-        self.after(40, self._tick_plot)
-        self.after(120, self._tick_control)
+        self.after(PLOT_MS, self._tick_plot)
+        self.after(CONTROL_MS, self._tick_control)
 
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     # ----- Serial -----
     def _scan_ports(self):
-        if not HAS_SERIAL: return []
-        return [p.device for p in list_ports.comports()]
+        if not HAS_SERIAL: return [EMULATOR_PORT]
+        return [p.device for p in list_ports.comports()] + [EMULATOR_PORT]
 
     def connect(self):
-        if not HAS_SERIAL:
-            messagebox.showerror("Serial", "Instala pyserial: pip install pyserial"); return
         port = self.port_var.get().strip()
+        if not HAS_SERIAL and port != EMULATOR_PORT:
+            messagebox.showerror("Serial", "Instala pyserial: pip install pyserial"); return
         if not port:
             messagebox.showinfo("Port", "Selecciona o escribe un COM."); return
         try:
@@ -219,40 +377,130 @@ class EEGBandControl(tk.Tk):
         except ValueError:
             messagebox.showerror("Baud", "Baud inválido."); return
 
-        fs = max(10.0, float(self.fs.get() or FS_DEFAULT))
-        buf_len = int(BUFFER_SEC_DEFAULT * fs)
-        buf_len = max(200, buf_len)
-        self.buffer = deque([0.0]*buf_len, maxlen=buf_len)
+        settings = self._settings()
+        if settings is None: return
+        fs, self._capacity = settings
+        self._fs_applied = fs
+        self._cfg_dirty = True
+        self._ring_resize.clear()
+        self.buffer = SampleRing(self._capacity, fill=0.0)
+        self._cursors.clear()
+        self.erp.pending.clear()
+        self.tones.reset()
 
         try:
-            self.ser = serial.Serial(port, baudrate=baud, timeout=1)
-            time.sleep(0.3)
+            if port == EMULATOR_PORT:
+                self.ser = FirmwareEmulator(rate=fs, baud=baud)
+            else:
+                self.ser = serial.Serial(port, baudrate=baud, timeout=1, write_timeout=WRITE_TIMEOUT_S)
+                time.sleep(0.3)
         except Exception as e:
             messagebox.showerror("Connect", f"No se pudo abrir {port}:\n{e}")
             self.ser = None; return
 
         self.stop_event.clear()
+        self.writer = SerialWriter(self.ser).start()
         self.reader_thread = threading.Thread(target=self._reader, daemon=True)
         self.reader_thread.start()
         self.connected = True
         self.last_sent = None
+        self._apply_rate()
+        self.after(BOARD_RESET_MS, self._apply_rate)
+
+    def _apply_rate(self):
+        """Envía Fs y modo (líneas/bloques) al firmware; el lector cambia de parser."""
+        if self.writer is None: return
+        self._block_rx = self.block_mode.get()
+        self.writer.send(rate_command(self._fs_applied), key="rate")
+        self.writer.send(mode_command(self._block_rx), key="mode")
+
+    def _rate(self):
+        """Fs pedida si el firmware puede muestrear a esa tasa; si no, aviso y None."""
+        try:
+            fs = float(self.fs.get())
+        except (tk.TclError, ValueError):
+            fs = None
+        if fs is None or not RATE_MIN <= fs <= RATE_MAX:
+            messagebox.showerror("Fs", f"Fs debe estar entre {RATE_MIN} y {RATE_MAX} Hz."); return None
+        return fs
+
+    def _settings(self):
+        """(fs, capacidad del anillo) validadas desde la UI, o None (con aviso)."""
+        fs = self._rate()
+        if fs is None: return None
+        try:
+            buf_sec = float(self.buf_sec.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Settings", "Buffer inválido."); return None
+        try:
+            cfg = self._make_config(fs)
+        except ValueError as e:
+            messagebox.showerror("Settings", str(e)); return None
+        capacity = max(200, int(round(buf_sec * fs)))
+        if capacity < cfg["Nmax"]:
+            messagebox.showerror("Settings", f"Buffer más corto que la ventana FFT ({cfg['Nmax'] / fs:g} s)."); return None
+        return fs, capacity
+
+    def apply_settings(self):
+        """Fs y duración del anillo en caliente, sin reconectar.
+
+        Se validan juntas; el anillo se redimensiona conservando sus muestras
+        (y el índice absoluto, así cursores y marcadores siguen valiendo) en el
+        hilo lector entre dos lecturas, y la cadena se reconfigura una vez
+        entre dos saltos. Las ventanas que cruzan un cambio de Fs mezclan
+        ambas tasas hasta que el anillo se renueva.
+        """
+        settings = self._settings()
+        if settings is None: return
+        fs, capacity = settings
+        self._fs_applied = fs
+        self._cfg_dirty = True
+        if capacity != self._capacity:
+            self._capacity = capacity
+            if self.connected:
+                self._ring_resize.append(capacity)
+            elif self.buffer is not None:
+                self.buffer = self.buffer.resized(capacity)
+        self._apply_rate()
 
     def disconnect(self):
         self.stop_event.set()
         self.connected = False
+        if self.writer is not None:
+            self.writer.close()   # espera una escritura en curso y cierra el puerto
+            self.writer = None
         try:
             if self.ser and self.ser.is_open: self.ser.close()
         except Exception: pass
         self.ser = None
 
     def _reader(self):
+        parser = self.rx_parser = BlockParser()
         with self.ser:
             while not self.stop_event.is_set():
+                while self._ring_resize:   # entre dos lecturas: no se pierde ninguna muestra
+                    self.buffer = self.buffer.resized(self._ring_resize.popleft())
                 try:
+                    if self._block_rx:
+                        # Bloques: se lee lo disponible y se añade de una vez
+                        data = self.ser.read(self.ser.in_waiting or 1)
+                        if not data: continue
+                        t_r = self.prof.t()
+                        vals, pos, ids = split_markers(parser.feed(data))
+                        base = self.buffer.total
+                        if vals.size: self.buffer.extend(vals)
+                        for p, ev in zip(pos.tolist(), ids.tolist()):
+                            self.erp.add_marker(base + p, ev)
+                        self.prof.add("reader", t_r)
+                        continue
                     line = self.ser.readline().decode(errors="ignore").strip()
                     if not line: continue
-                    val = float(line)
+                    t_r = self.prof.t()
+                    val, ev = split_line_marker(float(line))
+                    if ev:   # marcador de evento en los bits altos
+                        self.erp.add_marker(self.buffer.total, ev)
                     self.buffer.append(val)
+                    self.prof.add("reader", t_r)
                 except ValueError:
                     continue
                 except Exception:
@@ -260,55 +508,150 @@ class EEGBandControl(tk.Tk):
         self.connected = False
 
     # ----- Procesamiento -----
-    def _get_windowed_signal(self):
-        if self.buffer is None or len(self.buffer) < 10:
-            return None, None, None
-        fs = max(10.0, float(self.fs.get() or FS_DEFAULT))
-        win_sec = max(0.5, float(self.win_sec.get() or WIN_SEC_DEFAULT))
-        N = int(round(fs * win_sec))
-        if N < 32: N = 32
-        if len(self.buffer) < N:
-            return None, None, None
-
-        x = np.array(list(self.buffer)[-N:], dtype=float)
-        if self.rm_dc.get():
-            x = x - np.mean(x)
-
-        Nsmooth = max(1, int(self.smooth_n.get() or 1))
-        if Nsmooth > 1 and N >= Nsmooth:
-            cumsum = np.cumsum(np.insert(x, 0, 0.0))
-            x = (cumsum[Nsmooth:] - cumsum[:-Nsmooth]) / float(Nsmooth)
-            pad = np.full(N - x.size, x[0])
-            x = np.concatenate([pad, x])
-
-        x_vis = x.copy()
-        if self.zscore_vis.get():
-            std = np.std(x_vis)
-            if std < 1e-9: std = 1.0
-            x_vis = (x_vis - np.mean(x_vis)) / std
-        return x, x_vis, fs
-
-    def _compute_psd(self, x, fs):
-        N = x.size
-        if N < 32: return None, None
-        w = np.hanning(N)
-        X = np.fft.rfft(x * w, n=N)
-        psd = (np.abs(X) ** 2) / (np.sum(w**2))
-        freqs = np.fft.rfftfreq(N, d=1.0/fs)
-        return freqs, psd
-
-    def _band_power(self, freqs, psd, lo, hi):
-        idx = np.where((freqs >= lo) & (freqs <= hi))[0]
-        if idx.size == 0: return 0.0
-        return float(np.sum(psd[idx]))
+    def _run_chain(self, key, period_s):
+        """Cadena sobre todas las ventanas pendientes del consumidor `key`; None si no hay ninguna.
+
+        Cada consumidor (gráfica, control) avanza un salto de `period_s` por
+        ventana, con su propio cursor (índice absoluto del final de la última
+        ventana procesada). Si el hilo de Tk se atrasó (arrastre de ventana,
+        messagebox, redibujado lento), las k ventanas que faltan se cortan de
+        una vez del anillo (SampleRing.gather) y pasan por la cadena como un
+        lote: una sola STFT por lotes, así el historial no tiene huecos.
+
+        Las dos resoluciones ("display" = FFT window, "fast") salen de la misma
+        señal procesada con una sola FFT por lotes (etapa mpsd) y un solo cálculo
+        de rasgos; cada consumidor toma la suya (los de "fast" salen de su PSD
+        interpolada a la rejilla de la ventana larga, ver MultiPsd). Devuelve
+        el ctx de Pipeline.run, con una fila por ventana: "x"/"vis" (la
+        gráfica usa las últimas "n_view" muestras de la última fila), "freqs",
+        "psd"/"psd_fast" y "feat"/"feat_fast" (orden de self.feat_names), más
+        "ends" (final de cada ventana) y "lost" (ventanas que el anillo ya
+        había sobrescrito).
+        Cada etapa queda cronometrada en el perfilador con su nombre.
+        """
+        buf = self.buffer           # el lector puede publicar otro anillo (redimensionado) entre ticks
+        if buf is None or len(buf) < 10:
+            return None
+        cfg = self._config()
+        if cfg is None: return None
+        fs, N, Nmax = cfg["fs"], cfg["N"], cfg["Nmax"]
+        if len(buf) < Nmax or buf.capacity < Nmax:
+            return None
+
+        # Ventanas pendientes: finales en last + hop, last + 2*hop, ... <= total
+        hop = max(1, int(round(fs * period_s)))
+        total = buf.total
+        last = self._cursors.get(key)
+        if last is None or last > total: last = total - hop
+        k = (total - last) // hop
+        if k <= 0: return None
+        first = last + hop
+        # Ventana más vieja aún entera en el anillo, con un salto de margen: el
+        # lector sigue escribiendo mientras se copia
+        oldest = total - len(buf) + Nmax + hop
+        lost = max(0, -(-(oldest - first) // hop))
+        lost = max(lost, k - BACKLOG_MAX)
+        lost = min(lost, k - 1)
+        ends = first + hop * np.arange(lost, k)
+        self._cursors[key] = int(ends[-1])
+
+        x = buf.gather(ends - Nmax, Nmax)
+        # Filas que el lector alcanzó aun así durante la copia (vienen rotas): fuera
+        torn = int(np.count_nonzero(ends - Nmax < buf.total - buf.capacity))
+        if torn:
+            if torn == ends.size: return None
+            x, ends, lost = x[torn:], ends[torn:], lost + torn
+        return self.chain.run(x, prof=self.prof, fs=fs, n_view=N, ends=ends, lost=lost)
+
+    def _mark_dirty(self, *_):
+        self._cfg_dirty = True
+
+    def _make_config(self, fs):
+        """Ventanas y spec de la cadena para `fs` desde la UI; ValueError si algo no vale."""
+        try:
+            win_sec = float(self.win_sec.get()); fast_sec = float(self.fast_sec.get())
+            smooth = int(self.smooth_n.get())
+            dc, zs = self.rm_dc.get(), self.zscore_vis.get()
+        except (tk.TclError, ValueError):
+            raise ValueError("Ventana / Smooth N inválidos.")
+        N = max(32, int(round(fs * max(0.5, win_sec))))
+        Nf = max(32, int(round(fs * fast_sec)))
+        Nmax = max(N, Nf)
+        lo, hi = self._band_edges()
+        spec = basic_chain(dc, max(1, smooth), tap="x")
+        if zs: spec.append({"stage": "zscore", "tap": "vis"})
+        spec.append({"stage": "mpsd", "input": "x", "wins": (("display", N), ("fast", Nf)), "detrend": dc,
+                     "tap": "psd_all"})
+        spec.append({"stage": "features", "extractor": self.features,
+                     "lo": tuple(lo), "hi": tuple(hi), "tap": "feat_all"})
+        for res, sfx in (("display", ""), ("fast", "_fast")):
+            spec.append({"stage": "pick", "input": "psd_all", "res": res, "tap": "psd" + sfx})
+            spec.append({"stage": "pick", "input": "feat_all", "res": res, "tap": "feat" + sfx})
+        return {"fs": fs, "N": N, "Nf": Nf, "Nmax": Nmax, "spec": spec}
+
+    def _config(self):
+        """Configuración vigente de ventanas y cadena; se rehace sólo tras un cambio.
+
+        Las variables avisan al cambiar (trace) y aquí, entre dos saltos, se
+        valida y se reconfigura la cadena una sola vez (planes de PSD y de
+        bandas incluidos), igual para todos los consumidores. Un valor inválido
+        o a medio escribir deja la configuración anterior.
+        """
+        if not self._cfg_dirty: return self._cfg
+        self._cfg_dirty = False
+        try:
+            cfg = self._make_config(self._fs_applied)
+            if self._capacity is not None and cfg["Nmax"] > self._capacity:
+                raise ValueError("Ventana FFT más larga que el buffer.")
+        except ValueError as e:
+            self.cfg_status.set(str(e))
+            return self._cfg
+        self.chain.configure(cfg["spec"])
+        self._cfg = cfg
+        self.cfg_status.set("")
+        return cfg
+
+    def _update_tones(self):
+        """Configura el rastreador con los tonos escritos y le pasa las muestras nuevas; potencias o None."""
+        if self.buffer is None: return None
+        try:
+            freqs = [float(v) for v in self.tone_text.get().replace(",", " ").split()]
+            fs = self._fs_applied
+            n = int(round(fs * max(0.1, float(self.tone_sec.get()))))
+        except (tk.TclError, ValueError):
+            return None
+        self.tones.configure(fs, freqs, min(n, self.buffer.capacity))
+        if not self.tones.freqs: return None
+        self.tones.update(self.buffer)
+        return self.tones.power() if self.tones.ready else None
+
+    def _band_edges(self):
+        lo = np.empty(len(self.band_names)); hi = np.empty(len(self.band_names))
+        for i, name in enumerate(self.band_names):
+            try:
+                a = float(self.band_vars[name][0].get())
+                b = float(self.band_vars[name][1].get())
+            except Exception:
+                a, b = BANDS_DEFAULT[name]
+            lo[i], hi[i] = min(a, b), max(a, b)
+        return lo, hi
 
     # ----- Plot loop -----
     def _tick_plot(self):
-        x, x_vis, fs = self._get_windowed_signal()
-        if x is not None:
-            # Señal temporal
-            y = x_vis
-            self.time_line.set_data(np.arange(y.size), y)
+        shed = self.shedder
+        wait = shed.yield_to_control()
+        if wait:   # el control vence antes de lo que tarda un refresco: dibujar después
+            self.after(int(wait * 1000) + 1, self._tick_plot); return
+        t_shed = time.perf_counter()
+        prof = self.prof
+        t_tick = prof.begin("plot", shed.plot_ms / 1000.0)
+        t = prof.t()
+        r = self._run_chain("plot", PLOT_MS / 1000.0)
+        prof.add("chain", t)
+        if r is not None:
+            # Señal temporal (última ventana del lote)
+            y = r.get("vis", r["x"])[-1, -r["n_view"]:]
+            self.time_line.set_data(*minmax_decimate(y, shed.max_points))
             self.ax_time.set_xlim(0, y.size-1)
             if self.auto_y.get():
                 ymin, ymax = float(np.min(y)), float(np.max(y))
@@ -317,86 +660,244 @@ class EEGBandControl(tk.Tk):
                 self.ax_time.set_ylim(ymin - pad, ymax + pad)
 
             # PSD + bandas
-            freqs, psd = self._compute_psd(x, fs)
-            if freqs is not None:
-                self.psd_line.set_data(freqs, psd)
-                self.ax_psd.set_xlim(0, max(50.0, float(np.max(freqs))))
-                if np.max(psd) > 0: self.ax_psd.set_ylim(0, float(np.max(psd))*1.1)
-
-                total_lo, total_hi = TOTAL_BAND
-                p_total = self._band_power(freqs, psd, total_lo, total_hi)
-                bars = []
+            freqs, psd = r["freqs"], r["psd"][-1]
+            self.psd_line.set_data(freqs, psd)
+            self.psd_fast_line.set_visible(shed.panels)
+            if shed.panels: self.psd_fast_line.set_data(freqs, r["psd_fast"][-1])
+            self.ax_psd.set_xlim(0, max(50.0, float(np.max(freqs))))
+            if np.max(psd) > 0: self.ax_psd.set_ylim(0, float(np.max(psd))*1.1)
+            pw = self._update_tones()
+            if pw is not None and np.all(np.isfinite(pw)):
+                self.tone_pts.set_data(self.tones.freqs, pw)
+                self.tone_status.set("  ".join(f"{n}={v:.3g}" for n, v in zip(self.tones.names, pw)))
+            else:
+                self.tone_pts.set_data([], [])
+                self.tone_status.set("")
+
+            # Historial: una entrada por ventana del lote (también las recuperadas tras un atasco)
+            batch = r["feat"]
+            k = batch.shape[0]
+            feats = batch[-1]
+            bars = feats[:len(self.band_names)]
+            for i, name in enumerate(self.band_names):
+                self.band_hist[name].extend(batch[:, i].tolist())
+            self.feat_hist[(self.feat_hist_i + np.arange(k)) % self.band_hist_len] = batch
+            self.feat_hist_i = (self.feat_hist_i + k) % self.band_hist_len
+            self.lost_windows += r["lost"]
+            backlog = f" | caught up {k} windows" if k > 1 else ""
+            if self.lost_windows: backlog += f" | lost {self.lost_windows}"
+            feat_name = self.feat_plot.get()
+            feat_col = self.feat_names.index(feat_name) if feat_name in self.feat_names else None
+
+            # Toggle barras vs líneas
+            show_lines = self.lines_mode.get()
+            if show_lines:
+                # Oculta barras
+                for rect in self.bar_rects:
+                    rect.set_visible(False)
+                # Muestra líneas con historial y ajusta ejes
+                x_hist = np.arange(self.band_hist_len)
                 for name in self.band_names:
-                    lo = float(self.band_vars[name][0].get())
-                    hi = float(self.band_vars[name][1].get())
-                    if lo > hi: lo, hi = hi, lo
-                    p = self._band_power(freqs, psd, lo, hi)
-                    frac = (p / p_total) if p_total > 1e-12 else 0.0
-                    bars.append(frac)
-                    # actualizar historial para líneas
-                    self.band_hist[name].append(frac)
-
-                # Toggle barras vs líneas
-                show_lines = self.lines_mode.get()
-                if show_lines:
-                    # Oculta barras
-                    for rect in self.bar_rects:
-                        rect.set_visible(False)
-                    # Muestra líneas con historial y ajusta ejes
-                    x_hist = np.arange(self.band_hist_len)
-                    for name in self.band_names:
-                        y_hist = list(self.band_hist[name])
-                        line = self.band_lines[name]
-                        line.set_data(x_hist, y_hist)
-                        line.set_visible(True)
-                    self.ax_bands.set_xlim(0, self.band_hist_len-1)
-                    self.ax_bands.set_ylim(0, 1.0)
-                else:
-                    # Muestra barras y actualiza alturas + ejes
-                    for rect, v in zip(self.bar_rects, bars):
-                        rect.set_height(v)
-                        rect.set_visible(True)
-                    for name in self.band_names:
-                        self.band_lines[name].set_visible(False)
-                    self.ax_bands.set_xticks(self.x_pos)
-                    self.ax_bands.set_xticklabels(self.band_names, fontsize=10)
-                    self.ax_bands.set_xlim(-0.6, len(self.band_names)-0.4)
-                    self.ax_bands.set_ylim(0, 1.0)
-                    self.ax_bands.margins(x=0.05)
-
+                    y_hist = list(self.band_hist[name])
+                    line = self.band_lines[name]
+                    line.set_data(x_hist, y_hist)
+                    line.set_visible(True)
+                self.ax_bands.set_xlim(0, self.band_hist_len-1)
+                self.ax_bands.set_ylim(0, 1.0)
+                self.ax_bands.set_title("Band power (fraction of total)" + backlog)
+                if feat_col is not None:
+                    y_feat = np.roll(self.feat_hist[:, feat_col], -self.feat_hist_i)
+                    self.feat_line.set_data(x_hist, y_feat)
+                    lo_f, hi_f = float(np.min(y_feat)), float(np.max(y_feat))
+                    if hi_f <= lo_f: hi_f = lo_f + 1.0
+                    self.ax_feat.set_ylim(lo_f, hi_f + 0.1*(hi_f - lo_f))
+                    self.ax_feat.set_ylabel(feat_name)
+                self.ax_feat.set_visible(feat_col is not None)
+            else:
+                # Muestra barras y actualiza alturas + ejes
+                for rect, v in zip(self.bar_rects, bars):
+                    rect.set_height(v)
+                    rect.set_visible(True)
+                for name in self.band_names:
+                    self.band_lines[name].set_visible(False)
+                self.ax_bands.set_xticks(self.x_pos)
+                self.ax_bands.set_xticklabels(self.band_names, fontsize=10)
+                self.ax_bands.set_xlim(-0.6, len(self.band_names)-0.4)
+                self.ax_bands.set_ylim(0, 1.0)
+                self.ax_bands.margins(x=0.05)
+                self.ax_feat.set_visible(False)
+                title = "Band power (fraction of total)"
+                if feat_col is not None:
+                    title += f" | {feat_name} = {feats[feat_col]:.3g}"
+                self.ax_bands.set_title(title + backlog)
+
+        if self.buffer is not None:
+            t = prof.t()
+            self._update_erp(draw=shed.panels)
+            prof.add("erp", t)
+        if self._block_rx and self.rx_parser is not None:
+            self.rx_status.set(self.rx_parser.status())
+        if prof.enabled: self.prof_text.set_text(prof.summary())
         self.canvas.draw_idle()
-        self.after(40, self._tick_plot)
+        prof.end("plot", t_tick)
+        shed.render_tick(time.perf_counter() - t_shed)
+        self.after(shed.plot_ms, self._tick_plot)   # el historial sigue en saltos de PLOT_MS (_run_chain)
+
+    # ----- Eventos / ERP -----
+    def _send_event(self, cmd):
+        if self.writer is None:
+            messagebox.showinfo("Events", "Connect first."); return
+        # clave única: los eventos nunca se coalescen entre sí
+        self._event_seq += 1
+        self.writer.send(cmd, key=("event", self._event_seq))
+
+    def send_marker(self):
+        self._send_event(marker_command(self.event_id.get()))
+
+    def send_pulse(self):
+        self._send_event(pulse_command(self.event_id.get(), self.pulse_ms.get()))
+
+    def _update_erp(self, draw=True):
+        try:
+            self.erp.configure(self._fs_applied, float(self.epoch_pre.get()), float(self.epoch_post.get()))
+        except (tk.TclError, ValueError):
+            pass
+        self.erp.update(self.buffer)
+        ids = self.erp.ids()
+        counts = ", ".join(f"id {ev}: n={self.erp.count(ev)}" for ev in ids)
+        self.erp_status.set(f"{counts} | pending {len(self.erp.pending)} | dropped {self.erp.dropped}")
+        if not draw or self.erp.version == self._erp_drawn: return
+        self._erp_drawn = self.erp.version
+        for i, ev in enumerate(ids):
+            line = self.erp_lines.get(ev)
+            if line is None:
+                line, = self.ax_erp.plot([], [], lw=1.4, color=ERP_COLORS[i % len(ERP_COLORS)], label=f"id {ev}")
+                self.erp_lines[ev] = line
+                self.ax_erp.legend(loc="upper right", fontsize=8)
+            line.set_data(self.erp.times, self.erp.mean(ev))
+        for ev in list(self.erp_lines):
+            if ev not in ids:
+                self.erp_lines.pop(ev).remove()
+        if ids:
+            lo = min(float(np.min(self.erp.mean(ev))) for ev in ids)
+            hi = max(float(np.max(self.erp.mean(ev))) for ev in ids)
+            if hi <= lo: hi = lo + 1.0
+            pad = 0.1 * (hi - lo)
+            self.ax_erp.set_xlim(self.erp.times[0], self.erp.times[-1])
+            self.ax_erp.set_ylim(lo - pad, hi + pad)
 
     # ----- Control LED -----
+    def _control_rules(self):
+        text = self.rules_text.get().strip()
+        if text: return text
+        # Modo clásico: una banda, un umbral, LED en el canal 0
+        thr = float(self.threshold.get() or 0.3)
+        return f"{self.selected_band.get()} {self.direction.get()} {thr} -> 0"
+
     def _tick_control(self):
-        if self.enable_ctl.get() and self.connected and self.ser is not None:
-            x, _, fs = self._get_windowed_signal()
-            if x is not None:
-                freqs, psd = self._compute_psd(x, fs)
-                if freqs is not None:
-                    band = self.selected_band.get()
-                    try:
-                        lo = float(self.band_vars[band][0].get())
-                        hi = float(self.band_vars[band][1].get())
-                        if lo > hi: lo, hi = hi, lo
-                    except Exception:
-                        lo, hi = BANDS_DEFAULT.get(band, (8.0, 12.0))
-                    total_lo, total_hi = TOTAL_BAND
-                    p_total = self._band_power(freqs, psd, total_lo, total_hi)
-                    p_band  = self._band_power(freqs, psd, lo, hi)
-                    frac = (p_band / p_total) if p_total > 1e-12 else 0.0
-
-                    thr = float(self.threshold.get() or 0.3)
-                    cond = (frac >= thr) if self.direction.get() == ">=" else (frac <= thr)
-                    want = '1' if cond else '0'
+        t_tick = self.prof.begin("control", CONTROL_MS / 1000.0)
+        self.shedder.control_begin()
+        auto = self.auto_thr.get()
+        if (self.enable_ctl.get() or auto) and self.connected and self.writer is not None:
+            calibrating = False
+            # El control se suscribe a la resolución elegida (rápida por defecto) o a los tonos
+            res = self.ctl_res.get()
+            if res == "tones":
+                feats = self._update_tones()           # DFT deslizante: sin FFT ni cadena
+                rows = None if feats is None else feats[None, :]
+                self._set_control_names(self.tones.names)
+            else:
+                # Tras un atasco llegan todas las ventanas perdidas: la línea base del
+                # umbral automático las ve todas; la salida se decide con la última
+                r = self._run_chain("control", CONTROL_MS / 1000.0)
+                rows = None if r is None else (r["feat_fast"] if res == "fast" else r["feat"])
+                feats = None if rows is None else rows[-1]
+                self._set_control_names(self.feat_names)
+            if feats is not None and auto:
+                for row in rows:
+                    calibrating = self._auto_threshold(row)
+                if calibrating: self.last_sent = None   # al terminar se reenvía el estado
+            if feats is not None and self.enable_ctl.get() and not calibrating:
+                try:
+                    self.rule_engine.set_rules(self._control_rules())
+                except ValueError as e:
+                    self.ctl_status.set(f"Rules: {e}")
+                else:
+                    levels, active = self.rule_engine.evaluate(feats)
+                    # Todas las salidas del ciclo van en una sola trama
+                    want = encode_outputs(levels)
                     if want != self.last_sent:
-                        try:
-                            self.ser.write(want.encode())
-                            self.last_sent = want
-                            self.ctl_status.set(f"LED: {'ON' if want=='1' else 'OFF'} | {band}={frac:.2f} (thr {self.direction.get()} {thr:.2f})")
-                        except Exception:
-                            pass
-        self.after(120, self._tick_control)
+                        self.writer.send(want)   # no bloquea: lo escribe el hilo escritor
+                        self.last_sent = want
+                        outs = " ".join(f"{i}:{v}" for i, v in enumerate(levels))
+                        self.ctl_status.set(f"OUT {outs} | {int(active.sum())}/{active.size} rules active")
+            self.tx_status.set(self.writer.status())
+        self._update_load()
+        self.shedder.control_end()
+        self.prof.end("control", t_tick)
+        self.after(CONTROL_MS, self._tick_control)
+
+    def _update_load(self):
+        backlog = 0
+        if self.connected and self.ser is not None:
+            try:
+                backlog = self.ser.in_waiting   # muestras que el lector aún no ha leído
+            except Exception:
+                pass
+        self.shedder.update(backlog)
+        self.load_status.set(self.shedder.status())
+
+    def _set_control_names(self, names):
+        """Cambia las entradas del control (rasgos de la FFT o tonos): reglas, selector y umbral automático."""
+        if list(names) == self.ctl_names: return
+        self.ctl_names = list(names)
+        self.rule_engine = RuleEngine(self.ctl_names)
+        self.band_cb["values"] = self.ctl_names
+        if self.ctl_names and self.selected_band.get() not in self.ctl_names:
+            self.selected_band.set(self.ctl_names[0])
+        self.auto_tracker = None
+        self.last_sent = None
+
+    def _auto_threshold(self, feats):
+        """Alimenta el rastreador de percentiles y fija el umbral del rasgo elegido.
+
+        Devuelve True mientras dura la línea base (el control espera).
+        """
+        try:
+            key = (float(self.auto_pct.get()), float(self.auto_base_s.get()))
+        except (tk.TclError, ValueError):
+            return False
+        if key != self._auto_key or self.auto_tracker is None:
+            p = min(99.0, max(1.0, key[0])) / 100.0
+            n = max(5, int(key[1] * 1000.0 / CONTROL_MS))
+            self.auto_tracker = QuantileTracker(len(self.ctl_names), p, baseline_n=n)
+            self._auto_key = key
+        tr = self.auto_tracker
+        tr.update(feats)
+        name = self.selected_band.get()
+        if name in self.ctl_names:
+            v = tr.value[self.ctl_names.index(name)]
+            if np.isfinite(v): self.threshold.set(round(float(v), 4))
+        if tr.calibrating:
+            self.ctl_status.set(f"Auto: baseline {tr.progress()*100:.0f}% (p{key[0]:g})")
+            return True
+        return False
+
+    def _recalibrate(self):
+        if self.auto_tracker is not None: self.auto_tracker.reset()
+
+    # ----- Perfilado -----
+    def _toggle_profile(self):
+        self.prof.enabled = self.prof_on.get()
+        self.prof.reset()
+        if not self.prof.enabled: self.prof_text.set_text("")
+
+    def _start_cprofile(self):
+        try:
+            sec = float(self.cprof_sec.get())
+        except (tk.TclError, ValueError):
+            sec = CPROFILE_SEC
+        self.prof.start_cprofile(self, seconds=max(0.5, sec))
 
     # ----- Cierre -----
     def on_close(self):
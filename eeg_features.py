@@ -0,0 +1,136 @@
+import numpy as np
+
+# ===== Parámetros =====
+TOTAL_BAND_DEFAULT = (1.0, 45.0)
+ALPHA_FALLBACK = (8.0, 12.0)   # rango para PAF si no hay banda "Alpha"
+
+# Rasgos escalares (además de la fracción y potencia absoluta de cada banda)
+SPECTRAL_FEATURES = [
+    "TotalPower",   # potencia en TOTAL_BAND
+    "PAF",          # peak alpha frequency (Hz)
+    "SEF50",        # frecuencia mediana (Hz)
+    "SEF90",        # spectral edge 90 % (Hz)
+    "Centroid",     # centroide espectral (Hz)
+    "Entropy",      # entropía espectral normalizada (0..1)
+    "HjorthAct",    # actividad (≈ varianza)
+    "HjorthMob",    # movilidad (Hz)
+    "HjorthCpx",    # complejidad
+    "Theta/Beta",
+    "Alpha/Theta",
+]
+
+
+class FeatureExtractor:
+    """Rasgos EEG calculados desde la PSD ya existente, en lote.
+
+    `psd` puede tener forma (F,), (canales, F) o (canales, ventanas, F): todo se
+    vectoriza sobre los ejes iniciales. Bandas, potencia total, centroide y los
+    momentos espectrales (m0, m2, m4) para Hjorth salen de una sola matmul contra
+    una matriz de pesos cacheada, así que no hace falta volver a la señal.
+    """
+
+    def __init__(self, band_names, total_band=TOTAL_BAND_DEFAULT):
+        self.band_names = list(band_names)
+        self.total_band = total_band
+        self.names = (list(self.band_names)
+                      + [f"{b}_abs" for b in self.band_names]
+                      + SPECTRAL_FEATURES)
+        self._lo = self._hi = None
+        self._plan = None
+        self._plan_key = None
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def set_bands(self, lo, hi):
+        lo = np.asarray(lo, dtype=float); hi = np.asarray(hi, dtype=float)
+        if self._lo is None or not (np.array_equal(lo, self._lo) and np.array_equal(hi, self._hi)):
+            self._lo, self._hi = lo, hi
+            self._plan_key = None
+
+    # ----- Plan (matriz de pesos) cacheado por rejilla de frecuencias -----
+    def _get_plan(self, freqs):
+        key = (freqs.size, float(freqs[0]), float(freqs[-1]))
+        if key == self._plan_key: return self._plan
+        nb = len(self.band_names)
+        t_lo, t_hi = self.total_band
+        t0 = int(np.searchsorted(freqs, t_lo, side="left"))
+        t1 = int(np.searchsorted(freqs, t_hi, side="right"))
+        if "Alpha" in self.band_names:
+            a = self.band_names.index("Alpha"); a_lo, a_hi = self._lo[a], self._hi[a]
+        else:
+            a_lo, a_hi = ALPHA_FALLBACK
+        # Una sola matmul psd @ W da: potencias de banda, total, Σf·P (centroide), m0, m2, m4
+        w = 2.0 * np.pi * freqs
+        W = np.zeros((freqs.size, nb + 5))
+        for i in range(nb):
+            W[:, i] = (freqs >= self._lo[i]) & (freqs <= self._hi[i])
+        W[t0:t1, nb] = 1.0
+        W[t0:t1, nb+1] = freqs[t0:t1]
+        W[:, nb+2] = 1.0
+        W[:, nb+3] = w ** 2
+        W[:, nb+4] = w ** 4
+        idx = lambda n: self.band_names.index(n) if n in self.band_names else None
+        self._plan = {
+            "W": W, "t0": t0, "t1": t1,
+            "a0": int(np.searchsorted(freqs, a_lo, side="left")),
+            "a1": int(np.searchsorted(freqs, a_hi, side="right")),
+            "f_tot": freqs[t0:t1],
+            "log_n": np.log(max(2, t1 - t0)),
+            "var_k": 1.0 / max(1, freqs.size - 1),   # PSD unilateral -> varianza aprox.
+            "theta": idx("Theta"), "beta": idx("Beta"), "alpha": idx("Alpha"),
+        }
+        self._plan_key = key
+        return self._plan
+
+    # ----- Cálculo -----
+    def compute(self, freqs, psd):
+        if self._lo is None:
+            raise RuntimeError("Llama a set_bands() antes de compute()")
+        psd = np.asarray(psd, dtype=float)
+        P = self._get_plan(freqs)
+        nb = len(self.band_names)
+        k = 2 * nb
+        eps = 1e-12
+        out = np.zeros(psd.shape[:-1] + (len(self.names),))
+
+        S = psd @ P["W"]
+        p_abs = S[..., :nb]
+        p_tot = S[..., nb]
+        m0, m2, m4 = S[..., nb+2], S[..., nb+3], S[..., nb+4]
+        den_tot = np.maximum(p_tot, eps)
+        ok = p_tot > eps
+
+        out[..., :nb] = p_abs / den_tot[..., None]
+        out[..., nb:k] = p_abs
+        out[..., k] = p_tot
+
+        # PAF: máximo dentro de alpha
+        a0, a1 = P["a0"], P["a1"]
+        if a1 > a0:
+            out[..., k+1] = freqs[a0 + np.argmax(psd[..., a0:a1], axis=-1)] * ok
+
+        # SEF50/SEF90, centroide y entropía sobre la banda total
+        t0, t1 = P["t0"], P["t1"]
+        if t1 > t0:
+            pn = psd[..., t0:t1] / den_tot[..., None]
+            cum = np.cumsum(pn, axis=-1)
+            f_tot = P["f_tot"]; last = t1 - t0 - 1
+            out[..., k+2] = f_tot[np.minimum((cum < 0.5).sum(axis=-1), last)] * ok
+            out[..., k+3] = f_tot[np.minimum((cum < 0.9).sum(axis=-1), last)] * ok
+            out[..., k+4] = S[..., nb+1] / den_tot
+            out[..., k+5] = -(pn * np.log(pn + 1e-300)).sum(axis=-1) / P["log_n"]
+
+        # Hjorth desde momentos espectrales (toda la PSD)
+        mob = np.sqrt(m2 / np.maximum(m0, eps))
+        out[..., k+6] = m0 * P["var_k"]
+        out[..., k+7] = mob / (2.0 * np.pi)
+        out[..., k+8] = np.sqrt(m4 / np.maximum(m2, eps)) / np.maximum(mob, eps)
+
+        # Cocientes
+        th, be, al = P["theta"], P["beta"], P["alpha"]
+        if th is not None and be is not None:
+            out[..., k+9] = p_abs[..., th] / np.maximum(p_abs[..., be], eps)
+        if al is not None and th is not None:
+            out[..., k+10] = p_abs[..., al] / np.maximum(p_abs[..., th], eps)
+        return out
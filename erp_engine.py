@@ -0,0 +1,105 @@
+from collections import deque
+import numpy as np
+
+# ===== Parámetros =====
+PRE_S_DEFAULT = 0.2       # s antes del evento (línea base)
+POST_S_DEFAULT = 0.8      # s después del evento
+
+
+class _Cond:
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self, L):
+        self.n = 0
+        self.mean = np.zeros(L)
+        self.m2 = np.zeros(L)
+
+
+class ErpAverager:
+    """Promedio ERP en línea: épocas alrededor de cada marcador, por id de evento.
+
+    Los marcadores (índice absoluto de muestra, id) llegan desde el lector;
+    update() corta de una vez, con SampleRing.gather(), todas las épocas cuyo
+    post-estímulo ya está en el anillo y las funde con la media/varianza
+    acumuladas (Welford/Chan por lotes). No se copia el buffer por evento ni
+    se guardan las épocas: memoria fija por condición.
+    """
+
+    def __init__(self, fs, pre_s=PRE_S_DEFAULT, post_s=POST_S_DEFAULT, baseline=True):
+        self.pending = deque()        # (abs_idx, id) aún sin post-estímulo completo
+        self.baseline = baseline
+        self.dropped = 0              # épocas que el anillo ya había sobrescrito
+        self.version = 0
+        self._key = None
+        self.configure(fs, pre_s, post_s)
+
+    def configure(self, fs, pre_s, post_s):
+        pre_n = max(0, int(round(pre_s * fs)))
+        post_n = max(1, int(round(post_s * fs)))
+        if self._key == (fs, pre_n, post_n): return
+        self._key = (fs, pre_n, post_n)
+        self.fs, self.pre_n, self.post_n = fs, pre_n, post_n
+        self.L = pre_n + post_n
+        self.times = (np.arange(self.L) - pre_n) / fs
+        self.reset()
+
+    def reset(self):
+        self.conds = {}
+        self.version += 1             # cambia con cada dato nuevo o reset
+
+    def add_marker(self, abs_idx, ev_id):
+        self.pending.append((int(abs_idx), int(ev_id)))
+
+    # ----- Acumulación -----
+    def update(self, ring):
+        """Procesa los eventos listos; devuelve cuántas épocas se añadieron."""
+        ready = []
+        limit = ring.total - self.post_n
+        while self.pending and self.pending[0][0] <= limit:
+            ready.append(self.pending.popleft())
+        if not ready: return 0
+        idx = np.array([r[0] for r in ready], dtype=np.int64)
+        ids = np.array([r[1] for r in ready])
+        starts = idx - self.pre_n
+        ok = starts >= max(0, ring.total - ring.capacity)   # el relleno inicial no cuenta
+        self.dropped += int((~ok).sum())
+        if not ok.any(): return 0
+        starts, ids = starts[ok], ids[ok]
+
+        E = ring.gather(starts, self.L)                       # (k, L)
+        if self.baseline and self.pre_n > 0:
+            E = E - E[:, :self.pre_n].mean(axis=1, keepdims=True)
+        for ev in np.unique(ids):
+            B = E[ids == ev]
+            c = self.conds.get(int(ev))
+            if c is None:
+                c = self.conds[int(ev)] = _Cond(self.L)
+            nb = B.shape[0]
+            mb = B.mean(axis=0)
+            m2b = ((B - mb) ** 2).sum(axis=0)
+            n = c.n + nb
+            d = mb - c.mean
+            c.mean += d * (nb / n)
+            c.m2 += m2b + d * d * (c.n * nb / n)
+            c.n = n
+        self.version += 1
+        return int(ok.sum())
+
+    # ----- Resultados -----
+    def ids(self):
+        return sorted(self.conds)
+
+    def count(self, ev_id):
+        c = self.conds.get(ev_id)
+        return 0 if c is None else c.n
+
+    def mean(self, ev_id):
+        return self.conds[ev_id].mean
+
+    def var(self, ev_id):
+        c = self.conds[ev_id]
+        return c.m2 / (c.n - 1) if c.n > 1 else np.zeros(self.L)
+
+    def sem(self, ev_id):
+        c = self.conds[ev_id]
+        return np.sqrt(self.var(ev_id) / c.n) if c.n > 1 else np.zeros(self.L)
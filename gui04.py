@@ -1,3 +1,4 @@
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 from collections import deque
@@ -5,7 +6,8 @@ from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 BUFFER_LEN  = 300       # muestras visibles
-INTERVAL_MS = 40        # ~25 Hz (cada tick)
+INTERVAL_MS = 40        # ~25 Hz (cada tick de dibujo)
+SIM_FS      = 100       # Hz, muestras simuladas (el pulso se cronometra en muestras, no en ticks)
 Y_RANGE     = 1023      # eje: [-Y_RANGE, +Y_RANGE]
 
 class PulseWidthApp(tk.Tk):
@@ -18,7 +20,11 @@ class PulseWidthApp(tk.Tk):
         self.buffer = deque([0]*BUFFER_LEN, maxlen=BUFFER_LEN)
         self.running = True
         self.pulse_value = 0.0
-        self.pulse_ticks_left = 0   # cuántos ticks quedan del pulso
+        self.pulse_start = 0        # muestra absoluta en que empieza el pulso
+        self.pulse_end = 0          # primera muestra después del pulso
+        self.n = 0                  # muestras generadas
+        self.t0 = time.perf_counter()
+        self.markers = deque()      # muestras absolutas de inicio de pulso
 
         # UI superior
         top = ttk.Frame(self, padding=10)
@@ -41,7 +47,7 @@ class PulseWidthApp(tk.Tk):
         fig = Figure(figsize=(7.6, 3.6), dpi=100)
         self.ax = fig.add_subplot(111)
         self.ax.set_title("Señal + pulso con duración")
-        self.ax.set_xlabel("muestras")
+        self.ax.set_xlabel(f"muestras ({SIM_FS} Hz)")
         self.ax.set_ylabel("amplitud")
         self.ax.set_xlim(0, BUFFER_LEN-1)
         self.ax.set_ylim(-Y_RANGE, Y_RANGE)
@@ -49,6 +55,7 @@ class PulseWidthApp(tk.Tk):
         self.ax.axhline(0, lw=1, alpha=0.6)
 
         (self.line,) = self.ax.plot(range(BUFFER_LEN), list(self.buffer), lw=1)
+        (self.mark_line,) = self.ax.plot([], [], "v", color="tab:red", ms=7)
         self.canvas = FigureCanvasTkAgg(fig, master=self)
         self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=(0,10))
 
@@ -69,29 +76,43 @@ class PulseWidthApp(tk.Tk):
             messagebox.showerror("Duración inválida", f"No es numérica: {self.ms_var.get()}")
             return
 
-        # Limitar al rango visible y a una duración mínima de un tick
+        # Limitar al rango visible y a una duración mínima de una muestra.
+        # El inicio es la muestra que corresponde al instante del clic.
         val = max(-Y_RANGE, min(Y_RANGE, val))
-        ticks = max(1, int(round(dur_ms / INTERVAL_MS)))
+        n_samples = max(1, int(round(dur_ms * SIM_FS / 1000)))
+        start = max(self.n, self._sample_now())
 
         self.pulse_value = val
-        self.pulse_ticks_left = ticks
+        self.pulse_start = start
+        self.pulse_end = start + n_samples
+        self.markers.append(start)
+
+    def _sample_now(self):
+        return int((time.perf_counter() - self.t0) * SIM_FS)
 
     def clear_line(self):
         self.buffer.clear()
         for _ in range(BUFFER_LEN):
             self.buffer.append(0)
+        self.markers.clear()
         self.line.set_ydata(self.buffer)
+        self.mark_line.set_data([], [])
         self.canvas.draw_idle()
 
     def _tick(self):
-        # Si queda pulso, usarlo; si no, 0
-        if self.pulse_ticks_left > 0:
-            sample = self.pulse_value
-            self.pulse_ticks_left -= 1
-        else:
-            sample = 0.0
-
-        self.buffer.append(sample)
+        # Genera todas las muestras que tocan desde el último tick; el pulso
+        # ocupa exactamente [pulse_start, pulse_end) aunque el tick se retrase.
+        target = self._sample_now()
+        for k in range(max(self.n, target - BUFFER_LEN), target):
+            in_pulse = self.pulse_start <= k < self.pulse_end
+            self.buffer.append(self.pulse_value if in_pulse else 0.0)
+        self.n = max(self.n, target)
+
+        first = self.n - BUFFER_LEN
+        while self.markers and self.markers[0] < first:
+            self.markers.popleft()
+        xs = [m - first for m in self.markers if m < self.n]
+        self.mark_line.set_data(xs, [Y_RANGE * 0.95] * len(xs))
         self.line.set_ydata(self.buffer)
         self.canvas.draw_idle()
 
@@ -0,0 +1,129 @@
+import time
+import numpy as np
+
+# ===== Parámetros =====
+# Niveles de degradación: (periodo de la gráfica ms, puntos máx. de la traza (0 = todos), paneles secundarios)
+LEVELS = (
+    (40, 0, True),
+    (80, 4000, True),
+    (160, 2000, True),
+    (320, 1000, False),
+)
+EVAL_S = 1.0             # ventana de medida entre decisiones
+RECOVER_S = 3.0          # holgura sostenida necesaria para bajar un nivel
+LATE_MAX = 0.5           # retraso del control tolerado (fracción de su periodo)
+SHARE_MAX = 0.5          # fracción del hilo de Tk que puede irse en dibujar
+BACKLOG_BYTES = 2048     # bytes esperando en el puerto (el lector no da abasto)
+EWMA_A = 0.2
+
+
+class LoadShedder:
+    """Prioridades entre adquisición, control, procesamiento y dibujo en un solo hilo de Tk.
+
+    Si dibujar tarda, el tick de control llega tarde y el lector (otro hilo,
+    mismo GIL) se atrasa. Cada EVAL_S se mide el peor retraso del control,
+    la fracción del tiempo que se va en la gráfica (tick + draw) y los bytes
+    que esperan en el puerto; si algo pasa de su límite se sube un nivel
+    (LEVELS: refresco más lento, traza diezmada, paneles secundarios
+    congelados) y con holgura sostenida RECOVER_S se baja uno. Además la
+    gráfica cede el turno si el control vence antes de lo que suele tardar
+    un refresco. Siempre activo: cuesta un perf_counter por tick.
+    """
+
+    def __init__(self, control_s):
+        self.control_s = float(control_s)
+        self.level = 0
+        self.render_cost = 0.0     # EWMA de tick de gráfica + draw (s)
+        self.share = 0.0           # última medida mostrada en la UI
+        self.late = 0.0
+        self.backlog = 0
+        self._t_due = None         # vencimiento del próximo tick de control
+        self._late = 0.0
+        self._busy = 0.0
+        self._backlog = 0
+        self._tick = 0.0
+        self._t_eval = time.perf_counter()
+        self._calm_since = None
+
+    @property
+    def plot_ms(self): return LEVELS[self.level][0]
+
+    @property
+    def max_points(self): return LEVELS[self.level][1]
+
+    @property
+    def panels(self): return LEVELS[self.level][2]
+
+    # ----- Medidas -----
+    def control_begin(self):
+        if self._t_due is not None:
+            self._late = max(self._late, (time.perf_counter() - self._t_due) / self.control_s)
+
+    def control_end(self):
+        self._t_due = time.perf_counter() + self.control_s
+
+    def render_tick(self, dt):
+        """Duración del tick de gráfica (el draw llega aparte por wrap_draw)."""
+        self._busy += dt
+        self._tick = dt
+
+    def wrap_draw(self, canvas):
+        fn = canvas.draw
+        def timed(*a, **kw):
+            t0 = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                dt = time.perf_counter() - t0
+                self._busy += dt
+                self.render_cost += EWMA_A * (self._tick + dt - self.render_cost)
+        canvas.draw = timed
+
+    def yield_to_control(self):
+        """Segundos que la gráfica debe esperar para no pisar el próximo control (0 = dibujar ya)."""
+        if self._t_due is None: return 0.0
+        due = self._t_due - time.perf_counter()
+        return due + 0.002 if 0.0 < due < self.render_cost else 0.0
+
+    # ----- Decisión -----
+    def update(self, backlog=0):
+        """Llamar desde el tick de control; True si cambió el nivel."""
+        self._backlog = max(self._backlog, int(backlog))
+        now = time.perf_counter()
+        span = now - self._t_eval
+        if span < EVAL_S: return False
+        self.share, self.late, self.backlog = self._busy / span, self._late, self._backlog
+        self._t_eval, self._busy, self._late, self._backlog = now, 0.0, 0.0, 0
+        over = self.late > LATE_MAX or self.share > SHARE_MAX or self.backlog > BACKLOG_BYTES
+        calm = self.late < LATE_MAX / 2 and self.share < SHARE_MAX / 3 and self.backlog <= BACKLOG_BYTES // 4
+        old = self.level
+        if over:
+            self.level = min(len(LEVELS) - 1, self.level + 1)
+            self._calm_since = None
+        elif calm and self.level:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= RECOVER_S:
+                self.level -= 1
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        return self.level != old
+
+    def status(self):
+        s = f"Load L{self.level}: {self.plot_ms} ms"
+        if self.max_points: s += f", ≤{self.max_points} pts"
+        if not self.panels: s += ", panels paused"
+        return s + f" | draw {self.share*100:.0f}%, ctl late {self.late*100:.0f}%, rx {self.backlog} B"
+
+
+def minmax_decimate(y, max_points):
+    """(x, y) de la traza con como mucho ~max_points puntos: envolvente min/max por tramo."""
+    n = y.size
+    if not max_points or n <= max_points:
+        return np.arange(n), y
+    per = -(-n // (max_points // 2))
+    m = n // per * per
+    seg = y[n - m:].reshape(-1, per)                 # se recorta el principio: lo reciente queda entero
+    x = (n - m) + np.arange(seg.shape[0]) * per + per / 2.0
+    return np.repeat(x, 2), np.column_stack((seg.min(axis=1), seg.max(axis=1))).ravel()
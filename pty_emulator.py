@@ -0,0 +1,136 @@
+import os, sys, time, tty, select, threading, argparse
+
+from device_emulator import FirmwareEmulator, make_signal, SIGNALS, BAUD_DEFAULT, RATE_DEFAULT
+
+# ===== Parámetros =====
+POLL_S = 0.002           # periodo del bombeo emulador <-> pty
+TX_MAX = 65536           # bytes pendientes hacia el pty antes de dejar de vaciar el emulador
+
+
+class PtyEmulator:
+    """Publica un FirmwareEmulator como puerto serie real (pseudo-terminal, Linux/macOS).
+
+    Cualquier programa lo abre como una placa: serial.Serial(emu.port, ...).
+    Un hilo bombea los bytes del emulador al pty y los comandos del pty al
+    emulador, que registra la hora de llegada de cada uno en emu.commands.
+    Si el cliente no lee, el pty se llena, el anillo del firmware emulado se
+    desborda y se cuentan overruns, igual que en la placa.
+    """
+
+    def __init__(self, emulator=None, link=None, **kw):
+        self.emu = emulator if emulator is not None else FirmwareEmulator(**kw)
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)           # sin eco ni traducción de fin de línea
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            if os.path.islink(link): os.unlink(link)
+            os.symlink(self.port, link)
+            self.port = link
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._tx = bytearray()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._pump, daemon=True)
+        self.thread.start()
+        return self
+
+    def _pump(self):
+        emu = self.emu
+        while not self.stop_event.is_set():
+            r, _, _ = select.select([self.master], [], [], POLL_S)
+            if r:
+                try:
+                    data = os.read(self.master, 4096)
+                except (BlockingIOError, InterruptedError):
+                    data = b""
+                except OSError:
+                    break
+                if data:
+                    self.bytes_in += len(data)
+                    emu.write(data)
+            if len(self._tx) < TX_MAX:
+                n = emu.in_waiting
+                if n: self._tx += emu.read(n)
+            if self._tx:
+                try:
+                    k = os.write(self.master, self._tx)
+                except (BlockingIOError, InterruptedError):
+                    k = 0
+                except OSError:
+                    break
+                del self._tx[:k]
+                self.bytes_out += k
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None: self.thread.join(1.0)
+        self.emu.close()
+        for fd in (self.master, self.slave):
+            try: os.close(fd)
+            except OSError: pass
+        if self.link and os.path.islink(self.link): os.unlink(self.link)
+
+    def __enter__(self): return self.start()
+    def __exit__(self, *exc): self.stop()
+
+    def status(self):
+        e = self.emu
+        return (f"{e.n} samples @ {e.rate} Hz | overruns {e.overruns} | "
+                f"rx {self.bytes_in} B, tx {self.bytes_out} B | cmds {len(e.commands)}")
+
+
+def write_command_log(commands, path):
+    """Guarda (t_dispositivo, comando) como CSV."""
+    with open(path, "w") as f:
+        f.write("t_s,command\n")
+        for t, cmd in commands:
+            f.write(f"{t:.6f},{cmd}\n")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Arduino (sensor_raw / sensor_led_range) emulado en un pty")
+    ap.add_argument("--rate", type=float, default=RATE_DEFAULT, help="Hz de muestreo iniciales")
+    ap.add_argument("--baud", type=int, default=BAUD_DEFAULT)
+    ap.add_argument("--signal", choices=SIGNALS, default="eeg")
+    ap.add_argument("--freq", type=float, default=10.0, help="Hz de la señal (sine/square/pulse)")
+    ap.add_argument("--amp", type=float, default=300.0)
+    ap.add_argument("--noise", type=float, default=0.0)
+    ap.add_argument("--block", action="store_true", help="arrancar en modo bloques (como tras 'B1')")
+    ap.add_argument("--no-leds", action="store_true", help="ignorar '1'/'0' (sensor_raw.ino)")
+    ap.add_argument("--link", help="symlink estable al pty, p.ej. /tmp/ttyEMU0")
+    ap.add_argument("--log", help="CSV con la hora de llegada de cada comando")
+    ap.add_argument("--seconds", type=float, default=0, help="0 = hasta Ctrl+C")
+    ap.add_argument("--quiet", action="store_true", help="no imprimir los comandos al llegar")
+    a = ap.parse_args(argv)
+
+    emu = FirmwareEmulator(signal=make_signal(a.signal, a.freq, a.amp, a.noise), rate=a.rate,
+                           baud=a.baud, leds=not a.no_leds)
+    emu.block_mode = a.block
+    with PtyEmulator(emu, link=a.link) as pty:
+        print(f"Emulador en {pty.port}  (Ctrl+C para salir)", flush=True)
+        t_end = time.monotonic() + a.seconds if a.seconds > 0 else None
+        shown = 0
+        try:
+            while t_end is None or time.monotonic() < t_end:
+                time.sleep(0.1)
+                cmds = emu.commands
+                if not a.quiet:
+                    for t, cmd in cmds[shown:]:
+                        print(f"{t:10.4f}  {cmd}", flush=True)
+                shown = len(cmds)
+        except KeyboardInterrupt:
+            pass
+        print(pty.status())
+    if a.log:
+        write_command_log(emu.commands, a.log)
+        print(f"{len(emu.commands)} comandos -> {a.log}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
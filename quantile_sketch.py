@@ -0,0 +1,100 @@
+import numpy as np
+
+# ===== Parámetros =====
+BASELINE_N_DEFAULT = 250     # observaciones de calibración (≈30 s a 8 ticks/s)
+ADAPT_DEFAULT = 0.005        # paso de la adaptación lenta (fracción de la dispersión base)
+
+
+class QuantileTracker:
+    """Percentil en streaming de K señales a la vez, memoria constante y sin ordenar.
+
+    Fase 1 (calibración, `baseline_n` observaciones): estimador P² de Jain &
+    Chlamtac, 5 marcadores por señal, vectorizado sobre las K señales.
+    Fase 2: el umbral sigue adaptándose despacio con una actualización
+    estocástica  q += adapt * escala * (p - [x < q]),  con la escala (distancia
+    entre los marcadores p/2 y (1+p)/2) congelada al final de la línea base.
+    `p` puede ser un escalar o un vector (un percentil por señal).
+    """
+
+    def __init__(self, n_streams, p, baseline_n=BASELINE_N_DEFAULT, adapt=ADAPT_DEFAULT):
+        self.K = int(n_streams)
+        self.baseline_n = int(baseline_n)
+        self.adapt = float(adapt)
+        self.set_p(p)
+
+    def set_p(self, p):
+        p = np.broadcast_to(np.asarray(p, dtype=float), (self.K,)).copy()
+        if np.any((p <= 0) | (p >= 1)):
+            raise ValueError("percentil fuera de (0, 1)")
+        self.p = p
+        self._dn = np.stack([np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)], axis=1)
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self._init = np.empty((5, self.K))
+        self.q = np.zeros((self.K, 5))           # alturas de los marcadores
+        self.pos = np.zeros((self.K, 5))         # posiciones reales
+        self.want = np.zeros((self.K, 5))        # posiciones deseadas
+        self._thr = np.full(self.K, np.nan)
+        self._scale = None
+
+    @property
+    def calibrating(self):
+        return self.n < self.baseline_n
+
+    def progress(self):
+        return min(1.0, self.n / max(1, self.baseline_n))
+
+    @property
+    def value(self):
+        """Umbral actual por señal (nan hasta tener 5 observaciones)."""
+        if self._scale is not None: return self._thr
+        if self.n < 5: return self._thr
+        return self.q[:, 2]
+
+    # ----- Actualización -----
+    def update(self, x):
+        x = np.broadcast_to(np.asarray(x, dtype=float), (self.K,))
+        if not np.all(np.isfinite(x)): return
+        if self.n < 5:
+            self._init[self.n] = x
+            self.n += 1
+            if self.n == 5:
+                self.q = np.sort(self._init, axis=0).T.copy()   # sólo 5 valores, una vez
+                self.pos = np.tile(np.arange(1.0, 6.0), (self.K, 1))
+                self.want = 1.0 + 4.0 * self._dn
+            return
+        self.n += 1
+        if self._scale is not None:
+            # Fase 2: adaptación lenta alrededor del percentil de la línea base
+            self._thr += self.adapt * self._scale * (self.p - (x < self._thr))
+            return
+        self._p2(x)
+        if self.n >= self.baseline_n:
+            self._thr = self.q[:, 2].copy()
+            self._scale = np.maximum(self.q[:, 3] - self.q[:, 1], 1e-12)
+
+    def _p2(self, x):
+        q, pos = self.q, self.pos
+        r = np.arange(self.K)
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        k = (x[:, None] >= q[:, 1:4]).sum(axis=1)          # celda 0..3
+        pos += np.arange(5)[None, :] > k[:, None]
+        self.want += self._dn
+        for i in (1, 2, 3):
+            d = self.want[:, i] - pos[:, i]
+            move = ((d >= 1) & (pos[:, i+1] - pos[:, i] > 1)) | ((d <= -1) & (pos[:, i-1] - pos[:, i] < -1))
+            if not move.any(): continue
+            s = np.sign(d)
+            n0, n1, n2 = pos[:, i-1], pos[:, i], pos[:, i+1]
+            q0, q1, q2 = q[:, i-1], q[:, i], q[:, i+1]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                par = q1 + s / (n2 - n0) * ((n1 - n0 + s) * (q2 - q1) / (n2 - n1)
+                                            + (n2 - n1 - s) * (q1 - q0) / (n1 - n0))
+                j = i + s.astype(int)
+                lin = q1 + s * (q[r, j] - q1) / (pos[r, j] - n1)
+            new = np.where((q0 < par) & (par < q2), par, lin)
+            q[:, i] = np.where(move, new, q1)
+            pos[:, i] += np.where(move, s, 0.0)
@@ -0,0 +1,254 @@
+import os, json, struct, tempfile, threading, time
+import numpy as np
+
+from sample_codec import CodecWriter, CodecReader, CODEC_SUFFIX
+
+# ===== Parámetros =====
+DTYPE = np.dtype("<f4")      # muestras crudas: float32 little-endian, sin cabecera
+OVW_SUFFIX = ".ovw"          # índice min/max persistido junto al archivo
+META_SUFFIX = ".json"        # {"fs": ...}
+OVW_BLOCK = 256              # muestras por bloque del nivel 0
+OVW_FACTOR = 8               # bloques que se funden por nivel
+OVW_MAGIC = b"OVW1"
+OVW_HEADER = struct.Struct("<4sIIQ")   # magic, block, factor, n_samples indexadas
+BUILD_CHUNK = 1 << 22        # muestras leídas por paso al construir el índice (16 MB)
+WRITE_CHUNK = 4096           # muestras acumuladas antes de escribir
+REPLACE_TRIES = 10           # reintentos de os.replace del .ovw (Windows: archivo aún mapeado)
+
+# Un build() a la vez por archivo: al parar de grabar se indexa en segundo
+# plano y el visor puede abrir el mismo archivo antes de que termine
+_BUILD_LOCKS = {}
+_BUILD_LOCKS_GUARD = threading.Lock()
+
+
+def _build_lock(path):
+    with _BUILD_LOCKS_GUARD:
+        return _BUILD_LOCKS.setdefault(os.path.abspath(path), threading.Lock())
+
+
+class RecordingWriter:
+    """Graba muestras crudas a disco desde el hilo lector (float32, append).
+
+    Con extensión .sdc se graban comprimidas sin pérdida (sample_codec): las
+    lecturas del ADC son enteras y muy correladas, ~4x menos que float32.
+    """
+
+    def __init__(self, path, fs=None):
+        self.path = path
+        self.lock = threading.Lock()
+        if path.endswith(CODEC_SUFFIX):
+            self._f = CodecWriter(path, fs)
+            fs = None                 # fs va en la cabecera del .sdc
+        else:
+            self._f = open(path, "ab")
+        self._pending = []
+        self.n = 0
+        if fs is not None:
+            with open(path + META_SUFFIX, "w") as f: json.dump({"fs": float(fs)}, f)
+
+    def add(self, v):
+        with self.lock:
+            if self._f is None: return
+            self._pending.append(v)
+            if len(self._pending) >= WRITE_CHUNK: self._flush()
+
+    def _flush(self):
+        if self._pending:
+            if isinstance(self._f, CodecWriter):
+                self._f.extend(np.asarray(self._pending, dtype=DTYPE))   # misma precisión que el .f32
+            else:
+                self._f.write(np.asarray(self._pending, dtype=DTYPE).tobytes())
+            self.n += len(self._pending)
+            self._pending = []
+
+    def close(self):
+        with self.lock:
+            if self._f is None: return
+            self._flush()
+            self._f.close()
+            self._f = None
+
+
+class Recording:
+    """Grabación abierta con np.memmap y pirámide min/max persistida en <archivo>.ovw.
+
+    Abrir no lee las muestras: sólo mapea el archivo y el índice (un .sdc
+    se lee con CodecReader, que decodifica sólo los bloques que se tocan). view()
+    elige el nivel de la pirámide que da ~1 bloque por píxel y lee sólo ese
+    tramo (o las páginas crudas si el zoom es fino). Si el índice no existe
+    o el archivo creció, build() lo completa por trozos (sin cargarlo entero)
+    y mientras tanto view() cae en lectura cruda diezmada.
+    """
+
+    def __init__(self, path, fs=None):
+        self.path = path
+        self._codec = None
+        if path.endswith(CODEC_SUFFIX):
+            self._codec = CodecReader(path)
+            self.n = self._codec.n
+            if fs is None: fs = self._codec.fs
+        else:
+            self.data = np.memmap(path, dtype=DTYPE, mode="r") if os.path.getsize(path) else np.zeros(0, DTYPE)
+            self.n = self.data.size
+        meta = path + META_SUFFIX
+        if fs is None and os.path.exists(meta):
+            with open(meta) as f: fs = json.load(f).get("fs")
+        self.fs = float(fs) if fs else None
+        self.levels = []              # [(block, lo, hi)], de fino a grueso
+        self.indexed = 0              # muestras cubiertas por el índice
+        self.progress = 0.0
+        self._load_index()
+
+    @property
+    def ready(self):
+        return self.indexed >= (self.n // OVW_BLOCK) * OVW_BLOCK
+
+    # ----- Muestras -----
+    def _read(self, start, stop, dtype=float):
+        src = self._codec.read(start, stop) if self._codec is not None else self.data[start:stop]
+        return np.asarray(src, dtype=dtype)
+
+    def _decimated(self, start, stop, step):
+        """(x, y) con una muestra cada `step` (lee ~1 página por punto)."""
+        idx = np.arange(start, stop, step)
+        if self._codec is None:
+            return idx.astype(float), np.asarray(self.data[idx], dtype=float)
+        # .sdc: la primera muestra de cada bloque va en su cabecera; no se decodifica nada
+        c = self._codec
+        b = np.unique(np.searchsorted(c.starts, idx, side="right") - 1)
+        b = b[c.starts[b] >= start]
+        return c.starts[b].astype(float), np.array([c.head(i) for i in b.tolist()], dtype=float)
+
+    # ----- Índice -----
+    def _load_index(self):
+        p = self.path + OVW_SUFFIX
+        if not os.path.exists(p): return
+        with open(p, "rb") as f:
+            head = f.read(OVW_HEADER.size)
+        if len(head) < OVW_HEADER.size: return
+        magic, block, factor, n_idx = OVW_HEADER.unpack(head)
+        if magic != OVW_MAGIC or block != OVW_BLOCK or factor != OVW_FACTOR or n_idx > self.n: return
+        if n_idx == 0: return
+        mm = np.memmap(p, dtype=DTYPE, mode="r", offset=OVW_HEADER.size)
+        self.levels = self._split_levels(mm, n_idx // OVW_BLOCK)
+        self.indexed = n_idx
+
+    @staticmethod
+    def _split_levels(flat, nb0):
+        levels, off, nb, bs = [], 0, nb0, OVW_BLOCK
+        while nb >= 1:
+            pairs = flat[off:off + 2*nb].reshape(nb, 2)
+            levels.append((bs, pairs[:, 0], pairs[:, 1]))
+            off += 2*nb
+            if nb < OVW_FACTOR: break
+            nb //= OVW_FACTOR; bs *= OVW_FACTOR
+        return levels
+
+    def build(self, stop_event=None):
+        """Completa el nivel 0 desde `indexed` y regenera los niveles superiores; persiste.
+
+        Si otro Recording ya indexa el mismo archivo se espera a que acabe y se
+        parte de lo que dejó en el .ovw.
+        """
+        lock = _build_lock(self.path)
+        while not lock.acquire(timeout=0.1):
+            if stop_event is not None and stop_event.is_set(): return
+        try:
+            self._load_index()
+            self._build(stop_event)
+        finally:
+            lock.release()
+
+    def _build(self, stop_event):
+        nb = self.n // OVW_BLOCK
+        done = self.indexed // OVW_BLOCK
+        if done >= nb:
+            self.progress = 1.0; return
+        lo0 = np.empty(nb, DTYPE); hi0 = np.empty(nb, DTYPE)
+        if done:
+            lo0[:done] = self.levels[0][1][:done]; hi0[:done] = self.levels[0][2][:done]
+        step = BUILD_CHUNK // OVW_BLOCK
+        for b in range(done, nb, step):
+            e = min(nb, b + step)
+            blk = self._read(b*OVW_BLOCK, e*OVW_BLOCK, DTYPE).reshape(-1, OVW_BLOCK)
+            lo0[b:e] = blk.min(axis=1); hi0[b:e] = blk.max(axis=1)
+            self.progress = e / nb
+            if stop_event is not None and stop_event.is_set(): return
+        parts = [np.column_stack((lo0, hi0)).ravel()]
+        lo, hi = lo0, hi0
+        while lo.size >= OVW_FACTOR:
+            m = lo.size // OVW_FACTOR
+            lo = lo[:m*OVW_FACTOR].reshape(m, OVW_FACTOR).min(axis=1)
+            hi = hi[:m*OVW_FACTOR].reshape(m, OVW_FACTOR).max(axis=1)
+            parts.append(np.column_stack((lo, hi)).ravel())
+        flat = np.concatenate(parts).astype(DTYPE)
+        ovw = self.path + OVW_SUFFIX
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(ovw) + ".", suffix=".tmp",
+                                   dir=os.path.dirname(ovw) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(OVW_HEADER.pack(OVW_MAGIC, OVW_BLOCK, OVW_FACTOR, nb * OVW_BLOCK))
+                f.write(flat.tobytes())
+            # Los niveles viejos son vistas del .ovw mapeado: en Windows no se puede
+            # reemplazar un archivo abierto, así que se sueltan antes (y se reintenta
+            # por si un view() del hilo de Tk aún tiene una vista en la mano)
+            self.levels = []
+            self.indexed = 0
+            for i in range(REPLACE_TRIES):
+                try:
+                    os.replace(tmp, ovw); break
+                except PermissionError:
+                    if i == REPLACE_TRIES - 1: raise
+                    time.sleep(0.05)
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)      # no se pudo persistir
+            # El índice en memoria vale aunque no se haya podido guardar
+            self.levels = self._split_levels(flat, nb)
+            self.indexed = nb * OVW_BLOCK
+            self.progress = 1.0
+
+    # ----- Lectura para dibujar -----
+    def view(self, start, stop, width):
+        """(x, y) para dibujar [start, stop) en ~width píxeles.
+
+        Zoom fino: muestras crudas. Zoom grueso: envolvente min/max (x repetida,
+        y alterna min, max) del nivel con bloque <= muestras por píxel.
+        """
+        start = max(0, int(start)); stop = min(self.n, int(stop))
+        if stop <= start: return np.zeros(0), np.zeros(0)
+        width = max(1, int(width))
+        spp = (stop - start) / width
+        if spp <= 2:
+            return np.arange(start, stop, dtype=float), self._read(start, stop)
+        level = None
+        for bs, lo, hi in self.levels:
+            if bs <= spp: level = (bs, lo, hi)
+        if level is None or start >= self.indexed:
+            if spp > OVW_BLOCK and not self.ready:
+                # Índice aún en construcción: muestras diezmadas (lee ~width páginas)
+                x, y = self._decimated(start, stop, int(spp))
+                if x.size: return x, y
+            return self._envelope_raw(start, stop, width)
+        bs, lo, hi = level
+        b0 = start // bs
+        b1 = min(-(-stop // bs), lo.size, self.indexed // bs)
+        per = max(1, (b1 - b0) // width)               # bloques por píxel
+        nb = max(0, (b1 - b0) // per * per)
+        l = np.asarray(lo[b0:b0+nb]).reshape(-1, per).min(axis=1)
+        h = np.asarray(hi[b0:b0+nb]).reshape(-1, per).max(axis=1)
+        x = (b0 + np.arange(l.size) * per) * bs + per * bs / 2.0
+        xs, ys = np.repeat(x, 2), np.column_stack((l, h)).ravel().astype(float)
+        tail0 = (b0 + nb) * bs
+        if tail0 < stop:                               # resto no indexado o bloque parcial
+            tx, ty = self._envelope_raw(tail0, stop, max(1, int((stop - tail0) / spp)))
+            xs, ys = np.concatenate((xs, tx)), np.concatenate((ys, ty))
+        return xs, ys
+
+    def _envelope_raw(self, start, stop, width):
+        seg = self._read(start, stop)
+        per = max(1, seg.size // width)
+        m = seg.size // per * per
+        if m == 0: return np.arange(start, stop, dtype=float), seg
+        l = seg[:m].reshape(-1, per).min(axis=1); h = seg[:m].reshape(-1, per).max(axis=1)
+        x = start + np.arange(l.size) * per + per / 2.0
+        return np.repeat(x, 2), np.column_stack((l, h)).ravel()
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class SampleRing:
+    """Anillo de muestras en NumPy con índice absoluto y copia espejo.
+
+    Cada muestra se escribe en i y en i+capacity, así cualquier ventana de
+    hasta `capacity` muestras es un slice contiguo (vista, sin copiar) aunque
+    cruce el final del anillo. `total` es el índice absoluto de la próxima
+    muestra: la muestra k sigue disponible mientras total - capacity <= k.
+    Un solo hilo escribe (el lector); los demás sólo leen.
+    """
+
+    def __init__(self, capacity, fill=None, dtype=float):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(2 * self.capacity, dtype=dtype)
+        self.total = 0
+        # Con `fill` el anillo arranca lleno (como el deque prellenado de antes)
+        self._fill = fill
+        self._start = 0                # índice absoluto de la muestra válida más vieja
+        if fill is not None:
+            self._buf[:] = fill
+            self._start = -self.capacity
+
+    def __len__(self):
+        return min(self.capacity, self.total - self._start)
+
+    # ----- Escritura -----
+    def append(self, v):
+        i = self.total % self.capacity
+        self._buf[i] = v
+        self._buf[i + self.capacity] = v
+        self.total += 1
+
+    def extend(self, values):
+        v = np.asarray(values, dtype=self._buf.dtype)
+        n = v.size
+        if n == 0: return
+        C = self.capacity
+        if n > C:
+            self.total += n - C
+            v = v[-C:]; n = C
+        i = self.total % C
+        first = min(n, C - i)
+        self._buf[i:i+first] = v[:first]
+        self._buf[i+C:i+C+first] = v[:first]
+        if first < n:
+            rest = n - first
+            self._buf[:rest] = v[first:]
+            self._buf[C:C+rest] = v[first:]
+        self.total += n
+
+    def resized(self, capacity):
+        """Anillo nuevo de otra capacidad con las últimas muestras y el mismo `total`.
+
+        Los índices absolutos siguen valiendo (marcadores, cursores). Lo llama
+        el hilo escritor entre dos muestras y publica el nuevo con una sola
+        asignación, así no se pierde ninguna.
+        """
+        new = SampleRing(capacity, fill=self._fill, dtype=self._buf.dtype)
+        keep = min(len(self), new.capacity)
+        new.total = self.total - keep
+        new.extend(self.latest(keep))
+        # Sin relleno sólo valen las muestras traídas; con relleno, todo el anillo
+        new._start = self.total - (keep if self._fill is None else new.capacity)
+        return new
+
+    # ----- Lectura -----
+    def _end(self, abs_end):
+        # posición (en la mitad espejo) justo después de la muestra abs_end-1
+        return (abs_end - 1) % self.capacity + self.capacity + 1
+
+    def latest(self, n):
+        """Vista de las últimas n muestras (n <= len)."""
+        e = self._end(self.total)
+        return self._buf[e-n:e]
+
+    def available(self, abs_start, n):
+        return abs_start >= self.total - len(self) and abs_start + n <= self.total
+
+    def window(self, abs_start, n):
+        """Vista de n muestras desde el índice absoluto abs_start (o None si no está)."""
+        if n > self.capacity or not self.available(abs_start, n): return None
+        e = self._end(abs_start + n)
+        return self._buf[e-n:e]
+
+    def gather(self, starts, n):
+        """Matriz (len(starts), n) con varias ventanas en una sola indexación."""
+        starts = np.asarray(starts, dtype=np.int64)
+        e = (starts + n - 1) % self.capacity + self.capacity + 1
+        return self._buf[(e - n)[:, None] + np.arange(n)]
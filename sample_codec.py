@@ -0,0 +1,223 @@
+import struct
+import numpy as np
+
+# ===== Parámetros =====
+CODEC_SUFFIX = ".sdc"
+BLOCK_LEN = 4096             # muestras por canal y bloque (unidad de acceso aleatorio)
+MINI = 64                    # residuos por mini-bloque (un ancho de bits cada uno)
+FILE_MAGIC = b"SDC1"
+FILE_HEADER = struct.Struct("<4sHId")      # magic, canales, BLOCK_LEN, fs (0 = desconocida)
+BLOCK_HEADER = struct.Struct("<IIB")       # bytes de carga, muestras por canal, modo
+CHAN_HEADER = struct.Struct("<Bqq")        # orden del predictor, x[0], x[1]-x[0]
+TRAILER = struct.Struct("<QQ4s")           # n bloques, offset del índice, magic
+TRAILER_MAGIC = b"SDCX"
+MODE_PACKED = 0              # enteros: predictor + zig-zag + bits por mini-bloque
+MODE_RAW = 1                 # float32 tal cual (si algún valor no es entero)
+MODE_RAW64 = 2               # ídem con float64 (entrada de más precisión que float32)
+RAW_DTYPES = {MODE_RAW: "<f4", MODE_RAW64: "<f8"}
+
+
+# ----- Empaquetado de bits -----
+def _pack(z):
+    """uint64 (múltiplo de MINI) -> (anchos por mini-bloque, bytes). Vectorizado por ancho."""
+    blocks = z.reshape(-1, MINI)
+    mx = blocks.max(axis=1)
+    widths = np.zeros(mx.size, dtype=np.uint8)
+    nz = mx > 0
+    widths[nz] = np.floor(np.log2(mx[nz].astype(float))).astype(np.uint8) + 1
+    sizes = widths.astype(np.int64) * (MINI // 8)
+    offs = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for w in np.unique(widths[nz]):
+        sel = np.flatnonzero(widths == w)
+        bits = ((blocks[sel, :, None] >> np.arange(w, dtype=np.uint64)) & 1).astype(np.uint8)
+        packed = np.packbits(bits.reshape(sel.size, -1), axis=1, bitorder="little")
+        out[offs[sel, None] + np.arange(packed.shape[1])] = packed
+    return widths, out
+
+
+def _unpack(widths, data, n):
+    sizes = widths.astype(np.int64) * (MINI // 8)
+    offs = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    z = np.zeros((widths.size, MINI), dtype=np.int64)
+    for w in np.unique(widths[widths > 0]):
+        sel = np.flatnonzero(widths == w)
+        packed = data[offs[sel, None] + np.arange(int(w) * MINI // 8)]
+        bits = np.unpackbits(packed, axis=1, bitorder="little").reshape(sel.size, MINI, int(w))
+        z[sel] = bits.astype(np.int64) @ (np.int64(1) << np.arange(int(w), dtype=np.int64))
+    return z.ravel()[:n]
+
+
+# ----- Bloques -----
+def encode_block(values):
+    """(n,) o (n, canales) -> bytes del bloque (cabecera incluida). Sin pérdida."""
+    x = np.asarray(values)
+    if x.ndim == 1: x = x[:, None]
+    n = x.shape[0]
+    xi = np.rint(x).astype(np.int64) if x.dtype.kind == "f" else x.astype(np.int64)
+    if x.dtype.kind == "f" and not np.array_equal(xi, x):
+        # Se guarda con la precisión de la entrada: float32 no es sin pérdida para float64
+        mode = MODE_RAW if x.dtype.itemsize <= 4 else MODE_RAW64
+        payload = np.ascontiguousarray(x, dtype=RAW_DTYPES[mode]).tobytes()
+        return BLOCK_HEADER.pack(len(payload), n, mode) + payload
+    parts = []
+    for c in range(xi.shape[1]):
+        col = xi[:, c]
+        d1 = np.diff(col)
+        d2 = np.diff(d1)
+        # Predictor por canal y bloque: x[n-1] (orden 1) o extrapolación lineal (orden 2)
+        order = 2 if n > 2 and np.abs(d2).sum() < np.abs(d1).sum() else 1
+        res = d2 if order == 2 else d1
+        pad = -res.size % MINI
+        z = np.concatenate(((res << 1) ^ (res >> 63), np.zeros(pad, np.int64))).astype(np.uint64)
+        widths, packed = _pack(z) if z.size else (np.zeros(0, np.uint8), np.zeros(0, np.uint8))
+        parts += [CHAN_HEADER.pack(order, int(col[0]), int(d1[0]) if n > 1 else 0),
+                  widths.tobytes(), packed.tobytes()]
+    payload = b"".join(parts)
+    return BLOCK_HEADER.pack(len(payload), n, MODE_PACKED) + payload
+
+
+def decode_block(buf, channels=1):
+    """bytes/array uint8 de un bloque (desde su cabecera) -> (n, canales) int64, float32 o float64."""
+    data = np.frombuffer(buf, dtype=np.uint8) if not isinstance(buf, np.ndarray) else buf
+    size, n, mode = BLOCK_HEADER.unpack_from(data, 0)
+    pos = BLOCK_HEADER.size
+    if mode in RAW_DTYPES:
+        return np.frombuffer(data[pos:pos+size].tobytes(), dtype=RAW_DTYPES[mode]).reshape(n, channels)
+    out = np.empty((n, channels), dtype=np.int64)
+    for c in range(channels):
+        order, x0, d0 = CHAN_HEADER.unpack_from(data, pos)
+        pos += CHAN_HEADER.size
+        L = max(0, n - order)
+        nmini = -(-L // MINI)
+        widths = data[pos:pos+nmini]; pos += nmini
+        nbytes = int(widths.astype(np.int64).sum()) * (MINI // 8)
+        z = _unpack(widths, data[pos:pos+nbytes], L); pos += nbytes
+        res = (z >> 1) ^ -(z & 1)
+        if order == 2:
+            res = np.concatenate(([d0], d0 + np.cumsum(res)))
+        out[0, c] = x0
+        out[1:, c] = x0 + np.cumsum(res[:n-1])
+    return out
+
+
+# ----- Archivo: bloques + índice -----
+class CodecWriter:
+    """Escribe muestras comprimidas en streaming: un bloque cada BLOCK_LEN muestras.
+
+    Los bloques se delimitan solos (cabecera con su tamaño); close() añade el
+    índice (muestra inicial y offset de cada bloque) para acceso aleatorio. Si
+    el programa muere antes, CodecReader reconstruye el índice recorriendo
+    las cabeceras.
+    """
+
+    def __init__(self, path, fs=None, channels=1, block=BLOCK_LEN):
+        self.path = path
+        self.channels = int(channels)
+        self.block = int(block)
+        self._f = open(path, "wb")
+        self._f.write(FILE_HEADER.pack(FILE_MAGIC, self.channels, self.block, float(fs or 0.0)))
+        self._pending = []
+        self._starts, self._offsets = [], []
+        self.n = 0                   # muestras (por canal) ya escritas
+        self.bytes = FILE_HEADER.size
+
+    def extend(self, values):
+        v = np.asarray(values).reshape(-1, self.channels)
+        self._pending.append(v)
+        if sum(p.shape[0] for p in self._pending) >= self.block:
+            v = np.concatenate(self._pending)
+            k = v.shape[0] // self.block * self.block
+            for i in range(0, k, self.block):
+                self._write_block(v[i:i+self.block])
+            self._pending = [v[k:]] if k < v.shape[0] else []
+
+    def _write_block(self, v):
+        blob = encode_block(v)
+        self._starts.append(self.n); self._offsets.append(self.bytes)
+        self._f.write(blob)
+        self.n += v.shape[0]
+        self.bytes += len(blob)
+
+    def flush(self):
+        """Escribe lo pendiente como un bloque corto (p.ej. antes de cerrar)."""
+        if self._pending:
+            v = np.concatenate(self._pending)
+            self._pending = []
+            if v.shape[0]: self._write_block(v)
+        self._f.flush()
+
+    def close(self):
+        if self._f is None: return
+        self.flush()
+        index = np.column_stack((self._starts, self._offsets)).astype("<u8") if self._starts else np.zeros((0, 2), "<u8")
+        self._f.write(index.tobytes())
+        self._f.write(TRAILER.pack(len(self._starts), self.bytes, TRAILER_MAGIC))
+        self._f.close()
+        self._f = None
+
+
+class CodecReader:
+    """Archivo .sdc mapeado en memoria; read(start, stop) decodifica sólo los bloques que toca."""
+
+    def __init__(self, path):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, self.channels, self.block, fs = FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError(f"{path}: no es un archivo {CODEC_SUFFIX}")
+        self.fs = fs or None
+        self.starts, self.offsets = self._load_index()
+        self.n = 0
+        if self.offsets.size:
+            _, n_last, _ = BLOCK_HEADER.unpack_from(self._mm, int(self.offsets[-1]))
+            self.n = int(self.starts[-1]) + n_last
+
+    def __len__(self):
+        return self.n
+
+    def _load_index(self):
+        mm = self._mm
+        if mm.size >= FILE_HEADER.size + TRAILER.size:
+            nb, off, magic = TRAILER.unpack_from(mm, mm.size - TRAILER.size)
+            if magic == TRAILER_MAGIC and off + 16 * nb + TRAILER.size == mm.size:
+                idx = np.frombuffer(mm[off:off + 16*nb].tobytes(), dtype="<u8").reshape(nb, 2).astype(np.int64)
+                return idx[:, 0], idx[:, 1]
+        # Sin índice (grabación interrumpida): se recorren las cabeceras
+        starts, offsets, pos, n = [], [], FILE_HEADER.size, 0
+        while pos + BLOCK_HEADER.size <= mm.size:
+            size, k, mode = BLOCK_HEADER.unpack_from(mm, pos)
+            if mode > MODE_RAW64 or not 0 < k <= self.block: break      # índice a medio escribir
+            if pos + BLOCK_HEADER.size + size > mm.size: break        # bloque a medio escribir
+            starts.append(n); offsets.append(pos)
+            n += k; pos += BLOCK_HEADER.size + size
+        return np.asarray(starts, dtype=np.int64), np.asarray(offsets, dtype=np.int64)
+
+    def _block(self, i):
+        off = int(self.offsets[i])
+        size, _, _ = BLOCK_HEADER.unpack_from(self._mm, off)
+        return decode_block(self._mm[off:off + BLOCK_HEADER.size + size], self.channels)
+
+    def head(self, i):
+        """Primera muestra (canal 0) del bloque i sin decodificarlo: está en su cabecera."""
+        off = int(self.offsets[i])
+        _, _, mode = BLOCK_HEADER.unpack_from(self._mm, off)
+        pos = off + BLOCK_HEADER.size
+        if mode in RAW_DTYPES:
+            dt = np.dtype(RAW_DTYPES[mode])
+            return float(np.frombuffer(self._mm[pos:pos + dt.itemsize].tobytes(), dtype=dt)[0])
+        return float(CHAN_HEADER.unpack_from(self._mm, pos)[1])
+
+    def read(self, start=0, stop=None):
+        """Muestras [start, stop): (n,) si hay un canal, si no (n, canales)."""
+        stop = self.n if stop is None else min(int(stop), self.n)
+        start = max(0, int(start))
+        if stop <= start:
+            out = np.zeros((0, self.channels))
+        else:
+            b0 = int(np.searchsorted(self.starts, start, side="right")) - 1
+            b1 = int(np.searchsorted(self.starts, stop, side="left"))
+            out = np.concatenate([self._block(i) for i in range(b0, b1)])
+            out = out[start - int(self.starts[b0]):stop - int(self.starts[b0])]
+        return out[:, 0] if self.channels == 1 else out
+
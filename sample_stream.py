@@ -0,0 +1,132 @@
+import numpy as np
+
+# ===== Protocolo de muestreo (ver sensor_raw.ino / sensor_led_range.ino) =====
+SYNC = b"\xA5\x5A"
+BLOCK_N = 32            # muestras por bloque que envía el firmware
+HEADER_LEN = 4          # A5 5A seq n
+RATE_MIN = 31           # Hz, límite de Timer1 con prescaler 8
+RATE_MAX = 8000         # Hz, conversión ADC con prescaler 128
+# Marcadores de evento: el firmware pone el id (1..63) en los bits altos de la
+# muestra tomada justo al recibir "M<id>" o al arrancar un pulso "P<id>,<ms>".
+MARK_SHIFT = 10
+VALUE_MASK = (1 << MARK_SHIFT) - 1
+MARK_MAX = 63
+# Con control de rango en la placa ("C...") el firmware informa cada cambio
+# del LED con estos ids reservados, en la muestra en que decidió.
+MARK_LED_ON = 62
+MARK_LED_OFF = 63
+MARK_USER_MAX = 61
+SMOOTH_MAX = 32         # media móvil máxima del control en la placa
+
+
+def rate_command(hz):
+    hz = int(round(min(RATE_MAX, max(RATE_MIN, float(hz)))))
+    return f"R{hz}\n".encode()
+
+
+def mode_command(block):
+    return b"B1\n" if block else b"B0\n"
+
+
+def _user_id(ev_id):
+    return min(int(ev_id) & MARK_MAX, MARK_USER_MAX)
+
+
+def marker_command(ev_id):
+    return f"M{_user_id(ev_id)}\n".encode()
+
+
+def pulse_command(ev_id, ms):
+    """Pulso del LED de `ms` ms cronometrado por el firmware en muestras, marcado con ev_id."""
+    return f"P{_user_id(ev_id)},{max(1, int(round(ms)))}\n".encode()
+
+
+def board_control_command(low=None, high=None, smooth=1, dc_shift=0):
+    """Control de rango en la placa: "C<low>,<high>,<n>,<dc_shift>"; sin umbrales, "C" lo desactiva.
+
+    El firmware decide por muestra: media móvil de n de (x - DC), con DC una
+    media exponencial de paso 2**-dc_shift (0 = sin quitar DC), y LED
+    encendido si low <= y <= high. Umbrales en cuentas ADC, resolución 1/16.
+    """
+    if low is None or high is None: return b"C\n"
+    if low > high: low, high = high, low
+    n = min(SMOOTH_MAX, max(1, int(smooth)))
+    return f"C{low:.4g},{high:.4g},{n},{max(0, min(16, int(dc_shift)))}\n".encode()
+
+
+def split_markers(vals):
+    """uint16 crudos -> (valores ADC, posiciones con marcador, ids)."""
+    vals = np.asarray(vals)
+    ids = vals >> MARK_SHIFT
+    pos = np.flatnonzero(ids)
+    if pos.size == 0: return vals, pos, pos
+    return vals & VALUE_MASK, pos, ids[pos]
+
+
+def split_line_marker(val, ids=range(1, MARK_MAX + 1)):
+    """Valor de una línea de texto -> (muestra, id); id 0 si no lleva marcador.
+
+    Sólo se decodifica un entero de 16 bits cuyos bits altos son un id de
+    `ids`; cualquier otra cosa (floats, ADC de más de 10 bits, escalas) pasa
+    tal cual.
+    """
+    if not VALUE_MASK < val < (MARK_MAX + 1) << MARK_SHIFT or not float(val).is_integer():
+        return val, 0
+    iv = int(val)
+    ev = iv >> MARK_SHIFT
+    if ev not in ids: return val, 0
+    return float(iv & VALUE_MASK), ev
+
+
+def encode_block(seq, values):
+    """Bloque tal como lo emite el firmware: A5 5A seq n [n x uint16 LE] suma8."""
+    payload = np.asarray(values, dtype="<u2").tobytes()
+    return SYNC + bytes((seq & 0xFF, len(values))) + payload + bytes((sum(payload) & 0xFF,))
+
+
+class BlockParser:
+    """Reensambla bloques binarios desde trozos arbitrarios de bytes.
+
+    Descarta basura (p.ej. líneas ASCII de antes de pasar a modo bloque),
+    verifica la suma y cuenta bloques perdidos por saltos de secuencia.
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.blocks = 0
+        self.bad = 0          # sumas incorrectas / cabeceras inválidas
+        self.lost = 0         # bloques perdidos (saltos de seq)
+        self._seq = None
+
+    def feed(self, data):
+        self.buf += data
+        out = []
+        buf = self.buf
+        while True:
+            i = buf.find(SYNC)
+            if i < 0:
+                # conserva un posible 0xA5 final (mitad de la marca)
+                del buf[:max(0, len(buf) - 1)]
+                break
+            if i: del buf[:i]
+            if len(buf) < HEADER_LEN: break
+            n = buf[3]
+            total = HEADER_LEN + 2 * n + 1
+            if n == 0 or n > 128:
+                self.bad += 1; del buf[:2]; continue
+            if len(buf) < total: break
+            payload = bytes(buf[HEADER_LEN:total-1])
+            if (sum(payload) & 0xFF) != buf[total-1]:
+                self.bad += 1; del buf[:2]; continue
+            seq = buf[2]
+            if self._seq is not None:
+                self.lost += (seq - self._seq - 1) & 0xFF
+            self._seq = seq
+            self.blocks += 1
+            out.append(np.frombuffer(payload, dtype="<u2"))
+            del buf[:total]
+        if not out: return np.empty(0, dtype=np.uint16)
+        return out[0] if len(out) == 1 else np.concatenate(out)
+
+    def status(self):
+        return f"blocks {self.blocks} | lost {self.lost} | bad {self.bad}"
@@ -1,30 +1,253 @@
 const int SENSOR_PIN = A0;
 const int LED_PIN    = 13;
 
-const unsigned long PERIOD_MS = 10; // ~100 Hz
-unsigned long t0 = 0;
+// Muestreo por hardware: Timer1 dispara el ADC (auto-trigger), la ISR del ADC
+// sólo guarda el valor en un anillo y loop() lo vacía por Serial. Así el reloj
+// de muestreo no depende de millis() ni de que Serial.write() se bloquee.
+// Comandos (terminados en '\n'): "R<hz>" fija la tasa, "B1"/"B0" bloques binarios / líneas ASCII,
+// "M<id>" marca (id 1..63 en los bits 10..15) la próxima muestra,
+// "P<id>,<ms>" pulso del LED cronometrado en muestras y marcado con id,
+// "C<low>,<high>,<n>,<dc_shift>" control de rango en la placa (ver abajo), "C" lo desactiva.
+const uint8_t SENSOR_CH = SENSOR_PIN - A0;
+const unsigned long RATE_DEFAULT = 100;   // Hz (igual que el antiguo PERIOD_MS = 10)
+const unsigned long RATE_MAX = 8000;      // conversión ADC ~104 us con prescaler 128
+const int RING_LEN = 256;                 // potencia de 2
+const int BLOCK_N = 32;                   // muestras por bloque binario
+
+volatile uint16_t ring[RING_LEN];
+volatile uint8_t ring_head = 0;           // lo escribe la ISR
+volatile uint8_t ring_tail = 0;           // lo escribe loop()
+volatile uint16_t overruns = 0;           // muestras perdidas por anillo lleno
+
+bool block_mode = false;
+uint8_t block_seq = 0;
+unsigned long rate_hz = RATE_DEFAULT;
+
+volatile uint8_t mark_pending = 0;        // id a estampar en la próxima muestra
+volatile uint16_t pulse_left = 0;         // muestras que quedan de pulso
+
+// Control de rango en la placa: por muestra, en la ISR, sin ida y vuelta al PC.
+// y = media móvil de n muestras de (x - DC), con DC = media exponencial
+// (dc_shift = 0 la desactiva); LED encendido si low <= y <= high. Cada cambio
+// se informa estampando MARK_LED_ON/OFF (ids 62/63) en esa misma muestra.
+const uint8_t MARK_LED_ON = 62;
+const uint8_t MARK_LED_OFF = 63;
+const uint8_t SMOOTH_MAX = 32;
+volatile bool local_ctl = false;
+int32_t lc_lo_n, lc_hi_n;                 // umbrales x16 (Q4) ya multiplicados por n
+uint8_t lc_n = 1, lc_shift = 0;
+int32_t dc_q12 = 0;                       // DC en Q12
+bool dc_init = false;
+int16_t sm_buf[SMOOTH_MAX];
+uint8_t sm_i = 0;
+int32_t sm_sum = 0;
+int8_t led_state = -1;                    // -1 = aún sin decidir (fuerza el primer informe)
+
+uint8_t localControl(uint16_t v) {
+  int32_t x = (int32_t)v << 4;            // Q4
+  if (lc_shift) {
+    if (!dc_init) { dc_q12 = x << 8; dc_init = true; }
+    dc_q12 += ((x << 8) - dc_q12) >> lc_shift;
+    x -= dc_q12 >> 8;
+  }
+  sm_sum += x - sm_buf[sm_i];             // suma de las últimas n (sin dividir)
+  sm_buf[sm_i] = (int16_t)x;
+  if (++sm_i >= lc_n) sm_i = 0;
+  int8_t on = (sm_sum >= lc_lo_n && sm_sum <= lc_hi_n) ? 1 : 0;
+  if (on == led_state) return 0;
+  led_state = on;
+  digitalWrite(LED_PIN, on ? HIGH : LOW);
+  return on ? MARK_LED_ON : MARK_LED_OFF;
+}
+
+ISR(ADC_vect) {
+  uint16_t v = ADC;
+  TIFR1 = _BV(OCF1B);                     // rearma el disparo del ADC
+  uint8_t led_mark = local_ctl ? localControl(v) : 0;
+  if (led_mark) v |= (uint16_t)led_mark << 10;   // el marcador de usuario espera una muestra
+  else if (mark_pending) { v |= (uint16_t)mark_pending << 10; mark_pending = 0; }
+  if (pulse_left && --pulse_left == 0) digitalWrite(LED_PIN, LOW);
+  uint8_t next = (ring_head + 1) & (RING_LEN - 1);
+  if (next == ring_tail) { overruns++; return; }
+  ring[ring_head] = v;
+  ring_head = next;
+}
+
+void setRate(unsigned long hz) {
+  if (hz < 31) hz = 31;                   // límite de Timer1 con prescaler 8
+  if (hz > RATE_MAX) hz = RATE_MAX;
+  rate_hz = hz;
+  noInterrupts();
+  TCCR1A = 0;
+  TCCR1B = _BV(WGM12) | _BV(CS11);        // CTC, prescaler 8 -> 2 MHz
+  OCR1A = (uint16_t)(2000000UL / hz - 1);
+  OCR1B = OCR1A;                          // Compare B = disparo del ADC
+  TCNT1 = 0;
+  interrupts();
+}
+
+void setupAdc() {
+  ADMUX  = _BV(REFS0) | (SENSOR_CH & 0x07);                         // AVcc, canal
+  ADCSRB = _BV(ADTS2) | _BV(ADTS0);                                 // trigger: Timer1 Compare B
+  ADCSRA = _BV(ADEN) | _BV(ADATE) | _BV(ADIE) | _BV(ADPS2) | _BV(ADPS1) | _BV(ADPS0);
+}
+
+uint8_t ringCount() {
+  return (uint8_t)((ring_head - ring_tail) & (RING_LEN - 1));
+}
+
+uint16_t ringPop() {
+  uint16_t v = ring[ring_tail];
+  ring_tail = (ring_tail + 1) & (RING_LEN - 1);
+  return v;
+}
+
+// Bloque: A5 5A seq n [n x uint16 LE] suma8(payload)
+void sendBlock(uint8_t n) {
+  uint8_t hdr[4] = {0xA5, 0x5A, block_seq++, n};
+  Serial.write(hdr, 4);
+  uint8_t sum = 0;
+  for (uint8_t i = 0; i < n; i++) {
+    uint16_t v = ringPop();
+    uint8_t b[2] = {(uint8_t)(v & 0xFF), (uint8_t)(v >> 8)};
+    sum += b[0] + b[1];
+    Serial.write(b, 2);
+  }
+  Serial.write(sum);
+}
+
+// Salidas multi-canal (trama "O" + 2 hex por canal + '\n' desde Python).
+// PWM en 3/5/6: los pines 9/10 los usa Timer1, que ahora es el reloj de muestreo.
+const int  N_OUT = 4;
+const int  OUT_PINS[N_OUT] = {LED_PIN, 3, 5, 6};
+const bool OUT_PWM[N_OUT]  = {false, true, true, true};
+
+bool in_frame = false;   // dentro de una trama 'O...'
+int  frame_nib = 0;      // nibbles leídos en la trama
+int  frame_acc = 0;
+
+char cmd_buf[40];        // comando de texto "R<hz>" / "B0|1" / "M<id>" / "P<id>,<ms>" / "C..." hasta '\n'
+int  cmd_len = -1;       // -1 = no hay comando abierto
+
+void setOutput(int ch, int level) {
+  if (ch < 0 || ch >= N_OUT) return;
+  if (OUT_PWM[ch]) analogWrite(OUT_PINS[ch], level);
+  else             digitalWrite(OUT_PINS[ch], level >= 128 ? HIGH : LOW);
+}
+
+int hexVal(char c) {
+  if (c >= '0' && c <= '9') return c - '0';
+  if (c >= 'A' && c <= 'F') return c - 'A' + 10;
+  if (c >= 'a' && c <= 'f') return c - 'a' + 10;
+  return -1;
+}
 
 void setup() {
-  pinMode(LED_PIN, OUTPUT);
-  digitalWrite(LED_PIN, LOW);
+  for (int i = 0; i < N_OUT; i++) {
+    pinMode(OUT_PINS[i], OUTPUT);
+    setOutput(i, 0);
+  }
   Serial.begin(115200); // debe coincidir con Python
   delay(200);
+  setupAdc();
+  setRate(RATE_DEFAULT);
 }
 
-void loop() {
-  unsigned long now = millis();
+// "C<low>,<high>,<n>,<dc_shift>": los umbrales llegan en las mismas unidades que
+// en el PC (cuentas ADC tras quitar DC y suavizar); se pasan a Q4 una sola vez.
+// Si sólo cambian low/high (rango automático del PC) se conservan la DC, la
+// media móvil y el estado del LED: reiniciarlos impediría que se asienten.
+void setLocalControl() {
+  if (cmd_buf[1] == '\0') {
+    noInterrupts();
+    local_ctl = false;
+    interrupts();
+    digitalWrite(LED_PIN, LOW);
+    return;
+  }
+  char *p = cmd_buf + 1;
+  double lo = strtod(p, &p); if (*p == ',') p++;
+  double hi = strtod(p, &p); if (*p == ',') p++;
+  long n = strtol(p, &p, 10); if (*p == ',') p++;
+  long sh = strtol(p, &p, 10);
+  if (n < 1) n = 1;
+  if (n > SMOOTH_MAX) n = SMOOTH_MAX;
+  if (sh < 0) sh = 0;
+  if (sh > 16) sh = 16;
+  if (lo > hi) { double t = lo; lo = hi; hi = t; }
+  int32_t lo_n = (int32_t)(lo * 16.0) * n;
+  int32_t hi_n = (int32_t)(hi * 16.0) * n;
+  if (local_ctl && (uint8_t)n == lc_n && (uint8_t)sh == lc_shift) {
+    noInterrupts();                        // 32 bits: la ISR no debe ver medio umbral
+    lc_lo_n = lo_n; lc_hi_n = hi_n;
+    interrupts();
+    return;
+  }
+  noInterrupts();
+  local_ctl = false;
+  interrupts();
+  lc_n = (uint8_t)n; lc_shift = (uint8_t)sh;
+  lc_lo_n = lo_n; lc_hi_n = hi_n;
+  for (uint8_t i = 0; i < SMOOTH_MAX; i++) sm_buf[i] = 0;
+  sm_i = 0; sm_sum = 0; dc_init = false; led_state = -1;
+  noInterrupts();
+  local_ctl = true;
+  interrupts();
+}
 
-  // 1) enviar crudo de A0 a ~100 Hz
-  if (now - t0 >= PERIOD_MS) {
-    t0 = now;
-    int v = analogRead(SENSOR_PIN);   // 0..1023
-    Serial.println(v);
+void runCommand() {
+  cmd_buf[cmd_len] = '\0';
+  if (cmd_buf[0] == 'C') { setLocalControl(); return; }
+  if (cmd_buf[0] == 'R') setRate(strtoul(cmd_buf + 1, NULL, 10));
+  else if (cmd_buf[0] == 'B') block_mode = (cmd_buf[1] == '1');
+  else if (cmd_buf[0] == 'M') mark_pending = atoi(cmd_buf + 1) & 0x3F;
+  else if (cmd_buf[0] == 'P') {
+    char *comma = strchr(cmd_buf, ',');
+    if (comma == NULL) return;
+    unsigned long n = strtoul(comma + 1, NULL, 10) * rate_hz / 1000UL;
+    noInterrupts();
+    digitalWrite(LED_PIN, HIGH);
+    pulse_left = n > 0 ? (n > 65535UL ? 65535 : n) : 1;
+    mark_pending = atoi(cmd_buf + 1) & 0x3F;
+    interrupts();
+  }
+}
+
+void loop() {
+  // 1) vaciar el anillo que llena la ISR del ADC (0..1023)
+  if (block_mode) {
+    if (ringCount() >= BLOCK_N) sendBlock(BLOCK_N);
+  } else if (ringCount() > 0) {
+    Serial.println(ringPop());
   }
 
-  // 2) leer comando (1/0) desde Python
+  // 2) leer comandos desde Python: '1'/'0' (LED), trama "O<hex>\n", "R<hz>\n", "B0|1\n", "M<id>\n", "P<id>,<ms>\n", "C...\n"
   while (Serial.available() > 0) {
     char c = (char)Serial.read();
-    if (c == '1') {
+    if (cmd_len >= 0) {
+      if (c == '\n' || c == '\r') {
+        runCommand();
+        cmd_len = -1;
+      } else if (cmd_len < (int)sizeof(cmd_buf) - 1) {
+        cmd_buf[cmd_len++] = c;
+      }
+    } else if (in_frame) {
+      int h = hexVal(c);
+      if (h < 0) {            // '\n' u otro carácter cierra la trama
+        in_frame = false;
+        continue;
+      }
+      frame_acc = (frame_acc << 4) | h;
+      frame_nib++;
+      if ((frame_nib & 1) == 0) {
+        setOutput(frame_nib / 2 - 1, frame_acc);
+        frame_acc = 0;
+      }
+    } else if (c == 'O') {
+      in_frame = true; frame_nib = 0; frame_acc = 0;
+    } else if (c == 'R' || c == 'B' || c == 'M' || c == 'P' || c == 'C') {
+      cmd_buf[0] = c; cmd_len = 1;
+    } else if (c == '1') {
       digitalWrite(LED_PIN, HIGH);
     } else if (c == '0') {
       digitalWrite(LED_PIN, LOW);
@@ -1,11 +1,19 @@
-import threading, time, statistics
-from collections import deque
+import threading, time
 import tkinter as tk
 from tkinter import ttk, messagebox
+import numpy as np
 
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+from serial_writer import SerialWriter, WRITE_TIMEOUT_S
+from beat_detector import BeatDetector
+from tick_profiler import StageProfiler, CPROFILE_SEC
+from ring_buffer import SampleRing
+from signal_graph import Pipeline, basic_chain
+from quantile_sketch import QuantileTracker
+from sample_stream import board_control_command, split_line_marker, MARK_LED_ON, MARK_LED_OFF
+
 # Serial
 try:
     import serial
@@ -17,6 +25,15 @@ except Exception:
     list_ports = None
 
 BUFFER_LEN = 500  # muestras visibles
+FS_DEFAULT = 100.0  # Hz (PERIOD_MS = 10 en el sketch)
+CONTROL_MS = 80    # periodo del lazo de control
+AUTO_PCT_DEFAULT = (10.0, 90.0)   # percentiles LOW/HIGH de la línea base
+AUTO_BASELINE_S = 20.0
+BOARD_RESET_MS = 2000   # la placa se reinicia al abrir el puerto: esperar antes de subir la config.
+BOARD_DC_SHIFT = 8      # "Remove DC" en la placa: media exponencial de ~2**8 muestras (≈ media de la ventana)
+BOARD_OFF = board_control_command()   # "C": la placa vuelve a obedecer '1'/'0'
+BOARD_DEADBAND = 0.05   # umbrales nuevos se suben si se mueven más que esta fracción del rango...
+BOARD_MIN_S = 1.0       # ...y como mucho una vez por segundo (Auto range los mueve en cada tick)
 
 class SerialPlotterRange(tk.Tk):
     def __init__(self):
@@ -27,10 +44,20 @@ class SerialPlotterRange(tk.Tk):
         # Estado
         self.ser = None
         self.reader_thread = None
+        self.writer = None      # hilo escritor (comandos al Arduino)
         self.stop_event = threading.Event()
-        self.buffer = deque([0.0]*BUFFER_LEN, maxlen=BUFFER_LEN)
+        self.buffer = SampleRing(BUFFER_LEN, fill=0.0)
+        self.pipeline = Pipeline()   # DC -> suavizado (signal_graph), buffers reutilizados
         self.connected = False
+        self.detector = BeatDetector(FS_DEFAULT)   # corre en el lector, muestra a muestra
+        self.prof = StageProfiler()                 # tiempos por etapa (desactivado por defecto)
         self.last_sent = None   # recuerda último '1'/'0' para no saturar
+        self.board_sent = BOARD_OFF   # última config. "C..." subida (control en la placa)
+        self.board_cfg = None         # (low, high, n, dc_shift) de board_sent
+        self.board_t = 0.0            # cuándo se subió
+        self.board_ready = False
+        self.board_led = None   # estado del LED informado por la placa (reader)
+        self.board_changes = 0
 
         # ---- Barra superior ----
         top = ttk.Frame(self, padding=8); top.pack(fill="x")
@@ -63,6 +90,22 @@ class SerialPlotterRange(tk.Tk):
         self.smooth_n = tk.IntVar(value=5)  # 1 = sin suavizado
         ttk.Entry(top, textvariable=self.smooth_n, width=5).pack(side="left", padx=(0,8))
 
+        ttk.Label(top, text="Fs (Hz):").pack(side="left", padx=(10,2))
+        self.fs_var = tk.DoubleVar(value=FS_DEFAULT)
+        ttk.Entry(top, textvariable=self.fs_var, width=6).pack(side="left")
+
+        self.beats_on = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="Beats", variable=self.beats_on).pack(side="left", padx=(10,2))
+        self.bpm_var = tk.StringVar(value="")
+        ttk.Label(top, textvariable=self.bpm_var).pack(side="left", padx=(6,2))
+
+        self.prof_on = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="Profile", variable=self.prof_on, command=self._toggle_profile).pack(side="left", padx=(10,2))
+        self.cprof_sec = tk.DoubleVar(value=CPROFILE_SEC)
+        ttk.Button(top, text="cProfile", command=self._start_cprofile).pack(side="left", padx=2)
+        ttk.Entry(top, textvariable=self.cprof_sec, width=4).pack(side="left")
+        ttk.Label(top, text="s").pack(side="left", padx=(1,2))
+
         # Control por rango
         ctrl = ttk.Frame(self, padding=(8,0)); ctrl.pack(fill="x")
         ttk.Label(ctrl, text="LOW:").pack(side="left")
@@ -73,11 +116,31 @@ class SerialPlotterRange(tk.Tk):
         self.high_var = tk.DoubleVar(value=50.0)
         ttk.Entry(ctrl, textvariable=self.high_var, width=8).pack(side="left", padx=(2,12))
 
+        # Rango automático: percentiles en streaming del valor procesado (P² + adaptación lenta)
+        self.auto_rng = tk.BooleanVar(value=False)
+        ttk.Checkbutton(ctrl, text="Auto range", variable=self.auto_rng).pack(side="left", padx=(0,2))
+        self.auto_lo = tk.DoubleVar(value=AUTO_PCT_DEFAULT[0])
+        self.auto_hi = tk.DoubleVar(value=AUTO_PCT_DEFAULT[1])
+        self.auto_base_s = tk.DoubleVar(value=AUTO_BASELINE_S)
+        ttk.Label(ctrl, text="pct").pack(side="left")
+        ttk.Entry(ctrl, textvariable=self.auto_lo, width=4).pack(side="left", padx=1)
+        ttk.Entry(ctrl, textvariable=self.auto_hi, width=4).pack(side="left", padx=1)
+        ttk.Label(ctrl, text="baseline (s)").pack(side="left", padx=(4,0))
+        ttk.Entry(ctrl, textvariable=self.auto_base_s, width=4).pack(side="left", padx=(1,4))
+        ttk.Button(ctrl, text="Recalibrate", command=self._recalibrate).pack(side="left", padx=(0,8))
+        self.auto_tracker = None
+        self._auto_key = None
+
         self.enable_ctl = tk.BooleanVar(value=False)
         ttk.Checkbutton(ctrl, text="Enable control (send 1/0)", variable=self.enable_ctl).pack(side="left", padx=6)
+        # Control en la placa: se suben LOW/HIGH/DC/suavizado y el firmware decide por muestra
+        self.board_ctl = tk.BooleanVar(value=False)
+        ttk.Checkbutton(ctrl, text="On board", variable=self.board_ctl).pack(side="left", padx=(0,6))
 
         self.status_var = tk.StringVar(value="LED: (no control)")
         ttk.Label(ctrl, textvariable=self.status_var).pack(side="left", padx=12)
+        self.tx_var = tk.StringVar(value="")
+        ttk.Label(ctrl, textvariable=self.tx_var).pack(side="left", padx=12)
 
         # ---- Gráfica ----
         fig = Figure(figsize=(8.8, 3.8), dpi=100)
@@ -87,15 +150,19 @@ class SerialPlotterRange(tk.Tk):
         self.ax.set_ylabel("amplitude")
         self.ax.set_xlim(0, BUFFER_LEN-1)
         self.ax.set_ylim(0, 1023)
-        (self.line,) = self.ax.plot(range(BUFFER_LEN), list(self.buffer), lw=1)
+        (self.line,) = self.ax.plot(range(BUFFER_LEN), self.buffer.latest(BUFFER_LEN).copy(), lw=1)
+        (self.beat_pts,) = self.ax.plot([], [], "o", color="red", ms=5)  # marcas de latido
         self.ax.grid(True, alpha=0.3)
+        self.prof_text = self.ax.text(0.01, 0.98, "", transform=self.ax.transAxes, va="top", fontsize=7,
+                                      family="monospace", bbox=dict(facecolor="white", alpha=0.8, lw=0))
 
         self.canvas = FigureCanvasTkAgg(fig, master=self)
         self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=8, pady=8)
+        self.prof.wrap(self.canvas, "draw", "draw")   # el render real ocurre en idle
 
         # Loops
         self.after(40, self._tick)          # refresco de gráfica
-        self.after(80, self._control_tick)  # envío ON/OFF según rango
+        self.after(CONTROL_MS, self._control_tick)  # envío ON/OFF según rango
 
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
@@ -122,24 +189,35 @@ class SerialPlotterRange(tk.Tk):
             messagebox.showerror("Baud", "Invalid baud.")
             return
         try:
-            self.ser = serial.Serial(port, baudrate=baud, timeout=1)
+            self.ser = serial.Serial(port, baudrate=baud, timeout=1, write_timeout=WRITE_TIMEOUT_S)
             time.sleep(0.3)
         except Exception as e:
             messagebox.showerror("Connect", f"Cannot open {port}:\n{e}")
             self.ser = None
             return
 
+        self.detector.reset()
         self.stop_event.clear()
+        self.writer = SerialWriter(self.ser).start()
         self.reader_thread = threading.Thread(target=self._reader, daemon=True)
         self.reader_thread.start()
         self.connected = True
         self.connect_btn.config(text="Disconnect")
         self.ax.set_title(f"Raw Signal ({port} @ {baud})")
         self.last_sent = None
+        self.board_sent = BOARD_OFF   # la placa arranca sin control local
+        self.board_cfg = None
+        self.board_led = None
+        self.board_ready = False
+        self.after(BOARD_RESET_MS, self._board_ready)
 
     def disconnect(self):
         self.stop_event.set()
         self.connected = False
+        self.board_ready = False
+        if self.writer is not None:
+            self.writer.close()   # espera una escritura en curso y cierra el puerto
+            self.writer = None
         try:
             if self.ser and self.ser.is_open: self.ser.close()
         except Exception:
@@ -155,8 +233,18 @@ class SerialPlotterRange(tk.Tk):
                 try:
                     line = self.ser.readline().decode(errors="ignore").strip()
                     if not line: continue
+                    t_r = self.prof.t()
                     val = float(line)   # int o float por línea
+                    if self.board_sent != BOARD_OFF:
+                        # Sólo con control en la placa (firmware con marcadores): cambio del
+                        # LED en los bits altos. Sin él, valores > 1023 son muestras normales.
+                        val, ev = split_line_marker(val, (MARK_LED_ON, MARK_LED_OFF))
+                        if ev:
+                            self.board_led = ev == MARK_LED_ON
+                            self.board_changes += 1
                     self.buffer.append(val)
+                    self.detector.update(val)   # O(1) por muestra
+                    self.prof.add("reader", t_r)
                 except ValueError:
                     continue
                 except Exception:
@@ -166,62 +254,160 @@ class SerialPlotterRange(tk.Tk):
 
     # ---------- Procesamiento simple ----------
     def _get_processed(self):
-        data = list(self.buffer)
-        if not data: return data
-
-        # Quitar DC (centrar en 0)
-        if self.rm_dc.get():
-            mean = statistics.fmean(data)
-            data = [d - mean for d in data]
-
-        # Suavizado (media móvil)
-        N = max(1, int(self.smooth_n.get() or 1))
-        if N > 1 and len(data) >= N:
-            out = []
-            acc = sum(data[:N]); out.append(acc / N)
-            for i in range(N, len(data)):
-                acc += data[i] - data[i - N]
-                out.append(acc / N)
-            data = [out[0]] * (len(data) - len(out)) + out
-
-        return data
+        """Ventana del anillo procesada por la cadena de etapas (DC opcional y suavizado)."""
+        self.pipeline.configure(basic_chain(self.rm_dc.get(), max(1, int(self.smooth_n.get() or 1))))
+        return self.pipeline.run(self.buffer.latest(BUFFER_LEN), prof=self.prof)["out"]
+
+    # ---------- Beats ----------
+    def _update_beats(self, y):
+        """Marca los latidos ya detectados por el lector (no se re-escanea el buffer)."""
+        if not self.beats_on.get():
+            self.beat_pts.set_data([], [])
+            self.bpm_var.set("")
+            return
+        try:
+            fs = float(self.fs_var.get())
+        except (tk.TclError, ValueError):
+            fs = self.detector.fs
+        if fs > 0 and abs(fs - self.detector.fs) > 1e-9:
+            self.detector.set_fs(fs)
+            self.detector.reset()
+        xs = self.detector.markers(len(y))
+        self.beat_pts.set_data(xs, y[xs])
+        self.bpm_var.set(self.detector.summary())
 
     # ---------- Gráfica ----------
     def _tick(self):
+        prof = self.prof
+        t_tick = prof.begin("plot", 0.040)
+        t = prof.t()
         y = self._get_processed()
-        if y:
+        prof.add("process", t)
+        if y.size:
             if self.auto_y.get():
-                y_min, y_max = min(y), max(y)
+                y_min, y_max = float(y.min()), float(y.max())
                 if y_max == y_min: y_max = y_min + 1.0
                 span = y_max - y_min; pad = max(1.0, span * 0.15)
                 self.ax.set_ylim(y_min - pad, y_max + pad)
             self.line.set_ydata(y)
+            self._update_beats(y)
+        if prof.enabled: self.prof_text.set_text(prof.summary())
         self.canvas.draw_idle()
+        prof.end("plot", t_tick)
         self.after(40, self._tick)
 
     # ---------- Control por rango ----------
-    def _control_tick(self):
-        if self.enable_ctl.get() and self.connected and self.ser is not None:
-            y = self._get_processed()
-            if y:
-                try:
-                    low = float(self.low_var.get())
-                    high = float(self.high_var.get())
-                    if low > high: low, high = high, low
-                except ValueError:
-                    low, high = -50.0, 50.0
+    def _range(self):
+        try:
+            low = float(self.low_var.get())
+            high = float(self.high_var.get())
+            if low > high: low, high = high, low
+        except (tk.TclError, ValueError):
+            low, high = -50.0, 50.0
+        return low, high
 
-                val = y[-1]  # último valor (centrado y suavizado según opciones)
+    def _control_tick(self):
+        t_tick = self.prof.begin("control", CONTROL_MS / 1000.0)
+        auto = self.auto_rng.get()
+        board = self.board_ctl.get() or self.board_sent != BOARD_OFF
+        if (self.enable_ctl.get() or auto or board) and self.connected and self.writer is not None:
+            val = None
+            if auto or not board:
+                y = self._get_processed()
+                val = float(y[-1]) if y.size else None  # último valor (centrado y suavizado según opciones)
+            calibrating = auto and val is not None and self._auto_range(val)
+            if board:
+                # La placa decide por muestra; aquí sólo se sube la config. y se muestra su estado
+                self._board_control(self.board_ctl.get() and self.enable_ctl.get() and not calibrating)
+            elif val is not None and self.enable_ctl.get() and not calibrating:
+                low, high = self._range()
                 want = '1' if (val >= low and val <= high) else '0'
 
                 if want != self.last_sent:
-                    try:
-                        self.ser.write(want.encode())  # enviar '1' o '0'
-                        self.last_sent = want
-                        self.status_var.set(f"LED: {'ON' if want=='1' else 'OFF'}  (val={val:.1f}, range=[{low},{high}])")
-                    except Exception:
-                        pass
-        self.after(80, self._control_tick)  # ~12.5 Hz de decisión
+                    self.writer.send(want.encode())  # enviar '1' o '0' (no bloquea)
+                    self.last_sent = want
+                    self.status_var.set(f"LED: {'ON' if want=='1' else 'OFF'}  (val={val:.1f}, range=[{low:.4g},{high:.4g}])")
+            self.tx_var.set(self.writer.status())
+        self.prof.end("control", t_tick)
+        self.after(CONTROL_MS, self._control_tick)  # ~12.5 Hz de decisión
+
+    def _board_control(self, on):
+        """Sube la config. a la placa sólo si cambió (o la retira) y muestra el estado que informa.
+
+        Suavizado y DC se suben en cuanto cambian (la placa reinicia sus
+        filtros); los umbrales sólo si se movieron más de BOARD_DEADBAND del
+        rango y como mucho cada BOARD_MIN_S, así Auto range no sube una config.
+        por tick (la placa los cambia sin tocar los filtros).
+        """
+        if on and not self.board_ready: return
+        cfg = None
+        if on:
+            low, high = self._range()
+            try:
+                n = max(1, int(self.smooth_n.get() or 1))
+            except (tk.TclError, ValueError):
+                n = 1
+            cfg = (low, high, n, BOARD_DC_SHIFT if self.rm_dc.get() else 0)
+            old = self.board_cfg
+            if old is not None and old[2:] == cfg[2:]:
+                tol = max(BOARD_DEADBAND * (high - low), 1.0 / 16)   # resolución Q4 de la placa
+                moved = abs(low - old[0]) > tol or abs(high - old[1]) > tol
+                if not moved or time.monotonic() - self.board_t < BOARD_MIN_S:
+                    cfg = old
+        cmd = board_control_command(*cfg) if cfg is not None else BOARD_OFF
+        if cmd != self.board_sent:
+            self.writer.send(cmd, key="board")
+            if self.board_sent == BOARD_OFF: self.board_led = None
+            self.board_sent, self.board_cfg = cmd, cfg
+            self.board_t = time.monotonic()
+            self.last_sent = None   # al volver al PC se reenvía su estado
+        if not on: return
+        led = self.board_led
+        state = "waiting" if led is None else ("ON" if led else "OFF")
+        low, high = self.board_cfg[:2]
+        self.status_var.set(f"LED (board): {state}  ({self.board_changes} changes, range=[{low:.4g},{high:.4g}])")
+
+    def _board_ready(self):
+        self.board_ready = self.connected
+
+    def _auto_range(self, val):
+        """Actualiza LOW/HIGH con los percentiles en streaming; True mientras dura la línea base."""
+        try:
+            key = (float(self.auto_lo.get()), float(self.auto_hi.get()), float(self.auto_base_s.get()))
+        except (tk.TclError, ValueError):
+            return False
+        if key != self._auto_key or self.auto_tracker is None:
+            p = [min(99.0, max(1.0, v)) / 100.0 for v in key[:2]]
+            n = max(5, int(key[2] * 1000.0 / CONTROL_MS))
+            self.auto_tracker = QuantileTracker(2, p, baseline_n=n)
+            self._auto_key = key
+        tr = self.auto_tracker
+        tr.update(val)
+        lo, hi = tr.value
+        if np.isfinite(lo) and np.isfinite(hi):
+            self.low_var.set(round(float(lo), 3))
+            self.high_var.set(round(float(hi), 3))
+        if tr.calibrating:
+            self.status_var.set(f"Auto range: baseline {tr.progress()*100:.0f}%")
+            self.last_sent = None   # al terminar se reenvía el estado
+            return True
+        return False
+
+    def _recalibrate(self):
+        if self.auto_tracker is not None: self.auto_tracker.reset()
+
+    # ---------- Profiling ----------
+    def _toggle_profile(self):
+        self.prof.enabled = self.prof_on.get()
+        self.prof.reset()
+        if not self.prof.enabled: self.prof_text.set_text("")
+
+    def _start_cprofile(self):
+        try:
+            sec = float(self.cprof_sec.get())
+        except (tk.TclError, ValueError):
+            sec = CPROFILE_SEC
+        self.prof.start_cprofile(self, seconds=max(0.5, sec))
 
     # ---------- Cierre ----------
     def on_close(self):
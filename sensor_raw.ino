@@ -1,16 +1,112 @@
 const int SENSOR_PIN = A0;
-const unsigned long PERIOD_MS = 10;
-unsigned long t0 = 0;
+
+// Muestreo por hardware: Timer1 dispara el ADC (auto-trigger), la ISR del ADC
+// sólo guarda el valor en un anillo y loop() lo vacía por Serial. Así el reloj
+// de muestreo no depende de millis() ni de que Serial.write() se bloquee.
+// Comandos (terminados en '\n'): "R<hz>" fija la tasa, "B1"/"B0" bloques binarios / líneas ASCII,
+// "M<id>" marca (id 1..63 en los bits 10..15) la próxima muestra.
+const uint8_t SENSOR_CH = SENSOR_PIN - A0;
+const unsigned long RATE_DEFAULT = 100;   // Hz (igual que el antiguo PERIOD_MS = 10)
+const unsigned long RATE_MAX = 8000;      // conversión ADC ~104 us con prescaler 128
+const int RING_LEN = 256;                 // potencia de 2
+const int BLOCK_N = 32;                   // muestras por bloque binario
+
+volatile uint16_t ring[RING_LEN];
+volatile uint8_t ring_head = 0;           // lo escribe la ISR
+volatile uint8_t ring_tail = 0;           // lo escribe loop()
+volatile uint16_t overruns = 0;           // muestras perdidas por anillo lleno
+
+bool block_mode = false;
+uint8_t block_seq = 0;
+unsigned long rate_hz = RATE_DEFAULT;
+
+volatile uint8_t mark_pending = 0;        // id a estampar en la próxima muestra
+
+char cmd_buf[12];
+int cmd_len = 0;
+
+ISR(ADC_vect) {
+  uint16_t v = ADC;
+  TIFR1 = _BV(OCF1B);                     // rearma el disparo del ADC
+  if (mark_pending) { v |= (uint16_t)mark_pending << 10; mark_pending = 0; }
+  uint8_t next = (ring_head + 1) & (RING_LEN - 1);
+  if (next == ring_tail) { overruns++; return; }
+  ring[ring_head] = v;
+  ring_head = next;
+}
+
+void setRate(unsigned long hz) {
+  if (hz < 31) hz = 31;                   // límite de Timer1 con prescaler 8
+  if (hz > RATE_MAX) hz = RATE_MAX;
+  rate_hz = hz;
+  noInterrupts();
+  TCCR1A = 0;
+  TCCR1B = _BV(WGM12) | _BV(CS11);        // CTC, prescaler 8 -> 2 MHz
+  OCR1A = (uint16_t)(2000000UL / hz - 1);
+  OCR1B = OCR1A;                          // Compare B = disparo del ADC
+  TCNT1 = 0;
+  interrupts();
+}
+
+void setupAdc() {
+  ADMUX  = _BV(REFS0) | (SENSOR_CH & 0x07);                         // AVcc, canal
+  ADCSRB = _BV(ADTS2) | _BV(ADTS0);                                 // trigger: Timer1 Compare B
+  ADCSRA = _BV(ADEN) | _BV(ADATE) | _BV(ADIE) | _BV(ADPS2) | _BV(ADPS1) | _BV(ADPS0);
+}
+
+uint8_t ringCount() {
+  return (uint8_t)((ring_head - ring_tail) & (RING_LEN - 1));
+}
+
+uint16_t ringPop() {
+  uint16_t v = ring[ring_tail];
+  ring_tail = (ring_tail + 1) & (RING_LEN - 1);
+  return v;
+}
+
+// Bloque: A5 5A seq n [n x uint16 LE] suma8(payload)
+void sendBlock(uint8_t n) {
+  uint8_t hdr[4] = {0xA5, 0x5A, block_seq++, n};
+  Serial.write(hdr, 4);
+  uint8_t sum = 0;
+  for (uint8_t i = 0; i < n; i++) {
+    uint16_t v = ringPop();
+    uint8_t b[2] = {(uint8_t)(v & 0xFF), (uint8_t)(v >> 8)};
+    sum += b[0] + b[1];
+    Serial.write(b, 2);
+  }
+  Serial.write(sum);
+}
+
+void runCommand() {
+  cmd_buf[cmd_len] = '\0';
+  if (cmd_buf[0] == 'R') setRate(strtoul(cmd_buf + 1, NULL, 10));
+  else if (cmd_buf[0] == 'B') block_mode = (cmd_buf[1] == '1');
+  else if (cmd_buf[0] == 'M') mark_pending = atoi(cmd_buf + 1) & 0x3F;
+}
 
 void setup() {
-  Serial.begin(115200);
+  Serial.begin(115200);   // en modo bloque a varios kHz usar 500000/1000000 en ambos lados
+  setupAdc();
+  setRate(RATE_DEFAULT);
 }
 
 void loop() {
-  unsigned long t = millis();
-  if (t - t0 >= PERIOD_MS) {
-    t0 = t;
-    int v = analogRead(SENSOR_PIN);
-    Serial.println(v);
+  // 1) vaciar el anillo (nunca desde la ISR)
+  if (block_mode) {
+    if (ringCount() >= BLOCK_N) sendBlock(BLOCK_N);
+  } else if (ringCount() > 0) {
+    Serial.println(ringPop());
+  }
+
+  // 2) comandos
+  while (Serial.available() > 0) {
+    char c = (char)Serial.read();
+    if (c == '\n' || c == '\r') {
+      if (cmd_len > 0) runCommand();
+      cmd_len = 0;
+    } else if (cmd_len < (int)sizeof(cmd_buf) - 1) {
+      cmd_buf[cmd_len++] = c;
+    }
   }
 }
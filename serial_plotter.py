@@ -1,11 +1,16 @@
-import threading, time, statistics
-from collections import deque
+import threading, time
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+from beat_detector import BeatDetector
+from tick_profiler import StageProfiler, CPROFILE_SEC
+from ring_buffer import SampleRing
+from signal_graph import Pipeline, basic_chain
+from recording import Recording, RecordingWriter
+
 # Serial
 try:
     import serial
@@ -15,6 +20,9 @@ except Exception:
     HAS_SERIAL = False
 
 BUFFER_LEN = 500  # muestras visibles
+FS_DEFAULT = 100.0  # Hz (PERIOD_MS = 10 en el sketch)
+ZOOM_STEP = 1.25   # factor de zoom por paso de rueda en el visor de grabaciones
+REC_TYPES = [("Comprimido sin pérdida", "*.sdc"), ("Muestras float32", "*.f32"), ("Todos", "*.*")]
 
 class SerialPlotterMin(tk.Tk):
     def __init__(self):
@@ -26,8 +34,19 @@ class SerialPlotterMin(tk.Tk):
         self.ser = None
         self.reader_thread = None
         self.stop_event = threading.Event()
-        self.buffer = deque([0.0]*BUFFER_LEN, maxlen=BUFFER_LEN)
+        self.buffer = SampleRing(BUFFER_LEN, fill=0.0)
+        self.pipeline = Pipeline()   # DC -> suavizado (signal_graph), buffers reutilizados
         self.connected = False
+        self.detector = BeatDetector(FS_DEFAULT)   # corre en el lector, muestra a muestra
+        self.prof = StageProfiler()                 # tiempos por etapa (desactivado por defecto)
+        # Grabación a disco y visor offline (memmap + índice min/max, ver recording.py)
+        self.recorder = None      # RecordingWriter activo (lo alimenta el lector)
+        self.rec = None           # Recording abierta en el visor; None = modo en vivo
+        self.rec_span = (0, 0)    # [inicio, fin) visibles, en muestras
+        self._rec_dirty = False
+        self._rec_ready = False
+        self._pan = None          # (x píxel, span) al empezar a arrastrar
+        self._index_stop = threading.Event()
 
         # --- UI superior ---
         top = ttk.Frame(self, padding=8)
@@ -61,6 +80,33 @@ class SerialPlotterMin(tk.Tk):
         self.smooth_n = tk.IntVar(value=5)  # 1 = sin suavizado
         ttk.Entry(top, textvariable=self.smooth_n, width=5).pack(side="left", padx=(0,8))
 
+        ttk.Label(top, text="Fs (Hz):").pack(side="left", padx=(10,2))
+        self.fs_var = tk.DoubleVar(value=FS_DEFAULT)
+        ttk.Entry(top, textvariable=self.fs_var, width=6).pack(side="left")
+
+        self.beats_on = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="Latidos", variable=self.beats_on).pack(side="left", padx=(10,2))
+        self.bpm_var = tk.StringVar(value="")
+        ttk.Label(top, textvariable=self.bpm_var).pack(side="left", padx=(6,2))
+
+        self.prof_on = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top, text="Perfil", variable=self.prof_on, command=self._toggle_profile).pack(side="left", padx=(10,2))
+        self.cprof_sec = tk.DoubleVar(value=CPROFILE_SEC)
+        ttk.Button(top, text="cProfile", command=self._start_cprofile).pack(side="left", padx=2)
+        ttk.Entry(top, textvariable=self.cprof_sec, width=4).pack(side="left")
+        ttk.Label(top, text="s").pack(side="left", padx=(1,2))
+
+        # --- Grabación / visor ---
+        rec_bar = ttk.Frame(self, padding=(8,0))
+        rec_bar.pack(fill="x")
+        self.rec_on = tk.BooleanVar(value=False)
+        ttk.Checkbutton(rec_bar, text="Grabar", variable=self.rec_on, command=self._toggle_record).pack(side="left")
+        ttk.Button(rec_bar, text="Abrir grabación…", command=self.open_recording).pack(side="left", padx=(10,2))
+        ttk.Button(rec_bar, text="Todo", command=self._rec_full).pack(side="left", padx=2)
+        ttk.Button(rec_bar, text="En vivo", command=self.close_recording).pack(side="left", padx=2)
+        self.rec_var = tk.StringVar(value="")
+        ttk.Label(rec_bar, textvariable=self.rec_var).pack(side="left", padx=10)
+
         # --- Gráfica ---
         fig = Figure(figsize=(7.8, 3.6), dpi=100)
         self.ax = fig.add_subplot(111)
@@ -69,11 +115,19 @@ class SerialPlotterMin(tk.Tk):
         self.ax.set_ylabel("amplitud")
         self.ax.set_xlim(0, BUFFER_LEN-1)
         self.ax.set_ylim(0, 1023)  # solo se usa si Auto Y está desactivado
-        (self.line,) = self.ax.plot(range(BUFFER_LEN), list(self.buffer), lw=1)
+        (self.line,) = self.ax.plot(range(BUFFER_LEN), self.buffer.latest(BUFFER_LEN).copy(), lw=1)
+        (self.beat_pts,) = self.ax.plot([], [], "o", color="red", ms=5)  # marcas de latido
         self.ax.grid(True, alpha=0.3)
+        self.prof_text = self.ax.text(0.01, 0.98, "", transform=self.ax.transAxes, va="top", fontsize=7,
+                                      family="monospace", bbox=dict(facecolor="white", alpha=0.8, lw=0))
 
         self.canvas = FigureCanvasTkAgg(fig, master=self)
         self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=8, pady=8)
+        self.prof.wrap(self.canvas, "draw", "draw")   # el render real ocurre en idle
+        self.canvas.mpl_connect("scroll_event", self._on_scroll)
+        self.canvas.mpl_connect("button_press_event", self._on_press)
+        self.canvas.mpl_connect("motion_notify_event", self._on_motion)
+        self.canvas.mpl_connect("button_release_event", self._on_release)
 
         # Refresco de gráfica
         self.after(40, self._tick)
@@ -115,6 +169,7 @@ class SerialPlotterMin(tk.Tk):
             self.ser = None
             return
 
+        self.detector.reset()
         self.stop_event.clear()
         self.reader_thread = threading.Thread(target=self._reader, daemon=True)
         self.reader_thread.start()
@@ -142,8 +197,13 @@ class SerialPlotterMin(tk.Tk):
                     line = self.ser.readline().decode(errors="ignore").strip()
                     if not line:
                         continue
+                    t_r = self.prof.t()
                     val = float(line)  # int o float por línea
                     self.buffer.append(val)
+                    self.detector.update(val)   # O(1) por muestra
+                    rec = self.recorder
+                    if rec is not None: rec.add(val)
+                    self.prof.add("reader", t_r)
                 except ValueError:
                     continue
                 except Exception:
@@ -153,38 +213,45 @@ class SerialPlotterMin(tk.Tk):
 
     # ---------- Utils de señal ----------
     def _get_processed(self):
-        """Devuelve una lista procesada (opcional DC y suavizado)."""
-        data = list(self.buffer)
-
-        # Quitar DC (resta la media) para centrar la onda
-        if self.rm_dc.get() and data:
-            mean = statistics.fmean(data)
-            data = [d - mean for d in data]
-
-        # Suavizado (media móvil de ventana N)
-        N = max(1, int(self.smooth_n.get() or 1))
-        if N > 1 and len(data) >= N:
-            out = []
-            acc = sum(data[:N])
-            out.append(acc / N)
-            for i in range(N, len(data)):
-                acc += data[i] - data[i - N]
-                out.append(acc / N)
-            # para mantener el mismo largo, completa al inicio
-            pad = [out[0]] * (len(data) - len(out))
-            data = pad + out
-
-        return data
+        """Ventana del anillo procesada por la cadena de etapas (DC opcional y suavizado)."""
+        self.pipeline.configure(basic_chain(self.rm_dc.get(), max(1, int(self.smooth_n.get() or 1))))
+        return self.pipeline.run(self.buffer.latest(BUFFER_LEN), prof=self.prof)["out"]
+
+    # ---------- Latidos ----------
+    def _update_beats(self, y):
+        """Marca los latidos ya detectados por el lector (no se re-escanea el buffer)."""
+        if not self.beats_on.get():
+            self.beat_pts.set_data([], [])
+            self.bpm_var.set("")
+            return
+        try:
+            fs = float(self.fs_var.get())
+        except (tk.TclError, ValueError):
+            fs = self.detector.fs
+        if fs > 0 and abs(fs - self.detector.fs) > 1e-9:
+            self.detector.set_fs(fs)
+            self.detector.reset()
+        xs = self.detector.markers(len(y))
+        self.beat_pts.set_data(xs, y[xs])
+        self.bpm_var.set(self.detector.summary())
 
     # ---------- Gráfica ----------
     def _tick(self):
+        if self.rec is not None:
+            self._tick_recording()
+            self.after(40, self._tick); return
+        prof = self.prof
+        t_tick = prof.begin("plot", 0.040)
+        t = prof.t()
         y = self._get_processed()
-        if not y:
+        prof.add("process", t)
+        if not y.size:
+            prof.end("plot", t_tick)
             self.after(40, self._tick); return
 
         # Auto Y: ajusta a min/max con margen
         if self.auto_y.get():
-            y_min, y_max = min(y), max(y)
+            y_min, y_max = float(y.min()), float(y.max())
             if y_max == y_min:
                 y_max = y_min + 1.0
             span = y_max - y_min
@@ -193,11 +260,148 @@ class SerialPlotterMin(tk.Tk):
         # Si no hay Auto Y, se conserva el ylim actual
 
         self.line.set_ydata(y)
+        self._update_beats(y)
+        if prof.enabled: self.prof_text.set_text(prof.summary())
         self.canvas.draw_idle()
+        prof.end("plot", t_tick)
         self.after(40, self._tick)
 
+    # ---------- Grabación ----------
+    def _toggle_record(self):
+        if self.rec_on.get():
+            path = filedialog.asksaveasfilename(
+                title="Grabar en", defaultextension=".sdc",
+                initialfile=time.strftime("rec_%Y%m%d_%H%M%S.sdc"),
+                filetypes=REC_TYPES)
+            if not path:
+                self.rec_on.set(False); return
+            try:
+                fs = float(self.fs_var.get())
+            except (tk.TclError, ValueError):
+                fs = None
+            self.recorder = RecordingWriter(path, fs=fs)
+            self.rec_var.set(f"Grabando {path}")
+        else:
+            w, self.recorder = self.recorder, None
+            if w is None: return
+            w.close()
+            self.rec_var.set(f"{w.n} muestras en {w.path}")
+            # El índice se construye ya, así abrir la grabación luego es inmediato
+            threading.Thread(target=Recording(w.path).build, daemon=True).start()
+
+    # ---------- Visor de grabaciones ----------
+    def open_recording(self):
+        path = filedialog.askopenfilename(
+            title="Abrir grabación", filetypes=REC_TYPES)
+        if not path: return
+        try:
+            rec = Recording(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Grabación", f"No se pudo abrir {path}:\n{e}"); return
+        if rec.n == 0:
+            messagebox.showinfo("Grabación", "El archivo está vacío."); return
+        self.close_recording()
+        if rec.fs is None:
+            try: rec.fs = float(self.fs_var.get())
+            except (tk.TclError, ValueError): rec.fs = FS_DEFAULT
+        self.rec = rec
+        self._rec_ready = rec.ready
+        if not rec.ready:
+            # Índice ausente o incompleto: se completa en segundo plano, sin bloquear la UI
+            self._index_stop.clear()
+            threading.Thread(target=rec.build, args=(self._index_stop,), daemon=True).start()
+        self.beat_pts.set_data([], [])
+        self.ax.set_xlabel("s")
+        self.ax.set_title(f"{path}  ({rec.n} muestras @ {rec.fs:g} Hz)")
+        self._rec_full()
+
+    def close_recording(self):
+        if self.rec is None: return
+        self._index_stop.set()
+        self.rec = None
+        self.ax.set_xlabel("muestras recientes")
+        self.ax.set_title("Raw Signal")
+        self.ax.set_xlim(0, BUFFER_LEN-1)
+        self.line.set_data(range(BUFFER_LEN), self.buffer.latest(BUFFER_LEN).copy())
+        self.rec_var.set("")
+        self.canvas.draw_idle()
+
+    def _rec_full(self):
+        if self.rec is None: return
+        self.rec_span = (0, self.rec.n)
+        self._rec_dirty = True
+
+    def _set_span(self, start, span):
+        n = self.rec.n
+        span = int(min(n, max(16, span)))
+        start = int(min(max(0, start), n - span))
+        if (start, start + span) != self.rec_span:
+            self.rec_span = (start, start + span)
+            self._rec_dirty = True
+
+    def _tick_recording(self):
+        rec = self.rec
+        if not self._rec_ready:
+            if rec.ready:
+                self._rec_ready = self._rec_dirty = True
+            else:
+                self.rec_var.set(f"Índice {rec.progress*100:.0f}%")
+        if not self._rec_dirty: return
+        self._rec_dirty = False
+        t = self.prof.t()
+        start, stop = self.rec_span
+        xs, ys = rec.view(start, stop, self.ax.bbox.width)   # sólo lee el nivel/páginas necesarios
+        self.prof.add("rec_view", t)
+        self.line.set_data(xs / rec.fs, ys)
+        self.ax.set_xlim(start / rec.fs, stop / rec.fs)
+        if ys.size and self.auto_y.get():
+            y_min, y_max = float(ys.min()), float(ys.max())
+            if y_max == y_min: y_max = y_min + 1.0
+            pad = max(1.0, (y_max - y_min) * 0.15)
+            self.ax.set_ylim(y_min - pad, y_max + pad)
+        if self._rec_ready:
+            self.rec_var.set(f"{start/rec.fs:.2f}–{stop/rec.fs:.2f} s  ({stop-start} muestras, {xs.size} puntos)")
+        self.canvas.draw_idle()
+
+    def _on_scroll(self, event):
+        if self.rec is None or event.xdata is None: return
+        start, stop = self.rec_span
+        k = 1.0 / ZOOM_STEP if event.button == "up" else ZOOM_STEP
+        center = event.xdata * self.rec.fs
+        span = (stop - start) * k
+        self._set_span(center - (center - start) * k, span)
+
+    def _on_press(self, event):
+        if self.rec is None or event.button != 1 or event.inaxes is not self.ax: return
+        self._pan = (event.x, self.rec_span)
+
+    def _on_motion(self, event):
+        if self.rec is None or self._pan is None: return
+        x0, (start, stop) = self._pan
+        per_px = (stop - start) / max(1.0, self.ax.bbox.width)
+        self._set_span(start - (event.x - x0) * per_px, stop - start)
+
+    def _on_release(self, event):
+        self._pan = None
+
+    # ---------- Perfilado ----------
+    def _toggle_profile(self):
+        self.prof.enabled = self.prof_on.get()
+        self.prof.reset()
+        if not self.prof.enabled: self.prof_text.set_text("")
+
+    def _start_cprofile(self):
+        try:
+            sec = float(self.cprof_sec.get())
+        except (tk.TclError, ValueError):
+            sec = CPROFILE_SEC
+        self.prof.start_cprofile(self, seconds=max(0.5, sec))
+
     # ---------- Cierre ----------
     def on_close(self):
+        self._index_stop.set()
+        w, self.recorder = self.recorder, None
+        if w is not None: w.close()   # el índice se construirá al abrir la grabación
         self.disconnect()
         self.destroy()
 
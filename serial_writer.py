@@ -0,0 +1,93 @@
+import time, threading
+
+WRITE_TIMEOUT_S = 0.5     # write_timeout sugerido para serial.Serial
+RETRY_BACKOFF_S = 0.1     # espera tras un fallo antes de reintentar
+
+
+class SerialWriter:
+    """Hilo escritor con coalescencia: por cada clave sólo se envía el último estado.
+
+    send() nunca bloquea (se llama desde el hilo de Tk); las escrituras las hace
+    un hilo propio bajo `lock`, que también debe tomarse para cerrar el puerto.
+    El lector puede seguir haciendo readline() en paralelo (pyserial es full-duplex).
+    """
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.lock = threading.Lock()          # protege write()/close()
+        self._cv = threading.Condition()
+        self._pending = {}                    # clave -> (bytes, t_encolado)
+        self._stop = False
+        self._thread = None
+        # Estadísticas (latencia = encolado -> write() terminado)
+        self.writes = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        with self._cv:
+            self._stop = True
+            self._pending.clear()
+            self._cv.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def send(self, data, key="out"):
+        with self._cv:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = (data, time.perf_counter())
+            self._cv.notify()
+
+    def close(self):
+        """Detiene el hilo y cierra el puerto sin cortar una escritura a medias."""
+        self.stop()
+        with self.lock:
+            try:
+                if self.ser and self.ser.is_open: self.ser.close()
+            except Exception:
+                pass
+
+    def status(self):
+        s = f"tx {self.last_latency*1e3:.1f} ms (avg {self.avg_latency*1e3:.1f}, max {self.max_latency*1e3:.1f})"
+        if self.failures:
+            s += f" | fails {self.failures}: {self.last_error}"
+        return s
+
+    # ----- Hilo -----
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._pending and not self._stop:
+                    self._cv.wait()
+                if self._stop: return
+                batch = self._pending
+                self._pending = {}
+            for key, (data, t_in) in batch.items():
+                try:
+                    with self.lock:
+                        self.ser.write(data)
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    with self._cv:
+                        # reintenta sólo si no llegó un estado más nuevo
+                        self._pending.setdefault(key, (data, t_in))
+                    time.sleep(RETRY_BACKOFF_S)
+                    continue
+                dt = time.perf_counter() - t_in
+                self.writes += 1
+                self.last_latency = dt
+                self.avg_latency = dt if self.writes == 1 else 0.9 * self.avg_latency + 0.1 * dt
+                self.max_latency = max(self.max_latency, dt)
@@ -0,0 +1,354 @@
+import numpy as np
+
+# Registro de etapas por nombre: una etapa nueva sólo necesita @register_stage
+STAGES = {}
+
+
+def register_stage(name):
+    def deco(cls):
+        cls.kind = name
+        STAGES[name] = cls
+        return cls
+    return deco
+
+
+class Stage:
+    """Etapa de la cadena: bloque NumPy -> bloque NumPy.
+
+    Cada etapa reutiliza su buffer de salida entre ticks (`_buf`). Las
+    marcadas `affine` (y = a*x + b, con a y b a partir de la media/desviación
+    del bloque) y `elementwise` (y[i] = f(x[i]), en sitio) se funden con sus
+    vecinas en un solo buffer: ver _Fused. El bloque puede traer ejes
+    iniciales (un lote de ventanas, una por fila): todo opera sobre el último.
+    """
+    kind = None
+    affine = False
+    elementwise = False
+    needs_stats = False       # coeffs() usa media/desviación del bloque
+
+    def __init__(self, **params):
+        self.params = dict(params)
+        self._out = None
+
+    def set_params(self, **params):
+        self.params = dict(params)
+
+    def _buf(self, shape, dtype=float):
+        if self._out is None or self._out.shape != shape or self._out.dtype != dtype:
+            self._out = np.empty(shape, dtype)
+        return self._out
+
+    def process(self, x, ctx):
+        raise NotImplementedError
+
+    # affine: (a, b) tal que y = a*x + b;  elementwise: modifica buf en sitio
+    def coeffs(self, mean, std):
+        raise NotImplementedError
+
+    def apply(self, buf):
+        raise NotImplementedError
+
+
+# ----- Filtros / transformaciones elementales -----
+@register_stage("copy")
+class Copy(Stage):
+    """Materializa el bloque (la ventana del anillo es una vista que el lector sigue escribiendo)."""
+    affine = True
+    def coeffs(self, mean, std): return 1.0, 0.0
+
+
+@register_stage("dc")
+class RemoveDC(Stage):
+    affine = True
+    needs_stats = True
+    def coeffs(self, mean, std): return 1.0, -mean
+
+
+@register_stage("zscore")
+class ZScore(Stage):
+    affine = True
+    needs_stats = True
+    def coeffs(self, mean, std):
+        if np.ndim(std):
+            s = np.where(std >= 1e-9, std, 1.0)
+        else:
+            s = std if std >= 1e-9 else 1.0
+        return 1.0 / s, -mean / s
+
+
+@register_stage("gain")
+class Gain(Stage):
+    affine = True
+    def coeffs(self, mean, std):
+        return float(self.params.get("k", 1.0)), float(self.params.get("offset", 0.0))
+
+
+@register_stage("abs")
+class Abs(Stage):
+    elementwise = True
+    def apply(self, buf): np.abs(buf, out=buf)
+
+
+@register_stage("clip")
+class Clip(Stage):
+    elementwise = True
+    def apply(self, buf):
+        np.clip(buf, self.params.get("lo", -np.inf), self.params.get("hi", np.inf), out=buf)
+
+
+@register_stage("smooth")
+class MovingAverage(Stage):
+    """Media móvil de n muestras; el arranque se rellena con la primera salida (como antes)."""
+    def __init__(self, **params):
+        super().__init__(**params)
+        self._c = None            # suma acumulada reutilizada
+
+    def process(self, x, ctx):
+        n = max(1, int(self.params.get("n", 1)))
+        N = x.shape[-1]
+        out = self._buf(x.shape)
+        if n <= 1 or N < n:
+            out[...] = x
+            return out
+        c = self._c
+        if c is None or c.shape != x.shape[:-1] + (N + 1,):
+            c = self._c = np.zeros(x.shape[:-1] + (N + 1,))
+        np.cumsum(x, axis=-1, out=c[..., 1:])
+        np.subtract(c[..., n:], c[..., :-n], out=out[..., n-1:])
+        out[..., n-1:] *= 1.0 / n
+        out[..., :n-1] = out[..., n-1:n]
+        return out
+
+
+# ----- Espectro / rasgos -----
+@register_stage("psd")
+class Psd(Stage):
+    """PSD con ventana de Hann; ventana y eje de frecuencias cacheados por (N, fs). Deja ctx["freqs"]."""
+    def __init__(self, **params):
+        super().__init__(**params)
+        self._plan = None
+
+    def process(self, x, ctx):
+        N = x.shape[-1]; fs = ctx["fs"]
+        plan = self._plan
+        if plan is None or plan[0] != (N, fs):
+            w = np.hanning(N)
+            plan = self._plan = ((N, fs), w, float(np.sum(w**2)), np.fft.rfftfreq(N, d=1.0/fs))
+        _, w, w_norm, freqs = plan
+        X = np.fft.rfft(x * w, n=N)
+        out = self._buf(X.shape)
+        np.multiply(X.real, X.real, out=out)
+        out += X.imag**2
+        out *= 1.0 / w_norm
+        ctx["freqs"] = freqs
+        return out
+
+
+@register_stage("mpsd")
+class MultiPsd(Stage):
+    """PSD de varias ventanas a la vez (las últimas N_i muestras), en una sola rfft por lotes.
+
+    params: wins = (("nombre", N_i), ...). Todas se rellenan con ceros hasta
+    la mayor, así comparten eje de frecuencias (y plan de rasgos) y una
+    llamada FFT; cada fila se escala por N_i/nfft para conservar (aprox.) su
+    potencia total. Las filas cortas quedan en una rejilla interpolada (paso
+    fs/nfft): sus potencias de banda se suman sobre esos bins y difieren de un
+    análisis en su rejilla nativa (fs/N_i), sobre todo en bandas de pocos
+    bins nativos; la resolución real sigue siendo la de N_i.
+
+    Con detrend=True cada ventana resta su propia media (la de sus últimas
+    N_i muestras): la DC de una etapa previa es la de todo el bloque y la de
+    la ventana corta se colaría en las bandas bajas por el lóbulo principal de
+    Hann. Se resta en frecuencia, media * rfft(ventana), sin otra pasada sobre
+    el bloque. Deja ctx["freqs"] y ctx["res"] = {nombre: fila}.
+    """
+    def __init__(self, **params):
+        super().__init__(**params)
+        self._plan = None
+
+    def process(self, x, ctx):
+        wins = self.params["wins"]; fs = ctx["fs"]
+        plan = self._plan
+        if plan is None or plan[0] != (wins, fs):
+            nfft = max(n for _, n in wins)
+            W = np.zeros((len(wins), nfft))       # Hann de cada ventana al final del segmento
+            M = np.zeros((len(wins), nfft))       # media de las últimas N_i muestras
+            scale = np.empty((len(wins), 1))
+            for i, (_, n) in enumerate(wins):
+                w = np.hanning(n)
+                W[i, nfft-n:] = w
+                M[i, nfft-n:] = 1.0 / n
+                scale[i] = n / (nfft * float(np.sum(w**2)))
+            res = {name: i for i, (name, _) in enumerate(wins)}
+            plan = self._plan = ((wins, fs), nfft, W, M.T, np.fft.rfft(W, axis=-1), scale,
+                                 np.fft.rfftfreq(nfft, d=1.0/fs), res)
+        _, nfft, W, MT, WF, scale, freqs, res = plan
+        seg = x[..., -nfft:]
+        X = np.fft.rfft(seg[..., None, :] * W, axis=-1)      # (..., ventanas, F)
+        if self.params.get("detrend"):
+            X -= (seg @ MT)[..., None] * WF
+        out = self._buf(X.shape)
+        np.multiply(X.real, X.real, out=out)
+        out += X.imag**2
+        out *= scale
+        ctx["freqs"] = freqs
+        ctx["res"] = res
+        return out
+
+
+@register_stage("pick")
+class Pick(Stage):
+    """Fila de una resolución (params: res) de la salida de mpsd o de sus rasgos; vista, sin copia."""
+    def process(self, x, ctx):
+        return x[..., ctx["res"][self.params["res"]], :]
+
+
+@register_stage("features")
+class Features(Stage):
+    """Rasgos de eeg_features.FeatureExtractor (params: extractor, lo, hi) desde la PSD."""
+    def process(self, x, ctx):
+        fx = self.params["extractor"]
+        fx.set_bands(self.params["lo"], self.params["hi"])
+        return fx.compute(ctx["freqs"], x)
+
+
+# ----- Fusión -----
+class _Fused:
+    """Etapas affine/elementwise consecutivas ejecutadas sobre un solo buffer.
+
+    Las affine se componen analíticamente (media y desviación se propagan por
+    y = a*x + b), así que p.ej. dc -> gain -> zscore es una sola pasada a*x + b
+    con una sola reducción de media/desviación (por fila si es un lote).
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.name = "+".join(s.kind for s in stages)
+        self._out = None
+
+    def process(self, x, ctx):
+        if self._out is None or self._out.shape != x.shape:
+            self._out = np.empty(x.shape)
+        buf = self._out
+        src = x                        # de dónde sale la próxima pasada a*x + b
+        a, b = 1.0, 0.0
+        stats = None                   # (media, desv.) de src
+        for s in self.stages:
+            if s.affine:
+                if s.needs_stats and stats is None:
+                    if src.ndim > 1:
+                        stats = (np.mean(src, axis=-1, keepdims=True), np.std(src, axis=-1, keepdims=True))
+                    else:
+                        stats = (float(np.mean(src)), float(np.std(src)))
+                m, sd = (stats[0] * a + b, stats[1] * abs(a)) if stats is not None else (0.0, 0.0)
+                sa, sb = s.coeffs(m, sd)
+                a, b = sa * a, sa * b + sb
+            else:
+                self._flush(src, buf, a, b)
+                s.apply(buf)
+                src, a, b, stats = buf, 1.0, 0.0, None
+        self._flush(src, buf, a, b)
+        return buf
+
+    @staticmethod
+    def _flush(src, buf, a, b):
+        if np.ndim(a) or a != 1.0:
+            np.multiply(src, a, out=buf)
+        elif src is not buf:
+            np.copyto(buf, src)
+        if np.ndim(b) or b != 0.0: buf += b
+
+
+class _Node:
+    __slots__ = ("stage", "name", "input", "tap")
+
+    def __init__(self, stage, name, input, tap):
+        self.stage, self.name, self.input, self.tap = stage, name, input, tap
+
+
+def _normalize(spec):
+    out = []
+    for item in spec:
+        item = dict(item)
+        name = item.pop("stage")
+        if name not in STAGES:
+            raise ValueError(f"etapa desconocida: {name}")
+        out.append((name, item.pop("tap", None), item.pop("input", None), tuple(sorted(item.items()))))
+    return tuple(out)
+
+
+class Pipeline:
+    """Cadena declarativa de etapas: fuente -> filtros -> transformaciones -> rasgos -> salidas.
+
+    spec = [{"stage": "dc"}, {"stage": "smooth", "n": 5, "tap": "x"},
+            {"stage": "psd", "input": "x", "tap": "psd"}, ...]
+    Cada etapa toma la salida de la anterior (o la del tap `input`; "in" es la
+    fuente) y `tap` publica su salida con ese nombre en el resultado de run():
+    las apps leen ahí sus salidas. configure() sólo reconstruye si cambia la
+    estructura; si sólo cambian parámetros, las etapas conservan sus buffers.
+    """
+
+    def __init__(self, spec=None):
+        self._spec = None
+        self.nodes = []
+        if spec is not None: self.configure(spec)
+
+    def configure(self, spec):
+        spec = _normalize(spec)
+        if spec == self._spec: return False
+        same_shape = self._spec is not None and [s[:3] for s in spec] == [s[:3] for s in self._spec]
+        if same_shape:
+            stages = [st for node in self.nodes
+                      for st in (node.stage.stages if isinstance(node.stage, _Fused) else [node.stage])]
+            for st, (_, _, _, params) in zip(stages, spec):
+                st.set_params(**dict(params))
+        else:
+            self.nodes = self._build(spec)
+        self._spec = spec
+        return True
+
+    @staticmethod
+    def _build(spec):
+        nodes = []
+        group = []                      # etapas fusionables pendientes
+        g_input = None
+        def close(tap):
+            st = _Fused(list(group))
+            nodes.append(_Node(st, st.name, g_input, tap))
+            group.clear()
+        for name, tap, inp, params in spec:
+            st = STAGES[name](**dict(params))
+            fusable = st.affine or st.elementwise
+            if group and (not fusable or inp is not None):
+                close(None)
+            if fusable:
+                if not group: g_input = inp
+                group.append(st)
+                if tap is not None: close(tap)
+            else:
+                nodes.append(_Node(st, name, inp, tap))
+        if group: close(None)
+        return nodes
+
+    def run(self, x, prof=None, **ctx):
+        """Ejecuta la cadena sobre el bloque x; devuelve ctx con los taps ("in", "out", ...)."""
+        ctx["in"] = x
+        cur = x
+        for node in self.nodes:
+            src = cur if node.input is None else ctx[node.input]
+            t = prof.t() if prof is not None else None
+            cur = node.stage.process(src, ctx)
+            if t is not None: prof.add(node.name, t)
+            if node.tap is not None: ctx[node.tap] = cur
+        ctx["out"] = cur
+        return ctx
+
+
+def basic_chain(dc=True, smooth=1, tap="out"):
+    """Cadena común de las apps: quitar DC -> media móvil, publicada como `tap`."""
+    spec = []
+    if dc: spec.append({"stage": "dc"})
+    if smooth > 1: spec.append({"stage": "smooth", "n": int(smooth)})
+    if not spec: spec.append({"stage": "copy"})
+    spec[-1]["tap"] = tap
+    return spec
@@ -0,0 +1,190 @@
+import sys, time, threading, argparse
+import numpy as np
+
+from device_emulator import FirmwareEmulator, make_signal, SIGNALS, BAUD_DEFAULT
+from pty_emulator import PtyEmulator, write_command_log
+from sample_stream import BlockParser, rate_command, mode_command, split_markers
+from serial_writer import SerialWriter, WRITE_TIMEOUT_S
+from control_rules import encode_outputs
+
+try:
+    import serial
+except Exception:
+    serial = None
+
+# ===== Parámetros =====
+SECONDS_DEFAULT = 30.0
+CTL_HZ_DEFAULT = 12.5        # como _control_tick de sensor_processor.py (80 ms)
+SETTLE_S = 0.5               # descarte inicial (cambio de tasa/modo en vuelo)
+APPS = ("none", "plotter", "processor", "eeg")
+
+
+# ----- Rig sin GUI: lector + lazo de control sobre el pty -----
+class ProtocolSoak:
+    """Lector y lazo de control del mismo tipo que las apps, contra el pty.
+
+    Con la señal "ramp" cada muestra lleva su número (mod 1024), así que se
+    cuentan huecos exactos. La latencia de control es desde writer.send()
+    hasta que el emulador registra la trama (mismo reloj: emu.now()).
+    """
+
+    def __init__(self, pty, baud, block, ctl_hz):
+        self.pty = pty
+        self.emu = pty.emu
+        self.block = block
+        self.ctl_hz = ctl_hz
+        self.ser = serial.Serial(pty.port, baudrate=baud, timeout=0.2, write_timeout=WRITE_TIMEOUT_S)
+        self.writer = SerialWriter(self.ser).start()
+        self.parser = BlockParser()
+        self.stop_event = threading.Event()
+        self.received = 0
+        self.gaps = 0
+        self.missing = 0
+        self.markers = 0
+        self.bad_lines = 0
+        self._last = None
+        self._sent = {}              # trama -> t de envío (reloj del emulador)
+        self.latencies = []
+
+    def _check(self, vals):
+        vals, pos, _ = split_markers(vals)
+        self.markers += pos.size
+        if vals.size == 0: return
+        v = vals.astype(np.int64)
+        prev = np.concatenate(([self._last], v[:-1])) if self._last is not None else v[:-1]
+        cur = v if self._last is not None else v[1:]
+        step = (cur - prev) % 1024
+        bad = step != 1
+        self.gaps += int(bad.sum())
+        self.missing += int(((step[bad] - 1) % 1024).sum())
+        self._last = int(v[-1])
+        self.received += v.size
+
+    def _reader(self):
+        while not self.stop_event.is_set():
+            try:
+                if self.block:
+                    data = self.ser.read(self.ser.in_waiting or 1)
+                    if data: self._check(self.parser.feed(data))
+                    continue
+                line = self.ser.readline().decode(errors="ignore").strip()
+                if not line: continue
+                self._check(np.array([int(line)]))
+            except ValueError:
+                self.bad_lines += 1
+            except Exception:
+                break
+
+    def _control(self):
+        period = 1.0 / self.ctl_hz
+        k = 0
+        while not self.stop_event.wait(period):
+            k += 1
+            frame = encode_outputs(np.array([255 if k & 1 else 0, k & 0xFF, 0, 0], dtype=np.uint8))
+            self._sent[frame.decode().strip()] = self.emu.now()
+            self.writer.send(frame)
+
+    def run(self, seconds, rate):
+        self.writer.send(rate_command(rate), key="rate")
+        self.writer.send(mode_command(self.block), key="mode")
+        time.sleep(SETTLE_S)
+        self.ser.reset_input_buffer()
+        self.parser = BlockParser()
+        n0, ov0 = self.emu.n, self.emu.overruns
+        threads = [threading.Thread(target=self._reader, daemon=True),
+                   threading.Thread(target=self._control, daemon=True)]
+        for th in threads: th.start()
+        time.sleep(seconds)
+        self.stop_event.set()
+        for th in threads: th.join(2.0)
+        self.writer.close()
+        for t, cmd in self.emu.commands:
+            t_sent = self._sent.pop(cmd, None)
+            if t_sent is not None and t >= t_sent:
+                self.latencies.append(t - t_sent)
+        return self.emu.n - n0, self.emu.overruns - ov0
+
+    def report(self, taken, overruns, seconds):
+        lat = np.array(self.latencies) * 1e3
+        lines = [
+            f"samples: taken {taken}, received {self.received} ({self.received / seconds:.0f}/s), "
+            f"gaps {self.gaps} (missing {self.missing}), fw overruns {overruns}, bad lines {self.bad_lines}",
+        ]
+        if self.block: lines.append(self.parser.status())
+        if lat.size:
+            lines.append(f"control: {lat.size} frames, latency ms p50 {np.percentile(lat, 50):.2f} "
+                         f"p99 {np.percentile(lat, 99):.2f} max {lat.max():.2f}")
+        lines.append(f"writer: {self.writer.status()}")
+        return "\n".join(lines)
+
+
+# ----- Apps reales (Tk) contra el pty; sin pantalla: xvfb-run python soak_test.py --app eeg -----
+def run_app(name, port, baud, rate, block, seconds):
+    if name == "plotter":
+        from serial_plotter import SerialPlotterMin as App
+    elif name == "processor":
+        from sensor_processor import SerialPlotterRange as App
+    else:
+        from eeg_band_control import EEGBandControl as App
+    app = App()
+    app.withdraw()
+    app.port_var.set(port)
+    app.baud_var.set(str(baud))
+    if name == "eeg":
+        app.fs.set(rate)
+        app.block_mode.set(block)
+    else:
+        app.fs_var.set(rate)
+    if name != "plotter": app.enable_ctl.set(True)
+    app.prof_on.set(True); app._toggle_profile()
+    app.connect()
+    result = {}
+    def finish():
+        result["summary"] = app.prof.summary()
+        result["connected"] = app.connected
+        app.on_close()
+    app.after(int(seconds * 1000), finish)
+    app.mainloop()
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Prueba de resistencia/carga contra el Arduino emulado (pty)")
+    ap.add_argument("--app", choices=APPS, default="none", help="none = rig sin GUI")
+    ap.add_argument("--rate", type=float, default=1000.0)
+    ap.add_argument("--baud", type=int, default=BAUD_DEFAULT)
+    ap.add_argument("--block", action="store_true")
+    ap.add_argument("--seconds", type=float, default=SECONDS_DEFAULT)
+    ap.add_argument("--ctl-hz", type=float, default=CTL_HZ_DEFAULT)
+    ap.add_argument("--signal", choices=SIGNALS, default="ramp")
+    ap.add_argument("--log", help="CSV con la hora de llegada de cada comando")
+    ap.add_argument("--max-latency-ms", type=float, default=50.0, help="falla si p99 lo supera")
+    a = ap.parse_args(argv)
+    if serial is None:
+        print("Instala pyserial: pip install pyserial"); return 2
+
+    emu = FirmwareEmulator(signal=make_signal(a.signal), rate=a.rate, baud=a.baud)
+    ok = True
+    with PtyEmulator(emu) as pty:
+        print(f"pty {pty.port} | {a.rate:g} Hz | {'blocks' if a.block else 'lines'} | {a.seconds:g} s")
+        if a.app == "none":
+            rig = ProtocolSoak(pty, a.baud, a.block, a.ctl_hz)
+            taken, overruns = rig.run(a.seconds, a.rate)
+            print(rig.report(taken, overruns, a.seconds))
+            lat = np.array(rig.latencies) * 1e3
+            if a.signal == "ramp" and rig.gaps: ok = False
+            if overruns: ok = False
+            if lat.size and np.percentile(lat, 99) > a.max_latency_ms: ok = False
+        else:
+            res = run_app(a.app, pty.port, a.baud, a.rate, a.block, a.seconds)
+            print(res.get("summary", ""))
+            ok = res.get("connected", False) and emu.overruns == 0
+        print(pty.status())
+    if a.log:
+        write_command_log(emu.commands, a.log)
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
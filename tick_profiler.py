@@ -0,0 +1,140 @@
+import time, cProfile
+
+# ===== Parámetros =====
+EWMA_A = 0.1            # suavizado de tiempos medios
+CPROFILE_SEC = 10.0     # duración por defecto de la captura cProfile
+
+
+class _Stage:
+    __slots__ = ("n", "last", "avg", "max")
+
+    def __init__(self):
+        self.n = 0; self.last = 0.0; self.avg = 0.0; self.max = 0.0
+
+    def add(self, dt):
+        self.n += 1
+        self.last = dt
+        self.avg = dt if self.n == 1 else self.avg + EWMA_A * (dt - self.avg)
+        if dt > self.max: self.max = dt
+
+
+class _Loop:
+    __slots__ = ("period", "t_prev", "fps", "lag", "overruns")
+
+    def __init__(self, period):
+        self.period = period; self.t_prev = None; self.fps = 0.0
+        self.lag = 0.0; self.overruns = 0
+
+
+class StageProfiler:
+    """Tiempos por etapa y presupuesto de cuadro para los bucles after() de Tk.
+
+    Uso (coste ~1 µs por medición; cero trabajo si está desactivado):
+        t = prof.begin("plot", 0.040)     # al entrar al tick
+        t1 = prof.t(); ...; prof.add("fft", t1)
+        prof.end("plot", t)               # al salir del tick
+    `lag` es el retraso de la cola de eventos de Tk: intervalo real entre
+    ticks menos el periodo pedido y la duración del tick anterior.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.loops = {}
+        self._cprof = None
+        self.cprofile_path = None
+
+    # ----- Etapas -----
+    def t(self):
+        return time.perf_counter() if self.enabled else None
+
+    def add(self, name, t0):
+        if t0 is None: return
+        st = self.stages.get(name)
+        if st is None:
+            st = self.stages[name] = _Stage()
+        st.add(time.perf_counter() - t0)
+
+    def wrap(self, obj, attr, name):
+        """Cronometra obj.attr() (p.ej. canvas.draw, que Tk llama desde idle)."""
+        fn = getattr(obj, attr)
+        def timed(*a, **kw):
+            t0 = self.t()
+            try:
+                return fn(*a, **kw)
+            finally:
+                self.add(name, t0)
+        setattr(obj, attr, timed)
+
+    # ----- Bucles / presupuesto -----
+    def begin(self, loop, period_s):
+        if not self.enabled: return None
+        now = time.perf_counter()
+        lp = self.loops.get(loop)
+        if lp is None:
+            lp = self.loops[loop] = _Loop(period_s)
+        lp.period = period_s
+        if lp.t_prev is not None:
+            interval = now - lp.t_prev
+            if interval > 0:
+                lp.fps = 1.0 / interval if lp.fps == 0.0 else lp.fps + EWMA_A * (1.0 / interval - lp.fps)
+            prev = self.stages.get(loop)
+            busy = prev.last if prev is not None else 0.0
+            lp.lag = max(0.0, interval - period_s - busy)
+            self.add_value(loop + ".lag", lp.lag)
+        lp.t_prev = now
+        return now
+
+    def end(self, loop, t0):
+        if t0 is None: return
+        self.add(loop, t0)
+        lp = self.loops.get(loop)
+        if lp is not None and self.stages[loop].last > lp.period:
+            lp.overruns += 1
+
+    def add_value(self, name, dt):
+        st = self.stages.get(name)
+        if st is None:
+            st = self.stages[name] = _Stage()
+        st.add(dt)
+
+    def reset(self):
+        self.stages.clear()
+        self.loops.clear()
+
+    def summary(self):
+        if not self.enabled: return ""
+        parts = []
+        for name, lp in list(self.loops.items()):
+            parts.append(f"{name}: {lp.fps:.1f} fps, lag {lp.lag*1e3:.1f} ms, over {lp.overruns}")
+        stages = "  ".join(f"{n} {s.avg*1e3:.2f}/{s.max*1e3:.1f}"
+                           for n, s in list(self.stages.items()) if not n.endswith(".lag"))
+        if stages: parts.append("ms avg/max: " + stages)
+        if self._cprof is not None: parts.append("cProfile: recording…")
+        elif self.cprofile_path: parts.append(f"cProfile -> {self.cprofile_path}")
+        return "\n".join(parts)
+
+    # ----- cProfile bajo demanda -----
+    def start_cprofile(self, root, seconds=CPROFILE_SEC, path=None):
+        """Perfila el hilo de Tk `seconds` s y guarda en `path` (.prof, ver con pstats/snakeviz).
+
+        cProfile sólo ve el hilo que lo activa; los lectores quedan cubiertos por
+        sus etapas cronometradas.
+        """
+        if self._cprof is not None: return False
+        if path is None:
+            path = time.strftime("profile_%Y%m%d_%H%M%S.prof")
+        self._cprof = cProfile.Profile()
+        self._cprof.enable()
+        root.after(int(seconds * 1000), lambda: self._stop_cprofile(path))
+        return True
+
+    def _stop_cprofile(self, path):
+        if self._cprof is None: return
+        self._cprof.disable()
+        try:
+            self._cprof.dump_stats(path)
+            self.cprofile_path = path
+        except OSError as e:
+            self.cprofile_path = f"error: {e}"
+        self._cprof = None
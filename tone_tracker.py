@@ -0,0 +1,96 @@
+import numpy as np
+
+# ===== Parámetros =====
+RESYNC_WINDOWS = 64       # cada cuántas ventanas se recalculan las sumas desde el anillo
+
+
+def tone_name(f):
+    """Nombre de rasgo para un tono (válido en control_rules): 10 -> "F10", 8.57 -> "F8_57"."""
+    return "F" + f"{f:g}".replace(".", "_").replace("-", "m")
+
+
+class ToneTracker:
+    """Potencia en unas pocas frecuencias con DFT deslizante: O(1) por muestra y tono.
+
+    Por cada tono f se mantiene S(w) = sum x[m] e^{-jwm} sobre las últimas N
+    muestras del SampleRing, y también en w ± 2pi/(N-1): al entrar x[n] se
+    suma su término y se resta el de x[n-N]. Con esas tres sumas la ventana
+    de Hann se aplica en frecuencia, así la potencia sale en las mismas
+    unidades que la etapa psd (|X|^2 / sum w^2) y sin la fuga de la ventana
+    rectangular. update() consume de una vez lo que llegó desde la última
+    llamada (un producto matriz-vector con una tabla e^{-jwi} fija); las sumas se recalculan desde el anillo cada RESYNC_WINDOWS
+    ventanas (error de redondeo) o si el anillo ya sobrescribió lo que sale.
+    """
+
+    def __init__(self, fs=100.0, freqs=(), n=64):
+        self._key = None
+        self.configure(fs, freqs, n)
+
+    def configure(self, fs, freqs, n):
+        fs = float(fs); n = max(4, int(n))
+        freqs = tuple(float(f) for f in freqs if 0.0 < float(f) < fs / 2.0)
+        if self._key == (fs, freqs, n): return False
+        self._key = (fs, freqs, n)
+        self.fs, self.freqs, self.N = fs, freqs, n
+        self.names = [tone_name(f) for f in freqs]
+        self._d = 2.0 * np.pi / (n - 1)                     # Hann simétrica = np.hanning(N)
+        w = 2.0 * np.pi * np.asarray(freqs) / fs
+        self._w = np.stack([w, w - self._d, w + self._d], axis=1).ravel()   # (3K,)
+        self._rot = np.exp(1j * self._w * n)                # e^{jwN}: término que sale
+        self._w_norm = float(np.sum(np.hanning(n) ** 2))
+        self._T = None                                      # e^{-jwi}, i = 0..N-1
+        self.reset()
+        return True
+
+    def reset(self):
+        self._S = np.zeros(self._w.size, dtype=complex)
+        self._pos = None           # índice absoluto tras la última muestra sumada
+        self._origin = 0           # origen de fase (se mueve en cada resincronización)
+        self._since = 0
+
+    @property
+    def ready(self):
+        return self._pos is not None
+
+    # ----- Actualización -----
+    def update(self, ring):
+        """Añade las muestras nuevas del anillo; devuelve cuántas se procesaron."""
+        if not self.freqs: return 0
+        total = ring.total
+        N = self.N
+        if total < N or N > ring.capacity: return 0
+        pos = self._pos
+        new = 0 if pos is None else total - pos
+        if pos is None or not 0 <= new < N or pos - N < total - ring.capacity or self._since >= RESYNC_WINDOWS * N:
+            self._resync(ring, total)
+            return N
+        if new <= 0: return 0
+        # e^{-jwm} = e^{-jw(pos-origin)} * T[:, m-pos]: tabla fija, sin exp por muestra
+        T = self._table(new)
+        io = T @ np.column_stack((ring.window(pos, new), ring.window(pos - N, new)))
+        self._S += np.exp(-1j * self._w * (pos - self._origin)) * (io[:, 0] - io[:, 1] * self._rot)
+        self._pos = total
+        self._since += new
+        return new
+
+    def _table(self, n):
+        if self._T is None or self._T.shape[1] < n:
+            self._T = np.exp(-1j * np.outer(self._w, np.arange(n)))
+        return self._T[:, :n]
+
+    def _resync(self, ring, total):
+        N = self.N
+        self._origin = total - N
+        self._S = self._table(N) @ ring.window(total - N, N)
+        self._pos = total
+        self._since = 0
+
+    # ----- Salida -----
+    def power(self):
+        """Potencia (unidades de la PSD) de cada tono en la ventana actual; nan si aún no hay N muestras."""
+        K = len(self.freqs)
+        if self._pos is None: return np.full(K, np.nan)
+        S = self._S.reshape(K, 3)
+        s = self._pos - self.N - self._origin              # inicio de la ventana (fase relativa)
+        X = 0.5 * S[:, 0] - 0.25 * np.exp(-1j * self._d * s) * S[:, 1] - 0.25 * np.exp(1j * self._d * s) * S[:, 2]
+        return (X.real**2 + X.imag**2) / self._w_norm